@@ -1,26 +1,51 @@
 import ctypes
 import tkinter as tk
-from tkinter import messagebox, scrolledtext
-import subprocess
-import time
+from tkinter import messagebox
 import threading
 import sys
 import os
 
+from local_ntp.clock import (
+    SLEW,
+    STEP,
+    ClockAdjustError,
+    Discipline,
+    DisciplineLoop,
+    DriftState,
+    PollScheduler,
+    default_clock,
+)
 from local_ntp.common import (
+    BeaconClient,
     load_settings,
     save_settings,
-    discover_server,
-    get_time_from_server,
+    DiscoveryCache,
+    ServerPool,
+    send_report,
 )
+from local_ntp.common.protocol import parse_address
+from local_ntp.eventlog import EventLog
+from local_ntp.ui.tklog import LogPanel
 
 class ClientGUI:
     CONFIG_FILE = "client_settings.json"
+    DISCOVERY_CACHE_FILE = "discovery_cache.json"
+    STATE_FILE = "client_state.json"
     def __init__(self, root):
         self.root = root
         self.root.title("CustoNTP Client")
         self._autorun_enabled = False
+        self.discovery = DiscoveryCache(self.DISCOVERY_CACHE_FILE)
+        self.drift_state = DriftState(self.STATE_FILE)
+        self._discipline = None
+        self._loop = None
+        self._pool = None
+        self.report_offsets = False
+        self.beacon_mode = False
+        self.beacon_key = None
+        self.events = EventLog()
         self.create_widgets()
+        self.flush_log()
         self.load_settings()
         self.check_autorun_state()
 
@@ -28,7 +53,7 @@ class ClientGUI:
         frame = tk.Frame(self.root)
         frame.pack(padx=10, pady=10)
 
-        tk.Label(frame, text="IP сервера:").grid(row=0, column=0, sticky="e")
+        tk.Label(frame, text="Серверы:").grid(row=0, column=0, sticky="e")
         self.server_ip_entry = tk.Entry(frame)
         self.server_ip_entry.grid(row=0, column=1, padx=5)
 
@@ -48,97 +73,137 @@ class ClientGUI:
         self.autorun_btn = tk.Button(frame, text='Включить автозапуск', command=self.toggle_autorun)
         self.autorun_btn.grid(row=0, column=7, padx=5)
 
-        self.log_text = scrolledtext.ScrolledText(self.root, width=90, height=15, state=tk.DISABLED)
-        self.log_text.pack(padx=10, pady=10)
+        self.continuous_btn = tk.Button(frame, text="Непрерывная синхронизация", command=self.toggle_continuous)
+        self.continuous_btn.grid(row=1, column=6, columnspan=2, padx=5, pady=(5, 0))
+
+        self.log_panel = LogPanel(self.root, width=90, height=15)
+        self.log_panel.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
     def log(self, msg):
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, msg + "\n")
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
+        self.events.emit(msg)
+
+    def flush_log(self):
+        # Записи из рабочих потоков выводятся в виджет пачкой из главного потока
+        lines = self.events.drain_lines()
+        self.log_panel.append(lines)
+        self.root.after(100, self.flush_log)
 
     def sync_time(self):
-        server_ip = self.server_ip_entry.get()
         try:
             port = int(self.port_entry.get())
         except ValueError:
             messagebox.showerror("Ошибка", "Некорректный порт!")
             return
+        try:
+            pool = self._get_pool(port)
+        except ValueError:
+            messagebox.showerror("Ошибка", "Некорректный адрес сервера!")
+            return
         self.save_settings()
-        threading.Thread(target=self._sync_time_thread, args=(server_ip, port), daemon=True).start()
+        threading.Thread(target=self._sync_time_thread, args=(pool,), daemon=True).start()
+
+    def _get_discipline(self):
+        # Одна дисциплина на всё время работы: между синхронизациями она накапливает оценку частоты
+        if self._discipline is None:
+            self._discipline = Discipline(default_clock())
+            # Оценка частоты с прошлого запуска: сходимость за один-два опроса вместо долгого разгона
+            if self.drift_state.load(self._discipline):
+                self.log(f"[CLIENT] Восстановлено состояние часов: поправка частоты {self._discipline.freq_ppm:+.3f} ppm")
+        return self._discipline
+
+    def _server_list(self):
+        return self.server_ip_entry.get().replace(",", " ").split()
 
-    def _sync_time_thread(self, server_ip, port):
+    def _get_pool(self, port):
+        # Пул живёт между опросами: в нём копится оценка здоровья каждого сервера
+        servers = [parse_address(a, port) for a in self._server_list()]
+        if self._pool is None or [(h.host, h.port) for h in self._pool.servers] != servers:
+            self._pool = ServerPool(servers)
+        return self._pool
+
+    def _sync_time_thread(self, pool):
         try:
-            server_time, rtt = get_time_from_server(server_ip, port)
-            self.log(f"[CLIENT] Измеренный ping (RTT): {rtt*1000:.2f} мс")
-            self.log(f"[CLIENT] Получено время: {server_time}")
-                # Логика разбора времени с миллисекундами
-                if '.' in server_time:
-                    date_str, time_str = server_time.split(' ')
-                    time_main, ms = time_str.split('.')
-                    self.log(f"[CLIENT] Получено время с миллисекундами: {date_str} {time_main}.{ms}")
-                else:
-                    date_str, time_str = server_time.split(' ')
-                    ms = '000'
-                # Корректируем время на половину RTT (только для логов)
-                from datetime import datetime, timedelta
-                dt_format = '%Y-%m-%d %H:%M:%S.%f'
-                if '.' in server_time:
-                    dt = datetime.strptime(server_time, dt_format)
-                else:
-                    dt = datetime.strptime(server_time, '%Y-%m-%d %H:%M:%S')
-                corrected_dt = dt + timedelta(seconds=rtt/2)
-                self.log(f"[CLIENT] Время с учётом ping/2: {corrected_dt.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
-                # Ждём половину RTT перед установкой времени
-                self.log(f"[CLIENT] Ожидание {rtt/2:.4f} сек для учёта ping/2 перед установкой времени...")
-                time.sleep(rtt/2)
-                # Преобразуем дату из ГГГГ-ММ-ДД в ДД-ММ-ГГ
-                y, m, d = date_str.split('-')
-                date_for_win = f"{d}-{m}-{y[2:]}"
-                try:
-                    # Попытка установить время через WinAPI с миллисекундами (теперь сервер всегда шлёт UTC)
-                    import ctypes
-                    # НЕ переводим в UTC, сервер уже шлёт UTC
-                    if '.' in server_time:
-                        dt_utc = datetime.strptime(f"{date_str} {time_str}", dt_format)
-                    else:
-                        dt_utc = datetime.strptime(f"{date_str} {time_str}", '%Y-%m-%d %H:%M:%S')
-                    class SYSTEMTIME(ctypes.Structure):
-                        _fields_ = [
-                            ("wYear", ctypes.c_ushort),
-                            ("wMonth", ctypes.c_ushort),
-                            ("wDayOfWeek", ctypes.c_ushort),
-                            ("wDay", ctypes.c_ushort),
-                            ("wHour", ctypes.c_ushort),
-                            ("wMinute", ctypes.c_ushort),
-                            ("wSecond", ctypes.c_ushort),
-                            ("wMilliseconds", ctypes.c_ushort),
-                        ]
-                    st = SYSTEMTIME()
-                    st.wYear = dt_utc.year
-                    st.wMonth = dt_utc.month
-                    st.wDay = dt_utc.day
-                    st.wHour = dt_utc.hour
-                    st.wMinute = dt_utc.minute
-                    st.wSecond = dt_utc.second
-                    st.wMilliseconds = int(dt_utc.microsecond / 1000)
-                    res = ctypes.windll.kernel32.SetSystemTime(ctypes.byref(st))
-                    if res:
-                        self.log(f"[CLIENT] Время установлено через WinAPI (UTC): {dt_utc.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
-                    else:
-                        self.log(f"[CLIENT] Не удалось установить время через WinAPI. Код ошибки: {ctypes.GetLastError()}")
-                except Exception as e:
-                    self.log(f"[CLIENT] Ошибка при установке времени через WinAPI: {e}")
-                # Также пробуем стандартный способ для совместимости
-                try:
-                    subprocess.run(f'date {date_for_win}', shell=True, check=True)
-                    subprocess.run(f'time {time_str[:8]}', shell=True, check=True)  # только до секунд
-                    self.log(f"[CLIENT] Время синхронизировано!")
-                except Exception as e:
-                    self.log(f"[CLIENT] Не удалось изменить время. Запустите программу от имени администратора! Ошибка: {e}")
+            result = self._sample(pool)
+            action = self._get_discipline().update(result.offset)
+            self._log_sync(result, action)
+        except ClockAdjustError as e:
+            self.log(f"[CLIENT] Не удалось изменить время. Запустите программу от имени администратора! Ошибка: {e}")
         except Exception as e:
             self.log(f"[CLIENT] Ошибка: {e}")
 
+    def _sample(self, pool):
+        result = pool.sample()
+        for h in pool.falsetickers:
+            self.log(f"[CLIENT] Сервер {h.name} отброшен: его время расходится с остальными")
+        if self.report_offsets:
+            # Сервер собирает смещения клиентов, чтобы видеть расхождение всего парка машин
+            for h, r in pool.last.items():
+                try:
+                    send_report(h.host, h.port, r.offset, r.delay)
+                except OSError as e:
+                    self.log(f"[CLIENT] Не удалось отправить отчёт {h.name}: {e}")
+        if len(pool.servers) > 1:
+            self.log(f"[CLIENT] Использованы серверы: {', '.join(h.name for h in pool.last)}")
+        return result
+
+    def _log_sync(self, result, action):
+        self.log(f"[CLIENT] Измеренный ping (RTT): {result.delay/1e6:.2f} мс, "
+                 f"ответов {len(result.samples) + len(result.rejected)}, потеряно {result.lost}")
+        self.log(f"[CLIENT] Смещение часов: {result.offset/1e6:+.2f} мс ± {result.error/1e6:.2f} мс "
+                 f"(джиттер {result.jitter/1e6:.2f} мс, отброшено {len(result.rejected)})")
+        if action == STEP:
+            self.log("[CLIENT] Время синхронизировано: часы переведены")
+        elif action == SLEW:
+            seconds = abs(result.offset) / 1e9 / (self._discipline.clock.slew_rate_ppm * 1e-6)
+            self.log(f"[CLIENT] Время синхронизировано: часы плавно подстраиваются (~{seconds:.0f} с)")
+        try:
+            self.drift_state.save(self._discipline)
+        except OSError as e:
+            self.log(f"[CLIENT] Не удалось сохранить состояние часов: {e}")
+
+    def toggle_continuous(self):
+        if self._loop is not None:
+            self._loop.stop()
+            self._loop = None
+            self.continuous_btn.config(text="Непрерывная синхронизация")
+            self.log("[CLIENT] Непрерывная синхронизация остановлена")
+            return
+        try:
+            port = int(self.port_entry.get())
+        except ValueError:
+            messagebox.showerror("Ошибка", "Некорректный порт!")
+            return
+        try:
+            pool = self._get_pool(port)
+        except ValueError:
+            messagebox.showerror("Ошибка", "Некорректный адрес сервера!")
+            return
+        try:
+            discipline = self._get_discipline()
+        except ClockAdjustError as e:
+            messagebox.showerror("Ошибка", f"Нет доступа к системным часам: {e}")
+            return
+        self.save_settings()
+        on_error = lambda e: self.log(f"[CLIENT] Ошибка: {e}")
+        if self.beacon_mode:
+            # Сервер рассылает маячки всем сразу; прямые запросы нужны только для калибровки задержки
+            server = pool.ranked()[0]
+            self._loop = BeaconClient(discipline, server.host, server.port, key=self.beacon_key,
+                                      on_update=self._log_sync, on_error=on_error)
+        else:
+            # Интервал опроса подстраивается под стабильность часов: от 16 с до 17 мин
+            self._loop = DisciplineLoop(discipline, lambda: self._sample(pool),
+                                        on_update=self._log_sync, on_error=on_error,
+                                        scheduler=PollScheduler())
+        try:
+            self._loop.start()
+        except OSError as e:
+            self._loop = None
+            messagebox.showerror("Ошибка", f"Не удалось начать приём маячков: {e}")
+            return
+        self.continuous_btn.config(text="Остановить синхронизацию")
+        self.log(f"[CLIENT] Непрерывная синхронизация с {', '.join(h.name for h in pool.servers)} запущена")
+
     def copy_ip(self):
         self.root.clipboard_clear()
         self.root.clipboard_append(self.server_ip_entry.get())
@@ -154,24 +219,32 @@ class ClientGUI:
         except ValueError:
             self.log("[CLIENT] Некорректный порт для поиска")
             return
-        ip = None
         try:
-            ip = discover_server(port)
+            servers = self.discovery.discover(port, refresh=True)
         except Exception as e:
             self.log(f"[CLIENT] Сервер не найден: {e}")
             return
-        if ip:
+        for server in servers:
+            self.log(f"[CLIENT] Ответ от {server.address}: {server.rtt*1000:.2f} мс")
+        if servers:
+            # Все найденные серверы, самый быстрый первым: клиент сам распределит между ними запросы
+            found = ", ".join(server.address for server in servers)
             self.server_ip_entry.delete(0, tk.END)
-            self.server_ip_entry.insert(0, ip)
-            self.log(f"[CLIENT] Сервер найден: {ip}")
+            self.server_ip_entry.insert(0, found)
+            self.log(f"[CLIENT] Сервер найден: {found}")
             self.save_settings()
         else:
             self.log("[CLIENT] Сервер не найден")
 
     def save_settings(self):
+        servers = self._server_list()
         data = {
-            "ip": self.server_ip_entry.get(),
+            "ip": parse_address(servers[0])[0] if servers else "",
+            "servers": servers,
             "port": self.port_entry.get(),
+            "report_offsets": self.report_offsets,
+            "beacon": self.beacon_mode,
+            "beacon_key": self.beacon_key.decode("utf-8") if self.beacon_key else None,
         }
         try:
             save_settings(self.CONFIG_FILE, data)
@@ -183,8 +256,20 @@ class ClientGUI:
             data = load_settings(self.CONFIG_FILE)
         except Exception:
             data = {}
+        self.report_offsets = bool(data.get("report_offsets", False))
+        self.beacon_mode = bool(data.get("beacon", False))
+        key = data.get("beacon_key")
+        self.beacon_key = key.encode("utf-8") if key else None
+        ip = ", ".join(data.get("servers") or ()) or data.get("ip")
+        if not ip:
+            # Без сохранённого IP берём самый быстрый сервер из свежего результата поиска
+            try:
+                cached = self.discovery.load(int(data.get("port", "12345")))
+            except ValueError:
+                cached = None
+            ip = cached[0].address if cached else "127.0.0.1"
         self.server_ip_entry.delete(0, tk.END)
-        self.server_ip_entry.insert(0, data.get("ip", "127.0.0.1"))
+        self.server_ip_entry.insert(0, ip)
         self.port_entry.delete(0, tk.END)
         self.port_entry.insert(0, data.get("port", "12345"))
 
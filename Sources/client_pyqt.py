@@ -1,27 +1,54 @@
 import sys
 import threading
 import os
-import subprocess
 import ctypes
-import time
 
+from local_ntp.clock import (
+    SLEW,
+    STEP,
+    ClockAdjustError,
+    Discipline,
+    DisciplineLoop,
+    DriftState,
+    PollScheduler,
+    default_clock,
+)
 from local_ntp.common import (
+    BeaconClient,
     load_settings,
     save_settings,
-    discover_server,
-    get_time_from_server,
+    DiscoveryCache,
+    ServerPool,
+    send_report,
 )
+from local_ntp.common.protocol import parse_address
+from local_ntp.eventlog import EventLog
+from local_ntp.ui.qtlog import LogPanel
 
 from PyQt5 import QtWidgets, QtCore
 
 class ClientGUI(QtWidgets.QWidget):
     CONFIG_FILE = 'client_settings.json'
+    DISCOVERY_CACHE_FILE = 'discovery_cache.json'
+    STATE_FILE = 'client_state.json'
 
     def __init__(self):
         super().__init__()
         self.setWindowTitle('CustoNTP Client (PyQt)')
         self._autorun_enabled = False
+        self.discovery = DiscoveryCache(self.DISCOVERY_CACHE_FILE)
+        self.drift_state = DriftState(self.STATE_FILE)
+        self._discipline = None
+        self._loop = None
+        self._pool = None
+        self.report_offsets = False
+        self.beacon_mode = False
+        self.beacon_key = None
+        self.events = EventLog()
         self._build_ui()
+        self._log_timer = QtCore.QTimer(self)
+        self._log_timer.timeout.connect(self._flush_log)
+        self._log_timer.start(100)
         self._load_settings()
         self._check_autorun_state()
 
@@ -31,7 +58,7 @@ class ClientGUI(QtWidgets.QWidget):
         form_layout = QtWidgets.QGridLayout()
         layout.addLayout(form_layout)
 
-        form_layout.addWidget(QtWidgets.QLabel('IP сервера:'), 0, 0)
+        form_layout.addWidget(QtWidgets.QLabel('Серверы:'), 0, 0)
         self.server_ip = QtWidgets.QLineEdit()
         form_layout.addWidget(self.server_ip, 0, 1)
         self.copy_ip_btn = QtWidgets.QPushButton('Копировать IP')
@@ -52,81 +79,132 @@ class ClientGUI(QtWidgets.QWidget):
         self.autorun_btn = QtWidgets.QPushButton('Включить автозапуск')
         self.autorun_btn.clicked.connect(self.toggle_autorun)
         form_layout.addWidget(self.autorun_btn, 2, 0, 1, 4)
+        self.continuous_btn = QtWidgets.QPushButton('Непрерывная синхронизация')
+        self.continuous_btn.clicked.connect(self.toggle_continuous)
+        form_layout.addWidget(self.continuous_btn, 3, 0, 1, 4)
 
-        self.log_box = QtWidgets.QTextEdit()
-        self.log_box.setReadOnly(True)
-        layout.addWidget(self.log_box)
+        self.log_panel = LogPanel()
+        layout.addWidget(self.log_panel)
 
     def log(self, msg):
-        self.log_box.append(msg)
+        self.events.emit(msg)
+
+    def _flush_log(self):
+        self.log_panel.append(self.events.drain_lines())
 
     def sync_time(self):
-        server_ip = self.server_ip.text()
         try:
             port = int(self.port_edit.text())
         except ValueError:
             QtWidgets.QMessageBox.critical(self, 'Ошибка', 'Некорректный порт!')
             return
+        try:
+            pool = self._get_pool(port)
+        except ValueError:
+            QtWidgets.QMessageBox.critical(self, 'Ошибка', 'Некорректный адрес сервера!')
+            return
         self._save_settings()
-        threading.Thread(target=self._sync_thread, args=(server_ip, port), daemon=True).start()
+        threading.Thread(target=self._sync_thread, args=(pool,), daemon=True).start()
+
+    def _get_discipline(self):
+        if self._discipline is None:
+            self._discipline = Discipline(default_clock())
+            # Оценка частоты с прошлого запуска: сходимость за один-два опроса вместо долгого разгона
+            if self.drift_state.load(self._discipline):
+                self.log(f'[CLIENT] Восстановлено состояние часов: поправка частоты {self._discipline.freq_ppm:+.3f} ppm')
+        return self._discipline
+
+    def _server_list(self):
+        return self.server_ip.text().replace(',', ' ').split()
+
+    def _get_pool(self, port):
+        # Пул живёт между опросами: в нём копится оценка здоровья каждого сервера
+        servers = [parse_address(a, port) for a in self._server_list()]
+        if self._pool is None or [(h.host, h.port) for h in self._pool.servers] != servers:
+            self._pool = ServerPool(servers)
+        return self._pool
 
-    def _sync_thread(self, server_ip, port):
+    def _sync_thread(self, pool):
         try:
-            server_time, rtt = get_time_from_server(server_ip, port)
-            self.log(f'[CLIENT] Измеренный ping (RTT): {rtt*1000:.2f} мс')
-            self.log(f'[CLIENT] Получено время: {server_time}')
-                date_str, time_str = server_time.split(' ')
-                from datetime import datetime, timedelta
-                dt_format = '%Y-%m-%d %H:%M:%S.%f'
-                if '.' not in time_str:
-                    dt = datetime.strptime(server_time, '%Y-%m-%d %H:%M:%S')
-                else:
-                    dt = datetime.strptime(server_time, dt_format)
-                corrected_dt = dt + timedelta(seconds=rtt/2)
-                self.log(f'[CLIENT] Время с учётом ping/2: {corrected_dt.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]}')
-                time.sleep(rtt/2)
-                y, m, d = date_str.split('-')
-                date_for_win = f'{d}-{m}-{y[2:]}'
-                try:
-                    if '.' in server_time:
-                        dt_utc = datetime.strptime(server_time, dt_format)
-                    else:
-                        dt_utc = datetime.strptime(server_time, '%Y-%m-%d %H:%M:%S')
-                    class SYSTEMTIME(ctypes.Structure):
-                        _fields_ = [
-                            ('wYear', ctypes.c_ushort),
-                            ('wMonth', ctypes.c_ushort),
-                            ('wDayOfWeek', ctypes.c_ushort),
-                            ('wDay', ctypes.c_ushort),
-                            ('wHour', ctypes.c_ushort),
-                            ('wMinute', ctypes.c_ushort),
-                            ('wSecond', ctypes.c_ushort),
-                            ('wMilliseconds', ctypes.c_ushort),
-                        ]
-                    st = SYSTEMTIME()
-                    st.wYear = dt_utc.year
-                    st.wMonth = dt_utc.month
-                    st.wDay = dt_utc.day
-                    st.wHour = dt_utc.hour
-                    st.wMinute = dt_utc.minute
-                    st.wSecond = dt_utc.second
-                    st.wMilliseconds = int(dt_utc.microsecond/1000)
-                    res = ctypes.windll.kernel32.SetSystemTime(ctypes.byref(st))
-                    if res:
-                        self.log('[CLIENT] Время установлено через WinAPI')
-                    else:
-                        self.log(f'[CLIENT] Не удалось установить время через WinAPI. Код ошибки: {ctypes.GetLastError()}')
-                except Exception as e:
-                    self.log(f'[CLIENT] Ошибка при установке времени через WinAPI: {e}')
-                try:
-                    subprocess.run(f'date {date_for_win}', shell=True, check=True)
-                    subprocess.run(f'time {time_str[:8]}', shell=True, check=True)
-                    self.log('[CLIENT] Время синхронизировано!')
-                except Exception as e:
-                    self.log(f'[CLIENT] Не удалось изменить время. Запустите программу от имени администратора! Ошибка: {e}')
+            result = self._sample(pool)
+            action = self._get_discipline().update(result.offset)
+            self._log_sync(result, action)
+        except ClockAdjustError as e:
+            self.log(f'[CLIENT] Не удалось изменить время. Запустите программу от имени администратора! Ошибка: {e}')
         except Exception as e:
             self.log(f'[CLIENT] Ошибка: {e}')
 
+    def _sample(self, pool):
+        result = pool.sample()
+        for h in pool.falsetickers:
+            self.log(f'[CLIENT] Сервер {h.name} отброшен: его время расходится с остальными')
+        if self.report_offsets:
+            for h, r in pool.last.items():
+                try:
+                    send_report(h.host, h.port, r.offset, r.delay)
+                except OSError as e:
+                    self.log(f'[CLIENT] Не удалось отправить отчёт {h.name}: {e}')
+        if len(pool.servers) > 1:
+            self.log(f'[CLIENT] Использованы серверы: {", ".join(h.name for h in pool.last)}')
+        return result
+
+    def _log_sync(self, result, action):
+        self.log(f'[CLIENT] Измеренный ping (RTT): {result.delay/1e6:.2f} мс, '
+                 f'ответов {len(result.samples) + len(result.rejected)}, потеряно {result.lost}')
+        self.log(f'[CLIENT] Смещение часов: {result.offset/1e6:+.2f} мс ± {result.error/1e6:.2f} мс '
+                 f'(джиттер {result.jitter/1e6:.2f} мс, отброшено {len(result.rejected)})')
+        if action == STEP:
+            self.log('[CLIENT] Время синхронизировано: часы переведены')
+        elif action == SLEW:
+            seconds = abs(result.offset) / 1e9 / (self._discipline.clock.slew_rate_ppm * 1e-6)
+            self.log(f'[CLIENT] Время синхронизировано: часы плавно подстраиваются (~{seconds:.0f} с)')
+        try:
+            self.drift_state.save(self._discipline)
+        except OSError as e:
+            self.log(f'[CLIENT] Не удалось сохранить состояние часов: {e}')
+
+    def toggle_continuous(self):
+        if self._loop is not None:
+            self._loop.stop()
+            self._loop = None
+            self.continuous_btn.setText('Непрерывная синхронизация')
+            self.log('[CLIENT] Непрерывная синхронизация остановлена')
+            return
+        try:
+            port = int(self.port_edit.text())
+        except ValueError:
+            QtWidgets.QMessageBox.critical(self, 'Ошибка', 'Некорректный порт!')
+            return
+        try:
+            pool = self._get_pool(port)
+        except ValueError:
+            QtWidgets.QMessageBox.critical(self, 'Ошибка', 'Некорректный адрес сервера!')
+            return
+        try:
+            discipline = self._get_discipline()
+        except ClockAdjustError as e:
+            QtWidgets.QMessageBox.critical(self, 'Ошибка', f'Нет доступа к системным часам: {e}')
+            return
+        self._save_settings()
+        on_error = lambda e: self.log(f'[CLIENT] Ошибка: {e}')
+        if self.beacon_mode:
+            server = pool.ranked()[0]
+            self._loop = BeaconClient(discipline, server.host, server.port, key=self.beacon_key,
+                                      on_update=self._log_sync, on_error=on_error)
+        else:
+            # Интервал опроса подстраивается под стабильность часов: от 16 с до 17 мин
+            self._loop = DisciplineLoop(discipline, lambda: self._sample(pool),
+                                        on_update=self._log_sync, on_error=on_error,
+                                        scheduler=PollScheduler())
+        try:
+            self._loop.start()
+        except OSError as e:
+            self._loop = None
+            QtWidgets.QMessageBox.critical(self, 'Ошибка', f'Не удалось начать приём маячков: {e}')
+            return
+        self.continuous_btn.setText('Остановить синхронизацию')
+        self.log(f'[CLIENT] Непрерывная синхронизация с {", ".join(h.name for h in pool.servers)} запущена')
+
     def copy_ip(self):
         cb = QtWidgets.QApplication.clipboard()
         cb.setText(self.server_ip.text())
@@ -143,21 +221,29 @@ class ClientGUI(QtWidgets.QWidget):
             self.log('[CLIENT] Некорректный порт для поиска')
             return
         try:
-            ip = discover_server(port)
+            servers = self.discovery.discover(port, refresh=True)
         except Exception as e:
             self.log(f'[CLIENT] Сервер не найден: {e}')
             return
-        if ip:
-            self.server_ip.setText(ip)
-            self.log(f'[CLIENT] Сервер найден: {ip}')
+        for server in servers:
+            self.log(f'[CLIENT] Ответ от {server.address}: {server.rtt*1000:.2f} мс')
+        if servers:
+            found = ', '.join(server.address for server in servers)
+            self.server_ip.setText(found)
+            self.log(f'[CLIENT] Сервер найден: {found}')
             self._save_settings()
         else:
             self.log('[CLIENT] Сервер не найден')
 
     def _save_settings(self):
+        servers = self._server_list()
         data = {
-            'ip': self.server_ip.text(),
+            'ip': parse_address(servers[0])[0] if servers else '',
+            'servers': servers,
             'port': self.port_edit.text(),
+            'report_offsets': self.report_offsets,
+            'beacon': self.beacon_mode,
+            'beacon_key': self.beacon_key.decode('utf-8') if self.beacon_key else None,
         }
         try:
             save_settings(self.CONFIG_FILE, data)
@@ -169,7 +255,18 @@ class ClientGUI(QtWidgets.QWidget):
             data = load_settings(self.CONFIG_FILE)
         except Exception:
             data = {}
-        self.server_ip.setText(data.get('ip', '127.0.0.1'))
+        self.report_offsets = bool(data.get('report_offsets', False))
+        self.beacon_mode = bool(data.get('beacon', False))
+        key = data.get('beacon_key')
+        self.beacon_key = key.encode('utf-8') if key else None
+        ip = ', '.join(data.get('servers') or ()) or data.get('ip')
+        if not ip:
+            try:
+                cached = self.discovery.load(int(data.get('port', '12345')))
+            except ValueError:
+                cached = None
+            ip = cached[0].address if cached else '127.0.0.1'
+        self.server_ip.setText(ip)
         self.port_edit.setText(data.get('port', '12345'))
 
     def toggle_autorun(self):
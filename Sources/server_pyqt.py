@@ -1,77 +1,8 @@
 import sys
-import socket
-import threading
-from PyQt5 import QtWidgets
-from local_ntp.common import current_utc_time
-
-class TimeServer:
-    def __init__(self, log_callback):
-        self.running = False
-        self.thread = None
-        self.sock = None
-        self.log_callback = log_callback
-        self.port = 12345
-        self.udp_thread = None
-        self.udp_running = False
-
-    def start(self, port):
-        self.running = True
-        self.port = port
-        self.thread = threading.Thread(target=self._run_server, daemon=True)
-        self.thread.start()
-        self.udp_running = True
-        self.udp_thread = threading.Thread(target=self._udp_listener, daemon=True)
-        self.udp_thread.start()
-        self.log_callback(f'[SERVER] Сервер запущен на порту {port}')
-
-    def stop(self):
-        self.running = False
-        self.udp_running = False
-        if self.sock:
-            try:
-                self.sock.close()
-            except Exception as e:
-                self.log_callback(f'[SERVER] Ошибка при закрытии сокета: {e}')
-            self.sock = None
-        self.log_callback('[SERVER] Сервер остановлен')
-
-    def _run_server(self):
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            self.sock = s
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            s.bind(('', self.port))
-            s.listen()
-            while self.running:
-                try:
-                    s.settimeout(1.0)
-                    conn, addr = s.accept()
-                except socket.timeout:
-                    continue
-                except Exception as e:
-                    self.log_callback(f'[SERVER] Ошибка: {e}')
-                    break
-                with conn:
-                    now = current_utc_time()
-                    conn.sendall(now.encode('utf-8'))
-                    self.log_callback(f'[SERVER] Подключение от {addr}, отправлено UTC-время: {now}')
-
-    def _udp_listener(self):
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp:
-            udp.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-            udp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            udp.bind(('', self.port))
-            while self.udp_running:
-                try:
-                    udp.settimeout(1.0)
-                    data, addr = udp.recvfrom(1024)
-                    if data == b'CUSTONTP_DISCOVER':
-                        udp.sendto(b'CUSTONTP_RESPONSE', addr)
-                        self.log_callback(f'[SERVER] Получен broadcast-запрос от {addr}, отправлен ответ')
-                except socket.timeout:
-                    continue
-                except Exception as e:
-                    self.log_callback(f'[SERVER][UDP] Ошибка: {e}')
-                    break
+from PyQt5 import QtWidgets, QtCore
+from local_ntp.eventlog import EventLog
+from local_ntp.server import TimeServer
+from local_ntp.ui.qtlog import LogPanel
 
 class ServerGUI(QtWidgets.QWidget):
     def __init__(self):
@@ -79,7 +10,13 @@ class ServerGUI(QtWidgets.QWidget):
         self.setWindowTitle('CustoNTP Server (PyQt)')
         self.server = None
         self.is_running = False
+        self.events = EventLog()
         self._build_ui()
+        self._log_timer = QtCore.QTimer(self)
+        self._log_timer.timeout.connect(self._flush_log)
+        self._log_timer.start(100)
+        self._stats_timer = QtCore.QTimer(self)
+        self._stats_timer.timeout.connect(self._update_stats)
 
     def _build_ui(self):
         layout = QtWidgets.QVBoxLayout(self)
@@ -98,12 +35,21 @@ class ServerGUI(QtWidgets.QWidget):
         self.stop_btn.setEnabled(False)
         form_layout.addWidget(self.stop_btn, 0, 3)
 
-        self.log_box = QtWidgets.QTextEdit()
-        self.log_box.setReadOnly(True)
-        layout.addWidget(self.log_box)
+        self.stats_label = QtWidgets.QLabel('')
+        layout.addWidget(self.stats_label)
+
+        self.log_panel = LogPanel()
+        layout.addWidget(self.log_panel)
 
     def log(self, msg):
-        self.log_box.append(msg)
+        self.events.emit(msg)
+
+    def _flush_log(self):
+        self.log_panel.append(self.events.drain_lines())
+
+    def _update_stats(self):
+        if self.server is not None:
+            self.stats_label.setText(self.server.metrics.summary())
 
     def start_server(self):
         try:
@@ -111,9 +57,14 @@ class ServerGUI(QtWidgets.QWidget):
         except ValueError:
             QtWidgets.QMessageBox.critical(self, 'Ошибка', 'Некорректный порт!')
             return
-        self.server = TimeServer(self.log)
-        self.server.start(port)
+        self.server = TimeServer(self.events)
+        try:
+            self.server.start(port)
+        except OSError as e:
+            QtWidgets.QMessageBox.critical(self, 'Ошибка', f'Не удалось запустить сервер: {e}')
+            return
         self.is_running = True
+        self._stats_timer.start(1000)
         self.start_btn.setEnabled(False)
         self.stop_btn.setEnabled(True)
         self.port_edit.setEnabled(False)
@@ -122,6 +73,8 @@ class ServerGUI(QtWidgets.QWidget):
         if self.server:
             self.server.stop()
         self.is_running = False
+        self._stats_timer.stop()
+        self._update_stats()
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
         self.port_edit.setEnabled(True)
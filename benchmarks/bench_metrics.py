@@ -0,0 +1,30 @@
+"""Per-request cost of the server metrics updates.
+
+Run from the repository root: ``python benchmarks/bench_metrics.py``
+"""
+import os
+import sys
+import timeit
+from time import perf_counter_ns
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_ntp.server.metrics import Metrics
+
+
+def main(number=500_000):
+    m = Metrics()
+
+    def update():
+        t0 = perf_counter_ns()
+        m.udp_residence.observe(perf_counter_ns() - t0)
+        m.udp_requests += 1
+        m.bytes_sent += 32
+        m.last_seen["192.168.1.10"] = m.tick
+
+    best = min(timeit.repeat(update, number=number, repeat=5))
+    print(f"metrics update: {best / number * 1e9:.0f} ns per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Offset jitter with kernel versus user-space receive timestamps.
+
+Samples a loopback server while busy threads contend for the GIL and
+prints the RMS offset spread computed both ways, plus how long requests
+waited in the server's socket before Python handled them.
+
+Run from the repository root: ``python benchmarks/bench_rx_timestamps.py``
+"""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_ntp.common import rxstamp, sample_burst, timestamp_jitter
+from local_ntp.server import TimeServer
+
+
+def _spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def main(bursts=20, busy_threads=4):
+    server = TimeServer(host="127.0.0.1", rate_limit=None)
+    server.start(0)
+    stop = threading.Event()
+    threads = [threading.Thread(target=_spin, args=(stop,), daemon=True) for _ in range(busy_threads)]
+    for t in threads:
+        t.start()
+    samples = []
+    try:
+        for _ in range(bursts):
+            result = sample_burst("127.0.0.1", server.port, count=8, interval=0.005)
+            samples.extend(result.samples + result.rejected)
+    finally:
+        stop.set()
+        server.stop()
+    kernel, user = timestamp_jitter(samples)
+    print(f"kernel timestamps: {'on' if rxstamp.SO_TIMESTAMPNS is not None else 'unavailable'}")
+    print(f"client offset jitter: kernel {kernel / 1e3:.1f} us, user space {user / 1e3:.1f} us "
+          f"({len(samples)} samples, {busy_threads} busy threads)")
+    age = server.metrics.udp_rx_age
+    if age.count:
+        print(f"server rx queue: mean {age.sum / age.count / 1e3:.1f} us, "
+              f"p99 <= {age.quantile(0.99) / 1e3:g} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Start-up cost of the headless server daemon and the one-shot client.
+
+Reports the import time of the daemon entry point, the wall time from
+process spawn to the first answered UDP request, and the time to exit
+after SIGTERM; then the import time of the client entry point and the
+wall time of ``python -m local_ntp.client sync --dry-run`` against a
+loopback server (one burst of 8 requests). Run from the repository root:
+``python benchmarks/bench_startup.py``
+"""
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from local_ntp.common import get_time_udp
+from local_ntp.server import TimeServer
+
+
+def import_time_us(module):
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    match = re.search(r"\|\s*(\d+)\s*\|\s*" + re.escape(module) + r"\s*$", out, re.M)
+    return int(match.group(1))
+
+
+def wait_for_reply(proc, port, timeout=10.0):
+    """Poll ``port`` until the daemon answers; fails fast if it exits or never answers."""
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            get_time_udp("127.0.0.1", port, timeout=0.01)
+            return
+        except OSError:
+            pass
+        if proc.poll() is not None:
+            raise RuntimeError(f"daemon exited with code {proc.returncode}:\n{proc.stderr.read()}")
+        if time.perf_counter() > deadline:
+            proc.kill()
+            raise RuntimeError(f"daemon did not answer within {timeout:.0f} s:\n{proc.communicate()[1]}")
+
+
+def main(runs=5):
+    print(f"import local_ntp.server.__main__: {import_time_us('local_ntp.server.__main__') / 1000:.1f} ms")
+    for _ in range(runs):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, "-m", "local_ntp.server", "--host", "127.0.0.1",
+                                 "--port", str(port), "--quiet"], cwd=ROOT,
+                                stderr=subprocess.PIPE, text=True)
+        wait_for_reply(proc, port)
+        ready = time.perf_counter() - start
+        start = time.perf_counter()
+        proc.send_signal(signal.SIGTERM if hasattr(signal, "SIGTERM") else signal.SIGINT)
+        proc.communicate()
+        stopped = time.perf_counter() - start
+        print(f"spawn to first reply: {ready * 1000:6.1f} ms   stop: {stopped * 1000:6.1f} ms")
+
+
+def client_main(runs=5):
+    print(f"import local_ntp.client.__main__: {import_time_us('local_ntp.client.__main__') / 1000:.1f} ms")
+    server = TimeServer(host="127.0.0.1", rate_limit=None)
+    server.start(0)
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-m", "local_ntp.client", "sync", "--dry-run", "--quiet",
+                            "--server", f"127.0.0.1:{server.port}"], cwd=ROOT, check=True)
+            print(f"one-shot sync (dry run): {(time.perf_counter() - start) * 1000:6.1f} ms")
+    finally:
+        server.stop()
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    print(f"bare interpreter:        {(time.perf_counter() - start) * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
+    client_main()
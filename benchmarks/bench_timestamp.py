@@ -0,0 +1,31 @@
+"""Microbenchmark of server response construction, responses/s on one core.
+
+Run from the repository root: ``python benchmarks/bench_timestamp.py``
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_ntp.common import current_utc_time, protocol
+from local_ntp.server import TimeSource
+
+
+def main(number=200_000):
+    source = TimeSource()
+    buf = bytearray(64)
+    cases = [
+        ("before: current_utc_time().encode()", lambda: current_utc_time().encode("utf-8")),
+        ("after:  TimeSource.text()", source.text),
+        ("after:  TimeSource.write_text(buf)", lambda: source.write_text(buf)),
+        ("before: pack_response(time_ns)", lambda: protocol.pack_response(1, 2, source.now_ns())),
+        ("after:  TimeSource.write_response(buf)", lambda: source.write_response(buf, 1, 2)),
+    ]
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=number, repeat=5))
+        print(f"{name:40s} {number / best:12,.0f} responses/s")
+
+
+if __name__ == "__main__":
+    main()
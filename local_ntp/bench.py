@@ -0,0 +1,217 @@
+"""Load generator and throughput/latency benchmark.
+
+Runs many concurrent simulated clients against a server over the TCP time
+path (a connection per request, or one persistent session per client), the
+binary UDP time path and ``CUSTONTP_DISCOVER``, and prints one
+JSON object per mode::
+
+    python -m local_ntp.bench --clients 200 --duration 5
+    python -m local_ntp.bench --host 10.0.0.5 --port 12345 --mode udp
+
+Without ``--host`` a loopback server is started in a separate process so
+that it does not share the load generator's GIL. The ``session`` mode needs
+a server with sessions enabled (``--session-greeting``).
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import platform
+import sys
+import time
+
+from local_ntp.common import protocol
+from local_ntp.server.core import DISCOVER_REQUEST, DISCOVER_RESPONSE
+
+MODES = ("tcp", "session", "udp", "discover")
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list, ``q`` in 0..100."""
+    if not sorted_values:
+        return None
+    k = math.ceil(round(q * len(sorted_values) / 100, 9)) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, k))]
+
+
+class _Datagram(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.waiter = None
+
+    def datagram_received(self, data, addr):
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(data)
+
+    def error_received(self, exc):
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_exception(exc)
+
+
+async def _tcp_client(host, port, deadline, timeout, latencies, errors):
+    while time.monotonic() < deadline:
+        start = time.perf_counter_ns()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            data = await asyncio.wait_for(reader.read(64), timeout)
+            writer.close()
+            if not data:
+                raise ConnectionError("empty reply")
+        except asyncio.TimeoutError:
+            errors["timeout"] += 1
+            continue
+        except OSError:
+            errors["error"] += 1
+            await asyncio.sleep(0.01)
+            continue
+        latencies.append(time.perf_counter_ns() - start)
+
+
+async def _session_client(host, port, deadline, timeout, latencies, errors):
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        await asyncio.wait_for(reader.read(64), timeout)
+    except (asyncio.TimeoutError, OSError):
+        errors["error"] += 1
+        return
+    try:
+        while time.monotonic() < deadline:
+            start = time.perf_counter_ns()
+            writer.write(protocol.pack_request(time.time_ns()))
+            try:
+                data = await asyncio.wait_for(reader.readexactly(protocol.PACKET_SIZE), timeout)
+            except asyncio.TimeoutError:
+                errors["timeout"] += 1
+                return
+            except (OSError, asyncio.IncompleteReadError):
+                errors["error"] += 1
+                return
+            if protocol.is_time_packet(data):
+                latencies.append(time.perf_counter_ns() - start)
+            else:
+                errors["bad_reply"] += 1
+    finally:
+        writer.close()
+
+
+async def _udp_client(host, port, mode, deadline, timeout, latencies, errors):
+    loop = asyncio.get_running_loop()
+    transport, proto = await loop.create_datagram_endpoint(_Datagram, remote_addr=(host, port))
+    try:
+        while time.monotonic() < deadline:
+            proto.waiter = loop.create_future()
+            start = time.perf_counter_ns()
+            if mode == "udp":
+                transport.sendto(protocol.pack_request(time.time_ns()))
+            else:
+                transport.sendto(DISCOVER_REQUEST)
+            try:
+                data = await asyncio.wait_for(proto.waiter, timeout)
+            except asyncio.TimeoutError:
+                errors["timeout"] += 1
+                continue
+            except OSError:
+                errors["error"] += 1
+                await asyncio.sleep(0.01)
+                continue
+            ok = protocol.is_time_packet(data) if mode == "udp" else data == DISCOVER_RESPONSE
+            if ok:
+                latencies.append(time.perf_counter_ns() - start)
+            else:
+                errors["bad_reply"] += 1
+    finally:
+        transport.close()
+
+
+async def run_benchmark(host, port, mode="tcp", clients=50, duration=3.0, timeout=1.0):
+    """Run ``clients`` concurrent clients for ``duration`` seconds; returns a report dict."""
+    if mode not in MODES:
+        raise ValueError(f"unknown mode {mode!r}")
+    latencies = []
+    errors = {"timeout": 0, "error": 0, "bad_reply": 0}
+    start = time.monotonic()
+    deadline = start + duration
+    if mode == "tcp":
+        tasks = [_tcp_client(host, port, deadline, timeout, latencies, errors) for _ in range(clients)]
+    elif mode == "session":
+        tasks = [_session_client(host, port, deadline, timeout, latencies, errors)
+                 for _ in range(clients)]
+    else:
+        tasks = [_udp_client(host, port, mode, deadline, timeout, latencies, errors)
+                 for _ in range(clients)]
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - start
+    latencies.sort()
+
+    def ms(value):
+        return None if value is None else round(value / 1e6, 4)
+
+    return {
+        "mode": mode,
+        "host": host,
+        "port": port,
+        "clients": clients,
+        "duration_s": round(elapsed, 3),
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p99": ms(percentile(latencies, 99)),
+            "p999": ms(percentile(latencies, 99.9)),
+            "max": ms(latencies[-1] if latencies else None),
+        },
+    }
+
+
+def _serve(ready):
+    from local_ntp.server import TimeServer
+
+    # one source address is the whole load: measure the server, not its rate limit
+    server = TimeServer(host="127.0.0.1", rate_limit=None, session_greeting=1.0)
+    server.start(0)
+    ready.put(server.port)
+    while True:
+        time.sleep(3600)
+
+
+def _start_loopback_server():
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Queue()
+    proc = ctx.Process(target=_serve, args=(ready,), daemon=True)
+    proc.start()
+    return proc, ready.get(timeout=10)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m local_ntp.bench")
+    parser.add_argument("--host", help="server to load (default: start one on loopback)")
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--mode", choices=MODES + ("all",), default="all")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    proc = None
+    host, port = args.host, args.port
+    if host is None:
+        proc, port = _start_loopback_server()
+        host = "127.0.0.1"
+    try:
+        for mode in MODES if args.mode == "all" else (args.mode,):
+            report = asyncio.run(run_benchmark(host, port, mode, args.clients,
+                                               args.duration, args.timeout))
+            report["python"] = platform.python_version()
+            report["platform"] = sys.platform
+            report["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            print(json.dumps(report), flush=True)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.join()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,14 @@
+"""Headless client: ``python -m local_ntp.client sync`` (see ``oneshot``)."""
+from local_ntp.client.oneshot import (
+    EXIT_CLOCK,
+    EXIT_CONFIG,
+    EXIT_OK,
+    EXIT_UNREACHABLE,
+    STATE_FILE,
+    server_from_settings,
+    servers_from_settings,
+    sync_once,
+)
+
+__all__ = ["EXIT_CLOCK", "EXIT_CONFIG", "EXIT_OK", "EXIT_UNREACHABLE", "STATE_FILE",
+           "server_from_settings", "servers_from_settings", "sync_once"]
@@ -0,0 +1,62 @@
+import argparse
+import sys
+
+from local_ntp.client.oneshot import (
+    EXIT_CONFIG,
+    EXIT_UNREACHABLE,
+    STATE_FILE,
+    servers_from_settings,
+    sync_once,
+)
+from local_ntp.common import load_settings
+from local_ntp.common.protocol import parse_address
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m local_ntp.client")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sync = commands.add_parser("sync", help="sync the clock once and exit")
+    sync.add_argument("--config", default="client_settings.json",
+                      help="client settings file (default: %(default)s)")
+    sync.add_argument("--server", metavar="HOST[:PORT]", action="append",
+                      help="server to use instead of the settings; repeat for several")
+    sync.add_argument("--state", default=STATE_FILE,
+                      help="drift state carried between runs (default: %(default)s, '' to disable)")
+    sync.add_argument("--dry-run", action="store_true", help="measure the offset, leave the clock alone")
+    sync.add_argument("--samples", type=int, default=8, help="requests in the burst")
+    sync.add_argument("--timeout", type=float, default=0.5, help="seconds to wait for each reply")
+    sync.add_argument("--max-slew-wait", type=float, default=0.0, metavar="SECONDS",
+                      help="where slews stop with the process (Windows), offsets are stepped and the "
+                           "command exits at once; with SECONDS > 0, offsets that slew within SECONDS "
+                           "are slewed and the command waits up to that long (default: %(default)s)")
+    sync.add_argument("--quiet", action="store_true", help="print nothing, only set the exit status")
+    args = parser.parse_args(argv)
+
+    log = (lambda msg: None) if args.quiet else print
+    settings = load_settings(args.config)
+    try:
+        if args.server:
+            servers = [parse_address(s, int(settings.get("port") or 12345)) for s in args.server]
+        else:
+            servers = servers_from_settings(settings)
+    except ValueError as e:
+        log(f"[CLIENT] Некорректный адрес сервера: {e}")
+        return EXIT_CONFIG
+    if not servers:
+        from local_ntp.common.discovery import discover_servers
+
+        port = int(settings.get("port") or 12345)
+        found = discover_servers(port, window=0.3)
+        if not found:
+            log("[CLIENT] Сервер не задан в настройках и не найден в сети")
+            return EXIT_UNREACHABLE
+        servers = [(s.address, port) for s in found]
+    status, _ = sync_once(servers, clock=False if args.dry_run else None, samples=args.samples,
+                          timeout=args.timeout, max_slew_wait=args.max_slew_wait,
+                          report=bool(settings.get("report_offsets")),
+                          state_path=args.state or None, log=log)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
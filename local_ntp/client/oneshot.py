@@ -0,0 +1,125 @@
+"""One-shot sync for boot scripts and scheduled tasks.
+
+Measures the offset with one filtered burst, applies it and returns an
+exit status. Only the modules a sync needs are imported: no GUI toolkit,
+no asyncio, and ``ctypes`` only once the clock is actually adjusted.
+"""
+import time
+
+from local_ntp.clock.base import ClockAdjustError
+from local_ntp.clock.discipline import SLEW, STEP, Discipline
+from local_ntp.clock.state import DriftState
+from local_ntp.common.protocol import KissOfDeath, parse_address, send_report
+from local_ntp.common.selection import NoMajority, ServerPool
+
+EXIT_OK = 0
+EXIT_UNREACHABLE = 1  # no server, no answer, rate-limited, or servers that disagree
+EXIT_CONFIG = 2       # also argparse's status for bad arguments
+EXIT_CLOCK = 3        # the clock could not be adjusted (no rights, no backend)
+
+STATE_FILE = "client_state.json"
+
+
+def server_from_settings(settings, default_port=12345):
+    """``(ip, port)`` from client settings, or None if no server is configured."""
+    ip = settings.get("ip")
+    if not ip:
+        return None
+    return ip, int(settings.get("port") or default_port)
+
+
+def servers_from_settings(settings, default_port=12345):
+    """``(host, port)`` pairs from the ``servers`` list of client settings, else from ``ip``.
+
+    Entries are ``host``, ``host:port`` or ``[v6addr]:port``; raises
+    ``ValueError`` for a malformed one.
+    """
+    port = int(settings.get("port") or default_port)
+    servers = [parse_address(s, port) for s in settings.get("servers") or ()]
+    if not servers and settings.get("ip"):
+        servers = [(settings["ip"], port)]
+    return servers
+
+
+def sync_once(servers, port=None, clock=None, samples=8, timeout=0.5, max_slew_wait=0.0,
+              report=False, state_path=None, log=print):
+    """Sync ``clock`` (the system clock by default) once; returns ``(status, result)``.
+
+    ``servers`` is a host (with ``port``) or a list of ``(host, port)``
+    pairs; several servers are sampled together through a ``ServerPool``,
+    which skips dead ones and drops falsetickers. With ``clock=False`` the
+    offset is only measured. Where a slew stops
+    with the process (``ClockBackend.slew_survives_exit``), the offset is
+    stepped, so the call returns at once. A positive ``max_slew_wait``
+    instead slews offsets that take at most that many seconds and waits
+    for the slew before returning. With ``state_path``
+    the discipline continues from, and then updates, a ``DriftState`` file,
+    so consecutive runs also correct the clock's frequency.
+    """
+    if clock is None:
+        from local_ntp.clock import default_clock
+
+        try:
+            clock = default_clock()
+        except ClockAdjustError as e:
+            log(f"[CLIENT] Ошибка: {e}")
+            return EXIT_CLOCK, None
+    if isinstance(servers, str):
+        servers = [(servers, port)]
+    now = clock.now_ns if clock else time.time_ns
+    pool = ServerPool(servers, samples=samples, timeout=timeout, clock=now)
+    names = ", ".join(h.name for h in pool.servers)
+    try:
+        result = pool.sample()
+    except KissOfDeath as e:
+        log(f"[CLIENT] Сервер {names} просит реже обращаться: {e}")
+        return EXIT_UNREACHABLE, None
+    except OSError as e:
+        log(f"[CLIENT] Сервер {names} недоступен: {e}")
+        return EXIT_UNREACHABLE, None
+    except NoMajority as e:
+        log(f"[CLIENT] Серверы {names} расходятся во времени: {e}")
+        return EXIT_UNREACHABLE, None
+    if len(pool.servers) > 1:
+        for h, r in pool.last.items():
+            log(f"[CLIENT] {h.name}: {r.offset/1e6:+.3f} мс ± {r.error/1e6:.3f} мс")
+        for h in pool.falsetickers:
+            log(f"[CLIENT] {h.name}: отброшен, время расходится с остальными")
+    log(f"[CLIENT] Смещение часов: {result.offset/1e6:+.3f} мс ± {result.error/1e6:.3f} мс, "
+        f"RTT {result.delay/1e6:.3f} мс, потеряно {result.lost}")
+    if report:
+        for h, r in pool.last.items():
+            try:
+                send_report(h.host, h.port, r.offset, r.delay)
+            except OSError as e:
+                log(f"[CLIENT] Не удалось отправить отчёт {h.name}: {e}")
+    if not clock:
+        return EXIT_OK, result
+
+    discipline = Discipline(clock)
+    if not clock.slew_survives_exit:
+        discipline.step_threshold_ns = min(discipline.step_threshold_ns,
+                                           int(max_slew_wait * clock.slew_rate_ppm * 1e3))
+    state = DriftState(state_path) if state_path else None
+    try:
+        if state is not None and state.load(discipline) and discipline.freq_ppm:
+            log(f"[CLIENT] Восстановлена поправка частоты {discipline.freq_ppm:+.3f} ppm")
+        action = discipline.update(result.offset)
+        if action == STEP:
+            log("[CLIENT] Время синхронизировано: часы переведены")
+        elif action == SLEW:
+            seconds = abs(result.offset) / 1e9 / (clock.slew_rate_ppm * 1e-6)
+            log(f"[CLIENT] Время синхронизировано: часы плавно подстраиваются (~{seconds:.1f} с)")
+            if not clock.slew_survives_exit:
+                time.sleep(seconds)
+    except ClockAdjustError as e:
+        log(f"[CLIENT] Не удалось изменить время. Нужны права администратора! Ошибка: {e}")
+        return EXIT_CLOCK, result
+    finally:
+        clock.close()
+    if state is not None:
+        try:
+            state.save(discipline)
+        except OSError as e:
+            log(f"[CLIENT] Не удалось сохранить состояние часов: {e}")
+    return EXIT_OK, result
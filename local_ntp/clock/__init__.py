@@ -0,0 +1,38 @@
+import sys
+
+from local_ntp.clock.base import ClockAdjustError, ClockBackend
+from local_ntp.clock.discipline import IGNORE, SLEW, STEP, Discipline, DisciplineLoop
+from local_ntp.clock.poll import PollScheduler
+from local_ntp.clock.simulated import SimulatedClock
+from local_ntp.clock.state import DriftState
+
+
+def default_clock():
+    """Return the system clock backend for this platform.
+
+    The platform modules (and ``ctypes``) are only imported here.
+    """
+    if sys.platform == "win32":
+        from local_ntp.clock.windows import WindowsClock
+
+        return WindowsClock()
+    if sys.platform.startswith("linux"):
+        from local_ntp.clock.linux import LinuxClock
+
+        return LinuxClock()
+    raise ClockAdjustError(f"no clock backend for {sys.platform}")
+
+
+__all__ = [
+    "ClockAdjustError",
+    "ClockBackend",
+    "Discipline",
+    "DisciplineLoop",
+    "DriftState",
+    "IGNORE",
+    "PollScheduler",
+    "SLEW",
+    "STEP",
+    "SimulatedClock",
+    "default_clock",
+]
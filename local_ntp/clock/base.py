@@ -0,0 +1,36 @@
+class ClockAdjustError(OSError):
+    """Raised when the system clock cannot be read or adjusted."""
+
+
+class ClockBackend:
+    """Interface of a clock the discipline loop can correct.
+
+    Offsets follow the ``Sample`` convention: server minus local clock, ns,
+    so a positive offset means the local clock must be moved forward.
+    """
+
+    name = "base"
+    slew_rate_ppm = 500.0
+    slew_survives_exit = False  # whether a slew keeps running after the process exits
+
+    def now_ns(self):
+        """Current reading of the disciplined clock, ns since the epoch."""
+        raise NotImplementedError
+
+    def step(self, offset_ns):
+        """Jump the clock by ``offset_ns`` at once."""
+        raise NotImplementedError
+
+    def slew(self, offset_ns):
+        """Start amortising ``offset_ns`` gradually at ``slew_rate_ppm``.
+
+        A new call replaces any correction still in progress.
+        """
+        raise NotImplementedError
+
+    def set_frequency(self, ppm):
+        """Set the frequency correction; positive values make the clock run faster."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release the backend; stops any correction still in progress."""
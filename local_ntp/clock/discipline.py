@@ -0,0 +1,188 @@
+import threading
+import time
+from collections import deque
+
+STEP = "step"
+SLEW = "slew"
+IGNORE = "ignore"
+
+
+class Discipline:
+    """Decides how to correct a measured offset and tracks the frequency error.
+
+    Offsets below ``step_threshold_ns`` are slewed, larger ones stepped,
+    offsets within ``deadband_ns`` are left alone. Whatever the previous
+    update did not account for (the part of a slew not yet applied, or an
+    ignored offset) is subtracted from the next measured offset; the rest,
+    divided by the elapsed time, is the clock's frequency error, and a
+    fraction ``freq_gain`` of it is folded into the frequency correction so
+    later offsets shrink instead of recurring. Steps are measured the same
+    way, so a clock that is only ever stepped (``step_threshold_ns`` 0)
+    still learns its frequency; a step implying more than ``max_freq_ppm``
+    is taken for a clock jump and leaves the frequency alone.
+
+    The last ``history`` offsets are kept with the clock time they were
+    measured at. ``state``/``restore`` carry the frequency estimate, the
+    outstanding correction and that history across a restart (see
+    ``local_ntp.clock.state``).
+    """
+
+    def __init__(self, clock, step_threshold_ns=128_000_000, deadband_ns=0,
+                 freq_gain=0.5, max_freq_ppm=500.0, min_freq_interval_ns=1_000_000_000,
+                 history=8, mono=time.monotonic_ns):
+        self.clock = clock
+        self.step_threshold_ns = step_threshold_ns
+        self.deadband_ns = deadband_ns
+        self.freq_gain = freq_gain
+        self.max_freq_ppm = max_freq_ppm
+        self.min_freq_interval_ns = min_freq_interval_ns
+        self.freq_ppm = 0.0
+        self.last_offset = None
+        self.last_action = None
+        self.history = deque(maxlen=history)   # (clock time, offset), ns
+        self._mono = mono
+        self._last_update = None
+        self._pending = 0
+        self._pending_slews = False
+
+    def update(self, offset_ns):
+        """Apply the correction for ``offset_ns``; returns STEP, SLEW or IGNORE."""
+        now = self._mono()
+        step = abs(offset_ns) >= self.step_threshold_ns
+        if self._last_update is not None:
+            elapsed = now - self._last_update
+            if elapsed >= self.min_freq_interval_ns:
+                error_ppm = (offset_ns - self._unapplied(elapsed)) / elapsed * 1e6
+                if not step or abs(error_ppm) <= self.max_freq_ppm:
+                    self._adjust_frequency(error_ppm)
+        if step:
+            self.clock.step(offset_ns)
+            action = STEP
+            self._pending = 0
+        else:
+            if abs(offset_ns) > self.deadband_ns:
+                self.clock.slew(offset_ns)
+                action = SLEW
+            else:
+                action = IGNORE
+            self._pending = offset_ns
+            self._pending_slews = action == SLEW
+        self.last_offset = offset_ns
+        self.last_action = action
+        self._last_update = now
+        self.history.append((self.clock.now_ns(), offset_ns))
+        return action
+
+    def state(self):
+        """Plain-data snapshot of what the next update builds on."""
+        return {
+            "freq_ppm": self.freq_ppm,
+            "last_offset": self.last_offset,
+            "last_action": self.last_action,
+            "pending": self._pending,
+            "pending_slews": self._pending_slews,
+            "history": [list(h) for h in self.history],
+        }
+
+    def restore(self, state, max_age_ns=86_400_000_000_000):
+        """Continue from a ``state()`` snapshot taken by an earlier process.
+
+        The frequency correction is reapplied to the clock. If the last
+        update is at most ``max_age_ns`` old by the clock, it also counts as
+        this discipline's previous update, so the next offset already
+        yields a frequency estimate.
+        """
+        freq = max(-self.max_freq_ppm, min(self.max_freq_ppm, float(state["freq_ppm"])))
+        if freq != self.freq_ppm:
+            self.clock.set_frequency(freq)
+            self.freq_ppm = freq
+        self.history.extend((int(t), int(o)) for t, o in state["history"])
+        if not self.history or state["last_offset"] is None:
+            return
+        age = self.clock.now_ns() - self.history[-1][0]
+        if 0 <= age <= max_age_ns:
+            self.last_offset = int(state["last_offset"])
+            self.last_action = state["last_action"]
+            self._pending = int(state["pending"])
+            self._pending_slews = bool(state["pending_slews"])
+            self._last_update = self._mono() - age
+
+    def _unapplied(self, elapsed):
+        """Part of the previous correction still outstanding after ``elapsed`` ns."""
+        if not self._pending_slews:
+            return self._pending
+        left = max(0.0, abs(self._pending) - elapsed * self.clock.slew_rate_ppm * 1e-6)
+        return left if self._pending > 0 else -left
+
+    def _adjust_frequency(self, error_ppm):
+        freq = self.freq_ppm + self.freq_gain * error_ppm
+        freq = max(-self.max_freq_ppm, min(self.max_freq_ppm, freq))
+        if freq != self.freq_ppm:
+            self.clock.set_frequency(freq)
+            self.freq_ppm = freq
+
+
+class DisciplineLoop:
+    """Background thread that samples the server and disciplines the clock.
+
+    ``sampler`` is a callable returning a ``SyncResult`` (e.g. a bound
+    ``sample_burst``); ``on_update(result, action)`` and
+    ``on_error(exc)`` are optional callbacks, called from the loop thread.
+    A server asking to slow down (``KissOfDeath`` or ``result.retry_after``)
+    stretches the next wait accordingly. With a ``scheduler`` (see
+    ``local_ntp.clock.poll``) the wait adapts to the clock's stability
+    instead of staying at ``interval``.
+    """
+
+    def __init__(self, discipline, sampler, interval=64.0, on_update=None, on_error=None,
+                 scheduler=None):
+        self.discipline = discipline
+        self.sampler = sampler
+        self.interval = interval
+        self.on_update = on_update
+        self.on_error = on_error
+        self.scheduler = scheduler
+        if scheduler is not None:
+            self.interval = scheduler.interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="DisciplineLoop", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        """Stop the loop; with ``wait`` also wait for a sample in progress."""
+        self._stop.set()
+        if wait and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def poll_once(self):
+        """Take one filtered sample and apply it; returns ``(result, action)``."""
+        result = self.sampler()
+        return result, self.discipline.update(result.offset)
+
+    def _run(self):
+        while not self._stop.is_set():
+            wait = self.interval
+            try:
+                result, action = self.poll_once()
+            except Exception as e:
+                if self.scheduler is not None:
+                    wait = self.interval = self.scheduler.failed(e)
+                wait = max(wait, getattr(e, "retry_after", 0.0))
+                if self.on_error is not None:
+                    self.on_error(e)
+            else:
+                if self.scheduler is not None:
+                    wait = self.interval = self.scheduler.update(result, action)
+                wait = max(wait, result.retry_after)
+                if self.on_update is not None:
+                    self.on_update(result, action)
+            self._stop.wait(wait)
@@ -0,0 +1,92 @@
+"""Adaptive poll interval for ``DisciplineLoop``.
+
+After each update the discipline has corrected the offset, so the next
+measured offset is what the clock drifted in between: roughly the
+residual frequency error times the interval, plus noise. ``PollScheduler``
+fits that line by least squares over the last ``window`` polls (offset
+against interval, through the origin); the slope is the residual drift and
+the RMS residual the noise. The next interval is the longest one whose
+predicted error, drift times interval plus noise, stays within
+``target_error_ns``. Stable clocks are therefore polled rarely and
+unstable ones often, so server load follows clock quality, not the
+number of clients.
+"""
+import math
+import time
+from collections import deque
+
+from local_ntp.clock.discipline import STEP
+
+
+class PollScheduler:
+    """Chooses each next poll interval, in seconds, within ``min_interval..max_interval``.
+
+    The interval at most doubles per poll. It drops to ``min_interval``
+    after a step, halves after a failed poll, a mostly lost burst or a
+    jitter spike, and is stretched to honour a server's kiss-o'-death.
+    It is never shorter than the slew of the last offset takes, so each
+    measurement sees a finished correction.
+    """
+
+    def __init__(self, min_interval=16.0, max_interval=1024.0, window=8,
+                 target_error_ns=1_000_000, slew_rate_ppm=500.0, mono=time.monotonic):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_error_ns = target_error_ns
+        self.slew_rate_ppm = slew_rate_ppm
+        self.interval = min_interval
+        self.drift_ppm = 0.0
+        self.noise_ns = 0.0
+        self._mono = mono
+        self._last_poll = None
+        self._points = deque(maxlen=window)     # (seconds since the previous poll, offset ns)
+        self._jitter = deque(maxlen=window)
+
+    def _clamp(self, interval):
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def _fit(self):
+        sxx = sum(dt * dt for dt, _ in self._points)
+        sxy = sum(dt * offset for dt, offset in self._points)
+        slope = sxy / sxx if sxx else 0.0       # ns per second, i.e. ppm * 1e3
+        rss = sum((offset - slope * dt) ** 2 for dt, offset in self._points)
+        self.drift_ppm = slope / 1e3
+        self.noise_ns = math.sqrt(rss / len(self._points))
+
+    def update(self, result, action):
+        """Account for a successful poll; returns the next interval."""
+        now = self._mono()
+        elapsed = None if self._last_poll is None else now - self._last_poll
+        self._last_poll = now
+        jitter_spike = (len(self._jitter) >= 2
+                        and result.jitter > 2 * sum(self._jitter) / len(self._jitter) + 1000)
+        self._jitter.append(result.jitter)
+        answered = len(result.samples) + len(result.rejected)
+        if action == STEP:
+            self._points.clear()
+            self.interval = self.min_interval
+            return self.interval
+        if elapsed is not None and elapsed > 0:
+            self._points.append((elapsed, result.offset))
+        if jitter_spike or result.lost > answered:
+            self.interval = self._clamp(self.interval / 2)
+        elif len(self._points) >= 2:
+            self._fit()
+            budget = self.target_error_ns - self.noise_ns
+            drift = abs(self.drift_ppm) * 1e3
+            best = budget / drift if drift else self.max_interval
+            if budget <= 0:
+                best = self.interval / 2
+            self.interval = self._clamp(min(best, self.interval * 2))
+        slew_time = abs(result.offset) / (self.slew_rate_ppm * 1e3)
+        self.interval = min(self.max_interval, max(self.interval, slew_time))
+        return self.interval
+
+    def failed(self, exc=None):
+        """Account for a failed poll; returns the next interval."""
+        retry_after = getattr(exc, "retry_after", 0.0)
+        if retry_after:
+            self.interval = self._clamp(max(self.interval * 2, retry_after))
+        else:
+            self.interval = self._clamp(self.interval / 2)
+        return self.interval
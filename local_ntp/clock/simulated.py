@@ -0,0 +1,69 @@
+import threading
+import time
+
+from local_ntp.clock.base import ClockBackend
+
+
+class SimulatedClock(ClockBackend):
+    """Virtual clock with configurable error and drift against a reference.
+
+    Reads ``reference()`` (true time, ns) and adds the simulated error:
+    the initial ``offset_ns`` plus ``drift_ppm`` of elapsed time, corrected
+    by steps, slews (applied at ``slew_rate_ppm``) and frequency settings.
+    Used by the tests and the emulation harness; never touches the OS clock.
+    """
+
+    name = "simulated"
+
+    def __init__(self, offset_ns=0, drift_ppm=0.0, reference=time.time_ns, slew_rate_ppm=500.0):
+        self.reference = reference
+        self.drift_ppm = drift_ppm
+        self.slew_rate_ppm = slew_rate_ppm
+        self.freq_ppm = 0.0
+        self.steps = 0
+        self._lock = threading.Lock()
+        self._error = float(offset_ns)
+        self._pending = 0.0
+        self._last = reference()
+
+    def _advance(self):
+        t = self.reference()
+        elapsed = t - self._last
+        self._last = t
+        if elapsed <= 0:
+            return t
+        self._error += elapsed * (self.drift_ppm + self.freq_ppm) * 1e-6
+        if self._pending:
+            budget = elapsed * self.slew_rate_ppm * 1e-6
+            applied = max(-budget, min(budget, self._pending))
+            self._error += applied
+            self._pending -= applied
+        return t
+
+    @property
+    def error_ns(self):
+        """How far the clock is ahead of the reference, ns."""
+        with self._lock:
+            self._advance()
+            return int(self._error)
+
+    def now_ns(self):
+        with self._lock:
+            return int(self._advance() + self._error)
+
+    def step(self, offset_ns):
+        with self._lock:
+            self._advance()
+            self._error += offset_ns
+            self._pending = 0.0
+            self.steps += 1
+
+    def slew(self, offset_ns):
+        with self._lock:
+            self._advance()
+            self._pending = float(offset_ns)
+
+    def set_frequency(self, ppm):
+        with self._lock:
+            self._advance()
+            self.freq_ppm = ppm
@@ -0,0 +1,42 @@
+"""Discipline state kept across restarts.
+
+Without it every launch starts from zero: the first update can only
+correct the offset, and the frequency error takes several more polls to
+learn again. The file is small JSON, replaced atomically and only
+rewritten when its content changes.
+"""
+import json
+import os
+
+
+class DriftState:
+    """``Discipline.state()`` persisted in the JSON file at ``path``."""
+
+    def __init__(self, path):
+        self.path = path
+        self._written = None
+
+    def load(self, discipline):
+        """Restore ``discipline`` from the file; returns False if missing or unreadable."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                text = f.read()
+            discipline.restore(json.loads(text))
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        self._written = text
+        return True
+
+    def save(self, discipline):
+        """Write the discipline's state if it changed; returns whether it was written."""
+        text = json.dumps(discipline.state(), separators=(",", ":"))
+        if text == self._written:
+            return False
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._written = text
+        return True
@@ -0,0 +1,141 @@
+"""Windows clock backend using the system time adjustment API.
+
+Slews and frequency corrections change the amount added to the clock on
+every timer interrupt with ``SetSystemTimeAdjustment``; a slew is undone by
+a timer once the offset has been absorbed. Steps read the precise system
+time, add the offset and write it back with ``SetSystemTime``. Needs the
+``SeSystemtimePrivilege`` (administrator rights), which is enabled here.
+"""
+import ctypes
+import threading
+import time
+from ctypes import wintypes
+
+from local_ntp.clock.base import ClockAdjustError, ClockBackend
+
+_EPOCH_AS_FILETIME = 116444736000000000  # 1970-01-01 in 100 ns units since 1601
+_SE_PRIVILEGE_ENABLED = 0x2
+_TOKEN_ADJUST_PRIVILEGES = 0x20
+_TOKEN_QUERY = 0x8
+
+
+class _SYSTEMTIME(ctypes.Structure):
+    _fields_ = [
+        ("wYear", wintypes.WORD),
+        ("wMonth", wintypes.WORD),
+        ("wDayOfWeek", wintypes.WORD),
+        ("wDay", wintypes.WORD),
+        ("wHour", wintypes.WORD),
+        ("wMinute", wintypes.WORD),
+        ("wSecond", wintypes.WORD),
+        ("wMilliseconds", wintypes.WORD),
+    ]
+
+
+class _LUID(ctypes.Structure):
+    _fields_ = [("LowPart", wintypes.DWORD), ("HighPart", wintypes.LONG)]
+
+
+class _TOKEN_PRIVILEGES(ctypes.Structure):
+    _fields_ = [("PrivilegeCount", wintypes.DWORD), ("Luid", _LUID), ("Attributes", wintypes.DWORD)]
+
+
+def _check(ok, what):
+    if not ok:
+        err = ctypes.get_last_error()
+        raise ClockAdjustError(err, f"{what}: {ctypes.FormatError(err)}")
+
+
+class WindowsClock(ClockBackend):
+    """System clock corrected through ``SetSystemTimeAdjustment``."""
+
+    name = "winapi"
+
+    def __init__(self):
+        self._k32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        self._enable_privilege()
+        adjustment = wintypes.DWORD()
+        increment = wintypes.DWORD()
+        disabled = wintypes.BOOL()
+        _check(self._k32.GetSystemTimeAdjustment(ctypes.byref(adjustment), ctypes.byref(increment),
+                                                 ctypes.byref(disabled)),
+               "GetSystemTimeAdjustment")
+        self._increment = increment.value
+        self._freq_ppm = 0.0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def _enable_privilege(self):
+        advapi = ctypes.WinDLL("advapi32", use_last_error=True)
+        token = wintypes.HANDLE()
+        _check(advapi.OpenProcessToken(self._k32.GetCurrentProcess(),
+                                       _TOKEN_ADJUST_PRIVILEGES | _TOKEN_QUERY, ctypes.byref(token)),
+               "OpenProcessToken")
+        try:
+            tp = _TOKEN_PRIVILEGES()
+            tp.PrivilegeCount = 1
+            tp.Attributes = _SE_PRIVILEGE_ENABLED
+            _check(advapi.LookupPrivilegeValueW(None, "SeSystemtimePrivilege", ctypes.byref(tp.Luid)),
+                   "LookupPrivilegeValueW")
+            _check(advapi.AdjustTokenPrivileges(token, False, ctypes.byref(tp), 0, None, None),
+                   "AdjustTokenPrivileges")
+            err = ctypes.get_last_error()
+            if err:  # ERROR_NOT_ALL_ASSIGNED: not running as administrator
+                raise ClockAdjustError(err, "SeSystemtimePrivilege is not held")
+        finally:
+            self._k32.CloseHandle(token)
+
+    def _set_adjustment(self, extra_ppm):
+        ppm = self._freq_ppm + extra_ppm
+        if not ppm:
+            _check(self._k32.SetSystemTimeAdjustment(0, True), "SetSystemTimeAdjustment")
+            return
+        value = round(self._increment * (1 + ppm * 1e-6))
+        _check(self._k32.SetSystemTimeAdjustment(value, False), "SetSystemTimeAdjustment")
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def now_ns(self):
+        return time.time_ns()
+
+    def step(self, offset_ns):
+        ft = ctypes.c_ulonglong()
+        self._k32.GetSystemTimePreciseAsFileTime(ctypes.byref(ft))
+        target = ctypes.c_ulonglong(ft.value + int(offset_ns) // 100)
+        st = _SYSTEMTIME()
+        _check(self._k32.FileTimeToSystemTime(ctypes.byref(target), ctypes.byref(st)),
+               "FileTimeToSystemTime")
+        _check(self._k32.SetSystemTime(ctypes.byref(st)), "SetSystemTime")
+
+    def slew(self, offset_ns):
+        with self._lock:
+            self._cancel_timer()
+            if not offset_ns:
+                self._set_adjustment(0.0)
+                return
+            rate = self.slew_rate_ppm if offset_ns > 0 else -self.slew_rate_ppm
+            self._set_adjustment(rate)
+            duration = abs(offset_ns) / (self.slew_rate_ppm * 1e-6) / 1e9
+            self._timer = threading.Timer(duration, self._end_slew)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _end_slew(self):
+        with self._lock:
+            self._timer = None
+            self._set_adjustment(0.0)
+
+    def set_frequency(self, ppm):
+        with self._lock:
+            self._freq_ppm = ppm
+            if self._timer is None:
+                self._set_adjustment(0.0)
+
+    def close(self):
+        """Stop any slew in progress; the frequency correction is kept."""
+        with self._lock:
+            self._cancel_timer()
+            self._set_adjustment(0.0)
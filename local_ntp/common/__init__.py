@@ -1,7 +1,48 @@
+"""Client-side protocol, sampling and settings helpers.
+
+The names below are imported from their submodules on first use, so that
+importing one submodule (as the one-shot client does) does not load the
+rest of the package: beacons pull in ``hashlib``, sessions and discovery
+more sockets code that a plain sync never touches.
+"""
+import importlib
 import json
 import socket
 import time
-from datetime import datetime
+
+_LAZY = {
+    "BeaconClient": "beacon",
+    "DiscoveredServer": "discovery",
+    "DiscoveryCache": "discovery",
+    "discover_servers": "discovery",
+    "SLOWDOWN": "protocol",
+    "KissOfDeath": "protocol",
+    "Sample": "protocol",
+    "get_time_udp": "protocol",
+    "send_report": "protocol",
+    "NoMajority": "selection",
+    "ServerHealth": "selection",
+    "ServerPool": "selection",
+    "SyncResult": "sampling",
+    "clock_filter": "sampling",
+    "sample_burst": "sampling",
+    "timestamp_jitter": "sampling",
+    "SessionPool": "session",
+    "TimeSession": "session",
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
 
 
 def load_settings(path):
@@ -19,16 +60,12 @@ def save_settings(path, data):
         json.dump(data, f)
 
 
-def discover_server(port, timeout=2):
-    """Broadcasts a discovery packet and returns server IP if found."""
-    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        s.settimeout(timeout)
-        s.sendto(b"CUSTONTP_DISCOVER", ("<broadcast>", port))
-        data, addr = s.recvfrom(1024)
-        if data == b"CUSTONTP_RESPONSE":
-            return addr[0]
-    return None
+def discover_server(port, timeout=0.3):
+    """Broadcasts a discovery packet and returns the fastest server's IP if found."""
+    from local_ntp.common.discovery import discover_servers
+
+    servers = discover_servers(port, window=timeout)
+    return servers[0].address if servers else None
 
 
 def get_time_from_server(ip, port):
@@ -38,9 +75,15 @@ def get_time_from_server(ip, port):
         s.connect((ip, port))
         rtt = time.time() - start
         data = s.recv(1024)
+    from local_ntp.common.protocol import SLOWDOWN, KissOfDeath
+
+    if data == SLOWDOWN:
+        raise KissOfDeath()
     return data.decode("utf-8"), rtt
 
 
 def current_utc_time():
     """Return current UTC time string with millisecond precision."""
+    from datetime import datetime
+
     return datetime.utcnow().isoformat(sep=" ", timespec="milliseconds")
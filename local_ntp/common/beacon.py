@@ -0,0 +1,265 @@
+"""Multicast time beacons: the server pushes its time, clients listen.
+
+A beacon is a CNTP packet with mode ``MODE_BEACON``: ``t1`` is a sequence
+number, ``t2`` a random id chosen when the server starts and ``t3`` the
+server time when it was sent. With a shared key a truncated HMAC-SHA256
+tag is appended and ``FLAG_AUTH`` set. A client follows one server: the
+source address and id of the first beacon it accepts. It drops beacons
+from other addresses, beacons whose sequence number does not increase,
+and beacons carrying an id it has already moved on from. So replayed or
+reordered beacons are ignored, and so are a second server or an older
+worker generation sending to the same group. A new id from the same
+address (the server restarted) is followed, but the client recalibrates
+before using it.
+
+A beacon only says what the server clock read when it left, so the client
+needs the one-way delay to turn it into an offset. ``BeaconClient``
+measures it with an occasional unicast burst: the unicast offset minus
+what the beacons say is the delay of the beacon path, which then holds
+until the next calibration. Between calibrations the server sends one
+packet per interval whatever the number of listeners.
+"""
+import hashlib
+import hmac
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+from local_ntp.common import rxstamp
+from local_ntp.common.protocol import MAGIC, MODE_BEACON, PACKET, PACKET_SIZE, VERSION, Sample
+from local_ntp.common.sampling import SyncResult, sample_burst
+
+BEACON_GROUP = "239.255.12.3"
+FLAG_AUTH = 0x02
+TAG_SIZE = 16
+
+
+def beacon_port_for(port):
+    """Beacons go to the port after the server's, which stays free for unicast."""
+    return port + 1
+
+
+def pack_beacon(seq, server_id, t3, stratum=1, key=None):
+    """Return a beacon datagram, tagged with ``key`` if one is given."""
+    if key is None:
+        return PACKET.pack(MAGIC, VERSION, MODE_BEACON, stratum, 0, seq, server_id, t3)
+    data = PACKET.pack(MAGIC, VERSION, MODE_BEACON, stratum, FLAG_AUTH, seq, server_id, t3)
+    return data + hmac.new(key, data, hashlib.sha256).digest()[:TAG_SIZE]
+
+
+def unpack_beacon(data, key=None):
+    """Return ``(stratum, seq, server_id, t3)``; ValueError if malformed or not authentic."""
+    if len(data) < PACKET_SIZE:
+        raise ValueError("short beacon")
+    magic, version, mode, stratum, flags, seq, server_id, t3 = PACKET.unpack_from(data)
+    if magic != MAGIC or version != VERSION or mode != MODE_BEACON:
+        raise ValueError("not a beacon")
+    if key is not None:
+        tag = hmac.new(key, data[:PACKET_SIZE], hashlib.sha256).digest()[:TAG_SIZE]
+        if not flags & FLAG_AUTH or not hmac.compare_digest(tag, data[PACKET_SIZE:]):
+            raise ValueError("beacon failed authentication")
+    return stratum, seq, server_id, t3
+
+
+def beacon_socket(port, group=BEACON_GROUP):
+    """Return a UDP socket receiving beacons sent to ``group:port``.
+
+    A broadcast address (or ``""``) as ``group`` receives broadcast beacons
+    instead of joining a multicast group.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(("", port))
+        if group and socket.inet_aton(group)[0] & 0xF0 == 0xE0:
+            mreq = struct.pack("4s4s", socket.inet_aton(group), socket.inet_aton("0.0.0.0"))
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    except Exception:
+        sock.close()
+        raise
+    return sock
+
+
+class BeaconReceiver:
+    """Validated beacons from one socket, as ``(stratum, seq, server_t3, local_rx)``.
+
+    The receiver pins itself to the server id of the first beacon it
+    accepts, and to its source address unless ``source`` is given.
+    ``generation`` counts the id changes it has followed since then; a
+    beacon from a new generation must not be used with a delay calibrated
+    for the previous one.
+    """
+
+    def __init__(self, sock, key=None, clock=time.time_ns, source=None):
+        self.sock = sock
+        self.key = key
+        self.clock = clock
+        self.stamped = rxstamp.enable(sock)
+        self.source = source
+        self.server_id = None
+        self.last_seq = None
+        self.generation = 0
+        self.lost = 0
+        self.rejected = 0
+        self._retired = deque(maxlen=64)
+
+    def receive(self, timeout):
+        """Wait up to ``timeout`` seconds for the next valid beacon; None on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self.sock.settimeout(remaining)
+            try:
+                if self.stamped:
+                    data, addr, kernel_ns = rxstamp.recv_stamped(self.sock, PACKET_SIZE + TAG_SIZE + 1)
+                    rx = self.clock() - rxstamp.age_ns(kernel_ns)
+                else:
+                    data, addr = self.sock.recvfrom(PACKET_SIZE + TAG_SIZE + 1)
+                    rx = self.clock()
+            except socket.timeout:
+                return None
+            try:
+                stratum, seq, server_id, t3 = unpack_beacon(data, self.key)
+            except ValueError:
+                self.rejected += 1
+                continue
+            if self.source is None:
+                self.source = addr[0]
+            if addr[0] != self.source or server_id in self._retired:
+                self.rejected += 1
+                continue
+            if self.server_id is None:
+                self.server_id = server_id
+            elif server_id != self.server_id:
+                # server restarted: its sequence starts over and the old id is never accepted again
+                self._retired.append(self.server_id)
+                self.server_id = server_id
+                self.generation += 1
+            elif seq <= self.last_seq:
+                self.rejected += 1
+                continue
+            else:
+                self.lost += seq - self.last_seq - 1
+            self.last_seq = seq
+            return stratum, seq, t3, rx
+
+
+class BeaconClient:
+    """Disciplines a clock from beacons, calibrating the delay over unicast.
+
+    Every ``window`` beacons the offset is estimated from the one that
+    arrived soonest after it was sent (the largest ``t3 - local_rx``) plus
+    the calibrated delay, and passed to ``discipline``. A unicast burst to
+    ``server_ip:port`` is made first, then every ``calibrate_every``
+    seconds and whenever the server's beacon id changes. Only beacons sent
+    from ``server_ip`` are used. ``on_update(result, action)`` and
+    ``on_error(exc)`` are called from the listener thread, as for
+    ``DisciplineLoop``.
+    """
+
+    def __init__(self, discipline, server_ip, port, group=BEACON_GROUP, beacon_port=None,
+                 key=None, window=8, calibrate_every=3600.0, timeout=5.0,
+                 on_update=None, on_error=None, sampler=None):
+        self.discipline = discipline
+        self.server_ip = server_ip
+        self.port = port
+        self.group = group
+        self.beacon_port = beacon_port or beacon_port_for(port)
+        self.key = key
+        self.window = window
+        self.calibrate_every = calibrate_every
+        self.timeout = timeout
+        self.on_update = on_update
+        self.on_error = on_error
+        self.sampler = sampler or (lambda: sample_burst(server_ip, port, clock=discipline.clock.now_ns))
+        self.delay = None
+        self.calibrated_at = None
+        self._generation = None
+        self._beacons = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._sock = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self._sock = beacon_socket(self.beacon_port, self.group)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="BeaconClient", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if wait and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def calibrate(self, beacon_raw):
+        """Measure the beacon path delay against a unicast burst; returns it, ns.
+
+        ``beacon_raw`` is ``t3 - local_rx`` of a recent beacon: the offset it
+        implies before the delay is added.
+        """
+        result = self.sampler()
+        # unicast offset = beacon_raw + delay; the burst's own error bounds the result
+        self.delay = max(0, result.offset - beacon_raw)
+        self.calibrated_at = time.monotonic()
+        return self.delay
+
+    def _run(self):
+        try:
+            source = socket.getaddrinfo(self.server_ip, self.port, socket.AF_INET, socket.SOCK_DGRAM)[0][4][0]
+        except OSError:
+            source = None   # unresolvable for now: follow the first server heard
+        receiver = BeaconReceiver(self._sock, self.key, self.discipline.clock.now_ns, source)
+        try:
+            while not self._stop.is_set():
+                try:
+                    beacon = receiver.receive(min(self.timeout, 0.5))
+                    if beacon is None:
+                        if self._beacons and time.monotonic() - self._beacons[-1][4] > self.timeout:
+                            raise TimeoutError("no beacons received")
+                        continue
+                    stratum, seq, t3, rx = beacon
+                    self._beacons.append((stratum, seq, t3, rx, time.monotonic()))
+                    if (self.delay is None or receiver.generation != self._generation
+                            or time.monotonic() - self.calibrated_at >= self.calibrate_every):
+                        self.calibrate(t3 - rx)
+                        self._generation = receiver.generation
+                        self._beacons.clear()
+                        continue
+                    if len(self._beacons) >= self.window:
+                        result = self._estimate(receiver.lost)
+                        receiver.lost = 0
+                        self._beacons.clear()
+                        action = self.discipline.update(result.offset)
+                        if self.on_update is not None:
+                            self.on_update(result, action)
+                except Exception as e:
+                    self._beacons.clear()
+                    if self.on_error is not None:
+                        self.on_error(e)
+                    self._stop.wait(1.0)
+        finally:
+            self._sock.close()
+
+    def _estimate(self, lost):
+        # a beacon behaves like an exchange whose round trip is twice the one-way delay
+        d = self.delay
+        samples = sorted((Sample(rx - 2 * d, t3, t3, rx, stratum)
+                          for stratum, _, t3, rx, _ in self._beacons),
+                         key=lambda s: s.t4 - s.t3)
+        keep = max(1, (len(samples) + 1) // 2)
+        kept, rejected = samples[:keep], samples[keep:]
+        offset = kept[0].offset
+        spread = [s.offset - offset for s in kept[1:]]
+        jitter = int((sum(x * x for x in spread) / len(spread)) ** 0.5) if spread else 0
+        return SyncResult(offset, 2 * d, d + jitter, jitter, kept, rejected, lost)
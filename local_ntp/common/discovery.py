@@ -0,0 +1,169 @@
+"""Server discovery on every local network.
+
+The discovery request is broadcast to the directed broadcast address of
+every local IPv4 interface and to the limited broadcast address, and sent
+to an IPv6 link-local multicast group on every interface, all from two
+sockets in one pass. Every ``CUSTONTP_RESPONSE`` arriving within the
+window is collected and servers are ranked by round-trip time. Results can
+be cached in a JSON file so clients do not broadcast on every launch.
+"""
+import json
+import os
+import selectors
+import socket
+import struct
+import sys
+import time
+from collections import namedtuple
+
+DISCOVER_REQUEST = b"CUSTONTP_DISCOVER"
+DISCOVER_RESPONSE = b"CUSTONTP_RESPONSE"
+DISCOVER_GROUP_V6 = "ff02::114"
+
+_SIOCGIFFLAGS = 0x8913
+_SIOCGIFADDR = 0x8915
+_SIOCGIFBRDADDR = 0x8919
+_IFF_UP = 0x1
+_IFF_BROADCAST = 0x2
+
+DiscoveredServer = namedtuple("DiscoveredServer", "address rtt")
+
+
+def _linux_broadcasts():
+    import fcntl
+
+    out = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        for _, name in socket.if_nameindex():
+            ifreq = struct.pack("256s", name.encode()[:15])
+            try:
+                flags = struct.unpack("H", fcntl.ioctl(s.fileno(), _SIOCGIFFLAGS, ifreq)[16:18])[0]
+                if flags & (_IFF_UP | _IFF_BROADCAST) != (_IFF_UP | _IFF_BROADCAST):
+                    continue
+                out.append(socket.inet_ntoa(fcntl.ioctl(s.fileno(), _SIOCGIFBRDADDR, ifreq)[20:24]))
+            except OSError:
+                continue
+    return out
+
+
+def _hostname_broadcasts():
+    # Without an interface API, assume /24 networks around the host's addresses
+    out = []
+    try:
+        infos = socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET)
+    except OSError:
+        return out
+    for info in infos:
+        addr = info[4][0]
+        if not addr.startswith("127."):
+            out.append(addr.rsplit(".", 1)[0] + ".255")
+    return out
+
+
+def broadcast_addresses():
+    """Directed broadcast addresses of the local IPv4 networks plus 255.255.255.255."""
+    addrs = _linux_broadcasts() if sys.platform.startswith("linux") else _hostname_broadcasts()
+    result = []
+    for addr in addrs + ["255.255.255.255"]:
+        if addr not in result:
+            result.append(addr)
+    return result
+
+
+def _ipv6_socket():
+    if not socket.has_ipv6:
+        return None
+    try:
+        s = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+    except OSError:
+        return None
+    s.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_MULTICAST_HOPS, 1)
+    return s
+
+
+def discover_servers(port, window=0.3, ipv6=True, broadcasts=None):
+    """Discover every server answering within ``window`` seconds.
+
+    Returns ``DiscoveredServer(address, rtt)`` tuples, fastest first.
+    """
+    v4 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    v6 = _ipv6_socket() if ipv6 else None
+    sel = selectors.DefaultSelector()
+    best = {}
+    try:
+        v4.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        v4.setblocking(False)
+        sel.register(v4, selectors.EVENT_READ)
+        start = time.perf_counter()
+        for addr in broadcasts if broadcasts is not None else broadcast_addresses():
+            try:
+                v4.sendto(DISCOVER_REQUEST, (addr, port))
+            except OSError:
+                pass
+        if v6 is not None:
+            v6.setblocking(False)
+            sel.register(v6, selectors.EVENT_READ)
+            for index, _ in socket.if_nameindex():
+                try:
+                    v6.sendto(DISCOVER_REQUEST, (DISCOVER_GROUP_V6, port, 0, index))
+                except OSError:
+                    pass
+        deadline = start + window
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            for key, _ in sel.select(remaining):
+                try:
+                    data, addr = key.fileobj.recvfrom(64)
+                except OSError:
+                    continue
+                rtt = time.perf_counter() - start
+                host = addr[0]
+                if len(addr) == 4 and addr[3] and "%" not in host:
+                    host = f"{host}%{addr[3]}"  # link-local: keep the interface scope
+                if data == DISCOVER_RESPONSE and host not in best:
+                    best[host] = rtt
+    finally:
+        sel.close()
+        v4.close()
+        if v6 is not None:
+            v6.close()
+    return sorted((DiscoveredServer(a, r) for a, r in best.items()), key=lambda s: s.rtt)
+
+
+class DiscoveryCache:
+    """Discovery results stored in a JSON file and trusted for ``ttl`` seconds."""
+
+    def __init__(self, path, ttl=3600.0):
+        self.path = path
+        self.ttl = ttl
+
+    def load(self, port):
+        """Cached servers for ``port``, fastest first, or None if missing or expired."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data["port"] != port or time.time() - data["time"] > self.ttl:
+                return None
+            return [DiscoveredServer(a, r) for a, r in data["servers"]]
+        except Exception:
+            return None
+
+    def store(self, port, servers):
+        data = {"port": port, "time": time.time(), "servers": [list(s) for s in servers]}
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    def discover(self, port, refresh=False, **kwargs):
+        """Return cached servers if fresh, otherwise discover and cache them."""
+        if not refresh:
+            servers = self.load(port)
+            if servers:
+                return servers
+        servers = discover_servers(port, **kwargs)
+        if servers:
+            self.store(port, servers)
+        return servers
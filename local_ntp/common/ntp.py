@@ -0,0 +1,113 @@
+"""NTPv4 (RFC 5905) packet codec.
+
+Only the 48-byte header is handled (no extension fields or MACs), with
+precompiled ``struct`` formats that pack into and unpack from caller-owned
+buffers, so a server loop can reuse one receive and one send buffer::
+
+    LI/VN/Mode  B   leap indicator (2 bits), version (3), mode (3)
+    stratum     B
+    poll        b   log2 seconds
+    precision   b   log2 seconds
+    root delay  I   NTP short format, 16.16 seconds
+    root disp   I   NTP short format
+    ref id      4s
+    ref time    Q   NTP timestamp format, 32.32 seconds since 1900
+    origin      Q   client transmit time, echoed
+    receive     Q
+    transmit    Q
+
+Times outside this module are ns since the Unix epoch, as everywhere else
+in the package.
+"""
+import socket
+import struct
+import time
+from collections import namedtuple
+
+from local_ntp.common.protocol import KissOfDeath, Sample, resolve_udp
+
+PACKET = struct.Struct("!BBbbII4sQQQQ")
+PACKET_SIZE = PACKET.size  # 48
+_TIMESTAMP = struct.Struct("!Q")
+
+NTP_PORT = 123
+NTP_EPOCH_OFFSET = 2_208_988_800  # seconds from 1900-01-01 to 1970-01-01
+
+MODE_CLIENT = 3
+MODE_SERVER = 4
+LEAP_NONE = 0
+LEAP_UNSYNCHRONIZED = 3
+STRATUM_KOD = 0
+
+ORIGIN_OFFSET = 24
+TRANSMIT_OFFSET = 40
+
+NtpPacket = namedtuple("NtpPacket", "leap version mode stratum poll precision root_delay "
+                                    "root_dispersion ref_id reference origin receive transmit")
+
+
+def ns_to_ntp(ns):
+    """Unix time in ns to a 64-bit NTP timestamp."""
+    sec, rem = divmod(ns, 1_000_000_000)
+    return ((sec + NTP_EPOCH_OFFSET) & 0xFFFFFFFF) << 32 | (rem << 32) // 1_000_000_000
+
+
+def ntp_to_ns(ts):
+    """64-bit NTP timestamp to Unix time in ns (era 0, i.e. until 2036)."""
+    return ((ts >> 32) - NTP_EPOCH_OFFSET) * 1_000_000_000 + ((ts & 0xFFFFFFFF) * 1_000_000_000 >> 32)
+
+
+def seconds_to_short(seconds):
+    """Seconds to the NTP short format (16.16 fixed point)."""
+    return min(int(seconds * 65536), 0xFFFFFFFF)
+
+
+def pack_into(buf, leap, version, mode, stratum, poll, precision, root_delay, root_dispersion,
+              ref_id, reference, origin, receive, transmit, offset=0):
+    """Write a packet into ``buf``; timestamps are raw 64-bit NTP values."""
+    PACKET.pack_into(buf, offset, leap << 6 | version << 3 | mode, stratum, poll, precision,
+                     root_delay, root_dispersion, ref_id, reference, origin, receive, transmit)
+
+
+def unpack_from(buf, offset=0):
+    """Read a packet from ``buf``; ValueError if it is too short."""
+    if len(buf) - offset < PACKET_SIZE:
+        raise ValueError("short NTP packet")
+    first, *rest = PACKET.unpack_from(buf, offset)
+    return NtpPacket(first >> 6, first >> 3 & 7, first & 7, *rest)
+
+
+def transmit_time(buf):
+    """Raw transmit timestamp of the packet in ``buf``, without unpacking the rest."""
+    return _TIMESTAMP.unpack_from(buf, TRANSMIT_OFFSET)[0]
+
+
+def pack_request(buf, transmit_ns, version=4):
+    """Write a client request carrying ``transmit_ns`` into ``buf``."""
+    PACKET.pack_into(buf, 0, version << 3 | MODE_CLIENT, 0, 0, 0, 0, 0, b"\0\0\0\0",
+                     0, 0, 0, ns_to_ntp(transmit_ns))
+
+
+def get_time_ntp(host, port=NTP_PORT, timeout=2.0, clock=time.time_ns):
+    """One NTP exchange with any NTPv4 server; returns a ``Sample`` (ns, Unix epoch)."""
+    family, addr = resolve_udp(host, port)
+    buf = bytearray(PACKET_SIZE)
+    with socket.socket(family, socket.SOCK_DGRAM) as s:
+        s.settimeout(timeout)
+        t1 = clock()
+        pack_request(buf, t1)
+        sent = transmit_time(buf)
+        s.sendto(buf, addr)
+        while True:
+            n, _ = s.recvfrom_into(buf)
+            t4 = clock()
+            if n < PACKET_SIZE:
+                continue
+            p = unpack_from(buf)
+            if p.mode != MODE_SERVER or p.origin != sent:
+                continue
+            if p.stratum == STRATUM_KOD:
+                if p.ref_id == b"RATE":
+                    raise KissOfDeath()
+                raise ConnectionError(f"kiss-o'-death from server: {p.ref_id.decode('ascii', 'replace')}")
+            return Sample(t1, ntp_to_ns(p.receive), ntp_to_ns(p.transmit), t4, p.stratum)
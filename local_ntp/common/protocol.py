@@ -0,0 +1,168 @@
+"""Binary single-datagram time protocol.
+
+Request and response share one fixed layout (network byte order)::
+
+    magic    4s  b"CNTP"
+    version  B
+    mode     B   MODE_REQUEST / MODE_RESPONSE
+    stratum  B   0 in requests, server stratum in responses
+    flags    B   FLAG_RATE in a kiss-o'-death reply, else 0
+    t1       q   client transmit time, ns since the epoch
+    t2       q   server receive time, ns
+    t3       q   server transmit time, ns
+
+The server echoes ``t1`` back so the client can match the reply to its
+request; the client takes ``t4`` itself when the reply arrives.
+
+A client may also report a sync result with a ``MODE_REPORT`` packet:
+``t1`` its clock, ``t2`` the measured offset and ``t3`` the delay, all in
+ns. Reports are not answered.
+
+A rate-limited client gets a kiss-o'-death reply instead: stratum 0,
+``FLAG_RATE`` set, ``t2`` 0 and ``t3`` the suggested back-off in ns.
+"""
+import socket
+import struct
+import time
+from collections import namedtuple
+
+from local_ntp.common import rxstamp
+
+MAGIC = b"CNTP"
+VERSION = 1
+MODE_REQUEST = 1
+MODE_RESPONSE = 2
+MODE_REPORT = 3
+MODE_BEACON = 4  # see local_ntp.common.beacon
+
+FLAG_RATE = 0x01
+
+SLOWDOWN = b"CUSTONTP_SLOWDOWN"  # TCP kiss-o'-death
+
+PACKET = struct.Struct("!4sBBBBqqq")
+PACKET_SIZE = PACKET.size
+
+
+class KissOfDeath(ConnectionError):
+    """The server asked this client to slow down for ``retry_after`` seconds."""
+
+    def __init__(self, retry_after=1.0):
+        super().__init__(f"server asked to slow down for {retry_after:.1f} s")
+        self.retry_after = retry_after
+
+
+class Sample(namedtuple("Sample", "t1 t2 t3 t4 stratum rx_age", defaults=(0,))):
+    """One request/response exchange, all timestamps in nanoseconds.
+
+    With kernel receive timestamps ``t4`` is the kernel's arrival time and
+    ``rx_age`` how much later user space got to it (0 without them).
+    """
+
+    __slots__ = ()
+
+    @property
+    def offset(self):
+        """Server clock minus client clock, ns."""
+        return ((self.t2 - self.t1) + (self.t3 - self.t4)) // 2
+
+    @property
+    def delay(self):
+        """Round-trip network delay excluding server processing time, ns."""
+        return (self.t4 - self.t1) - (self.t3 - self.t2)
+
+
+def pack_request(t1):
+    """Return a request datagram carrying client transmit time ``t1``."""
+    return PACKET.pack(MAGIC, VERSION, MODE_REQUEST, 0, 0, t1, 0, 0)
+
+
+def pack_response(t1, t2, t3, stratum=1, flags=0):
+    """Return a response datagram for a request sent at ``t1``."""
+    return PACKET.pack(MAGIC, VERSION, MODE_RESPONSE, stratum, flags, t1, t2, t3)
+
+
+def pack_report(when, offset, delay):
+    """Return a report of one measured offset/delay for fleet telemetry."""
+    return PACKET.pack(MAGIC, VERSION, MODE_REPORT, 0, 0, when, offset, delay)
+
+
+def pack_kod(t1, retry_after_ns):
+    """Return a kiss-o'-death reply telling the client to back off."""
+    return PACKET.pack(MAGIC, VERSION, MODE_RESPONSE, 0, FLAG_RATE, t1, 0, retry_after_ns)
+
+
+def unpack(data):
+    """Return ``(mode, stratum, flags, t1, t2, t3)`` or raise ``ValueError``."""
+    if len(data) != PACKET_SIZE:
+        raise ValueError(f"bad packet size {len(data)}")
+    magic, version, mode, stratum, flags, t1, t2, t3 = PACKET.unpack(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a CNTP packet")
+    return mode, stratum, flags, t1, t2, t3
+
+
+def is_time_packet(data):
+    """Cheap check whether a datagram is meant for this protocol."""
+    return len(data) == PACKET_SIZE and data[:4] == MAGIC
+
+
+def exchange(sock, addr, clock=time.time_ns, stamped=False):
+    """Send one request through ``sock`` and return the resulting ``Sample``.
+
+    Replies whose echoed transmit time does not match are stale answers to
+    an earlier request and are skipped until the socket timeout expires.
+    Raises ``KissOfDeath`` if the server rate-limited the request. With
+    ``stamped`` (see ``rxstamp.enable``) ``t4`` is the kernel receive time.
+    """
+    t1 = clock()
+    sock.sendto(pack_request(t1), addr)
+    while True:
+        if stamped:
+            data, _, kernel_ns = rxstamp.recv_stamped(sock, PACKET_SIZE + 1)
+            t4 = clock()
+            rx_age = rxstamp.age_ns(kernel_ns)
+            t4 -= rx_age
+        else:
+            data, _ = sock.recvfrom(PACKET_SIZE + 1)
+            t4 = clock()
+            rx_age = 0
+        try:
+            mode, stratum, flags, echoed, t2, t3 = unpack(data)
+        except ValueError:
+            continue
+        if mode == MODE_RESPONSE and echoed == t1:
+            if flags & FLAG_RATE:
+                raise KissOfDeath(t3 / 1e9)
+            return Sample(t1, t2, t3, t4, stratum, rx_age)
+
+
+def parse_address(value, default_port=12345):
+    """Parse ``host``, ``host:port`` or ``[v6addr]:port`` into ``(host, port)``."""
+    if value.startswith("["):
+        host, _, rest = value[1:].partition("]")
+        return host, int(rest[1:]) if rest.startswith(":") else default_port
+    if value.count(":") == 1:
+        host, port = value.split(":")
+        return host, int(port)
+    return value, default_port
+
+
+def resolve_udp(host, port):
+    """Return ``(family, sockaddr)`` for a UDP server given by name or IPv4/IPv6 address."""
+    family, _, _, _, sockaddr = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+    return family, sockaddr
+
+
+def get_time_udp(ip, port, timeout=2):
+    """Perform one UDP exchange with the server and return a ``Sample``."""
+    family, addr = resolve_udp(ip, port)
+    with socket.socket(family, socket.SOCK_DGRAM) as s:
+        s.settimeout(timeout)
+        return exchange(s, addr, stamped=rxstamp.enable(s))
+
+
+def send_report(ip, port, offset, delay):
+    """Report a measured offset and delay (ns) to the server; fire and forget."""
+    family, addr = resolve_udp(ip, port)
+    with socket.socket(family, socket.SOCK_DGRAM) as s:
+        s.sendto(pack_report(time.time_ns(), offset, delay), addr)
@@ -0,0 +1,56 @@
+"""Kernel receive timestamps for UDP sockets.
+
+On Linux ``SO_TIMESTAMPNS`` makes the kernel attach the time a datagram
+arrived to every ``recvmsg``. Timestamps taken in Python after the read
+returns also include socket queueing, GIL contention and thread
+scheduling; the kernel value does not. Elsewhere ``enable`` returns False
+and callers keep their user-space timestamps.
+
+Kernel stamps are ``CLOCK_REALTIME``. Callers turn them into an *age*
+(how long ago the datagram arrived) and subtract that from their own
+clock, so this also works with clocks other than the system one.
+"""
+import socket
+import struct
+import sys
+import time
+
+# not exported by the socket module; 35 is the asm-generic value used by x86, ARM and most others
+SO_TIMESTAMPNS = getattr(socket, "SO_TIMESTAMPNS", 35) if sys.platform.startswith("linux") else None
+
+_TIMESPEC = struct.Struct("@ll")
+ANCILLARY_SIZE = socket.CMSG_SPACE(_TIMESPEC.size) if hasattr(socket, "CMSG_SPACE") else 0
+
+
+def enable(sock):
+    """Turn on kernel receive timestamps for ``sock``; returns whether they are available."""
+    if SO_TIMESTAMPNS is None or not ANCILLARY_SIZE:
+        return False
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_TIMESTAMPNS, 1)
+    except OSError:
+        return False
+    return True
+
+
+def recv_stamped(sock, bufsize):
+    """``recvfrom`` that also returns the kernel receive time in ns (or None)."""
+    data, ancdata, _, addr = sock.recvmsg(bufsize, ANCILLARY_SIZE)
+    return data, addr, kernel_time(ancdata)
+
+
+def kernel_time(ancdata):
+    """Kernel receive time in ns from ``recvmsg`` ancillary data, or None."""
+    for level, kind, cdata in ancdata:
+        if level == socket.SOL_SOCKET and kind == SO_TIMESTAMPNS and len(cdata) >= _TIMESPEC.size:
+            sec, nsec = _TIMESPEC.unpack_from(cdata)
+            return sec * 1_000_000_000 + nsec
+    return None
+
+
+def age_ns(kernel_ns):
+    """Nanoseconds since ``kernel_ns``; 0 if unknown or implausible (clock stepped)."""
+    if kernel_ns is None:
+        return 0
+    age = time.time_ns() - kernel_ns
+    return age if 0 <= age < 1_000_000_000 else 0
@@ -0,0 +1,109 @@
+"""Burst sampling with NTP-style clock-filter selection."""
+import math
+import socket
+import time
+from collections import namedtuple
+
+from local_ntp.common import rxstamp
+from local_ntp.common.protocol import KissOfDeath, exchange, resolve_udp
+
+
+class SyncResult(namedtuple("SyncResult", "offset delay error jitter samples rejected lost retry_after",
+                            defaults=(0.0,))):
+    """Offset estimate from a burst, all times in nanoseconds.
+
+    ``offset`` is server minus client clock and lies within ``offset ± error``;
+    ``samples`` are the kept lowest-delay samples, best first, ``rejected`` the
+    discarded outliers and ``lost`` the number of unanswered requests.
+    ``retry_after`` is non-zero (seconds) if the server asked the client to
+    slow down part way through the burst.
+    """
+
+    __slots__ = ()
+
+
+def clock_filter(samples, keep=None, lost=0, retry_after=0.0):
+    """Select the lowest-delay samples and derive the offset estimate.
+
+    The offset of the minimum-delay sample is used, since queueing delay is
+    what corrupts offsets; half its delay bounds the error. Jitter is the RMS
+    offset difference of the other kept samples from the best one.
+    """
+    if not samples:
+        raise ValueError("no samples to filter")
+    ordered = sorted(samples, key=lambda s: s.delay)
+    if keep is None:
+        keep = max(1, (len(ordered) + 1) // 2)
+    kept, rejected = ordered[:keep], ordered[keep:]
+    best = kept[0]
+    offset = best.offset
+    if len(kept) > 1:
+        jitter = int(math.sqrt(sum((s.offset - offset) ** 2 for s in kept[1:]) / (len(kept) - 1)))
+    else:
+        jitter = 0
+    return SyncResult(offset, best.delay, max(best.delay, 0) // 2 + jitter, jitter,
+                      kept, rejected, lost, retry_after)
+
+
+def timestamp_jitter(samples):
+    """RMS spread of sample offsets with kernel and with user-space receive times.
+
+    Returns ``(kernel, user)`` in ns; they are equal when the samples carry
+    no kernel timestamps. The difference is the jitter the kernel stamps
+    remove on the client side.
+    """
+    if len(samples) < 2:
+        return 0, 0
+
+    def spread(offsets):
+        mean = sum(offsets) / len(offsets)
+        return int(math.sqrt(sum((o - mean) ** 2 for o in offsets) / len(offsets)))
+
+    kernel = [s.offset for s in samples]
+    user = [s.offset - s.rx_age / 2 for s in samples]
+    return spread(kernel), spread(user)
+
+
+def sample_burst(ip, port, count=8, interval=0.02, timeout=0.5, keep=None, clock=time.time_ns,
+                 pool=None):
+    """Send ``count`` requests ``interval`` seconds apart and filter them.
+
+    Requests go over UDP, or over a pooled TCP session when a
+    ``SessionPool`` is given as ``pool``. A kiss-o'-death reply ends the
+    burst early; it is raised as ``KissOfDeath`` if no sample was collected
+    before it. Raises ``TimeoutError`` if the server answered none of the
+    requests.
+    """
+    if pool is not None:
+        samples, lost, retry_after = _collect(lambda: pool.exchange(ip, port, clock), count, interval)
+    else:
+        family, addr = resolve_udp(ip, port)
+        with socket.socket(family, socket.SOCK_DGRAM) as s:
+            s.settimeout(timeout)
+            stamped = rxstamp.enable(s)
+            samples, lost, retry_after = _collect(lambda: exchange(s, addr, clock, stamped),
+                                                  count, interval)
+    if not samples:
+        raise TimeoutError(f"no replies from {ip}:{port}")
+    return clock_filter(samples, keep, lost, retry_after)
+
+
+def _collect(take, count, interval):
+    samples = []
+    lost = 0
+    retry_after = 0.0
+    for i in range(count):
+        if i:
+            time.sleep(interval)
+        try:
+            samples.append(take())
+        except socket.timeout:
+            lost += 1
+        except KissOfDeath as e:
+            if not samples:
+                raise
+            retry_after = e.retry_after
+            break
+        except ConnectionError:
+            lost += 1       # e.g. a pooled session the server reset: the next request reconnects
+    return samples, lost, retry_after
@@ -0,0 +1,350 @@
+"""Sampling several servers at once: health scores, failover and selection.
+
+``ServerPool`` keeps a ``ServerHealth`` record per configured server. Each
+poll sends a burst to the ``select`` best-scoring servers, with the
+requests interleaved in rounds, so a poll takes about as long as a single
+server's burst. The ``samples`` requests are split among those servers,
+so each server sees fewer of them.
+
+A server that answers nothing in a round is replaced by the next one in
+the ranking, or by the probe if it answered, for the remaining rounds. A
+dead server therefore costs one ``timeout``, once; after that its reach
+register keeps it out of the selection. With nothing to replace it, it
+keeps getting its rounds and the unanswered requests count as loss, so a
+single server survives a lost packet. Each poll also sends a single
+probe to the least recently polled unselected server. Nobody waits for
+the probe, and it is how a server that came back gets noticed. A
+kiss-o'-death reply benches a server for the back-off it asked for.
+
+The per-server offsets are combined as NTP does. Marzullo's algorithm
+finds the offset range that a majority of the ``offset ± error``
+intervals agree on. Servers outside that range (falsetickers) are dropped,
+and the rest are averaged, weighted by their error.
+
+Servers that score about as well as the best one are used in an order
+shuffled per pool. Clients of an evenly healthy fleet therefore spread
+over it instead of all picking the same fastest server.
+"""
+import math
+import random
+import selectors
+import socket
+import threading
+import time
+
+from local_ntp.common import protocol, rxstamp
+from local_ntp.common.protocol import KissOfDeath, resolve_udp
+from local_ntp.common.sampling import SyncResult, clock_filter
+
+SCORE_FLOOR_NS = 100_000    # so that loss still ranks servers when delays are all ~0 (loopback, LAN)
+
+
+class NoMajority(ValueError):
+    """The servers' offset intervals have no majority in common."""
+
+
+class ServerHealth:
+    """What a ``ServerPool`` has learned about one server.
+
+    ``delay`` and ``jitter`` (ns) are smoothed over polls. ``reach`` is
+    NTP's reach register of the last eight polls, and ``benched_until``
+    is the ``mono`` time a kiss-o'-death asked the client to wait for.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.family = None
+        self.addr = None
+        self.reach = 0          # bit 0 is the last poll
+        self.polls = 0
+        self.last_poll = 0.0
+        self.delay = None
+        self.jitter = 0
+        self.kods = 0
+        self.benched_until = 0.0
+        self.error = None
+
+    @property
+    def name(self):
+        return f"[{self.host}]:{self.port}" if ":" in self.host else f"{self.host}:{self.port}"
+
+    def __repr__(self):
+        return f"ServerHealth({self.name}, reach={self.reach:03o}, delay={self.delay}, jitter={self.jitter})"
+
+    def record(self, result, now):
+        """Account for a poll the server answered with ``result``."""
+        self.polls += 1
+        self.last_poll = now
+        self.reach = (self.reach << 1 | 1) & 0xFF
+        if self.delay is None:
+            self.delay, self.jitter = result.delay, result.jitter
+        else:
+            self.delay += (result.delay - self.delay) // 4
+            self.jitter += (result.jitter - self.jitter) // 4
+        self.error = None
+
+    def missed(self, now, error=None):
+        """Account for a poll the server did not answer."""
+        self.polls += 1
+        self.last_poll = now
+        self.reach = (self.reach << 1) & 0xFF
+        self.error = error
+
+    def kissed(self, retry_after, now):
+        self.kods += 1
+        self.last_poll = now
+        self.benched_until = now + retry_after
+
+    def score(self, now):
+        """Expected cost of using the server, lower is better.
+
+        Untried servers score 0, so they get tried. Servers that are
+        benched or have answered none of their last eight polls score
+        ``inf``. For the others it is delay plus four times jitter, divided
+        by the fraction of polls they answered.
+        """
+        if now < self.benched_until:
+            return math.inf
+        if not self.polls:
+            return 0.0
+        answered = bin(self.reach).count("1")
+        if not answered:
+            return math.inf
+        return (max(self.delay, 0) + 4 * self.jitter + SCORE_FLOOR_NS) * min(self.polls, 8) / answered
+
+
+def marzullo(intervals):
+    """``(count, low, high)`` for the range covered by the most ``(low, high)`` intervals."""
+    # at a shared point starts sort before ends, so touching intervals count as overlapping
+    edges = sorted([(low, -1) for low, _ in intervals] + [(high, 1) for _, high in intervals])
+    best = count = 0
+    low = high = None
+    for i, (x, kind) in enumerate(edges):
+        count -= kind
+        if count > best:
+            best, low, high = count, x, edges[i + 1][0]
+    return best, low, high
+
+
+def select_truechimers(results):
+    """Indices of the ``results`` whose ``offset ± error`` meets the majority's range.
+
+    Raises ``NoMajority`` if no range is shared by more than half of them.
+    """
+    intervals = [(r.offset - r.error, r.offset + r.error) for r in results]
+    count, low, high = marzullo(intervals)
+    if 2 * count <= len(results):
+        raise NoMajority(f"only {count} of {len(results)} servers agree on the time")
+    return [i for i, (lo, hi) in enumerate(intervals) if lo <= high and hi >= low]
+
+
+def combine(results):
+    """Merge per-server ``SyncResult``s into one, weighting offsets by ``1 / error``.
+
+    The error is the best server's error plus the weighted RMS spread of
+    the offsets, which also becomes the jitter if it exceeds the best
+    server's own.
+    """
+    weights = [1.0 / max(r.error, 1000) for r in results]
+    total = sum(weights)
+    offset = round(sum(w * r.offset for w, r in zip(weights, results)) / total)
+    spread = int(math.sqrt(sum(w * (r.offset - offset) ** 2 for w, r in zip(weights, results)) / total))
+    best = min(results, key=lambda r: r.error)
+    samples = sorted((s for r in results for s in r.samples), key=lambda s: s.delay)
+    rejected = [s for r in results for s in r.rejected]
+    return SyncResult(offset, best.delay, best.error + spread, max(best.jitter, spread), samples, rejected,
+                      sum(r.lost for r in results), max(r.retry_after for r in results))
+
+
+class ServerPool:
+    """Samples ``servers`` (``(host, port)`` pairs), spreading the load and skipping dead ones.
+
+    ``sample()`` returns a combined ``SyncResult`` and can stand in for
+    ``sample_burst`` as a ``DisciplineLoop`` sampler. The per-server
+    results of the last poll are in ``last`` (only servers that passed
+    selection) and ``falsetickers``.
+    """
+
+    def __init__(self, servers, select=3, samples=8, interval=0.02, timeout=0.5,
+                 tolerance_ns=1_000_000, clock=time.time_ns, mono=time.monotonic, seed=None):
+        if not servers:
+            raise ValueError("no servers given")
+        self.servers = [ServerHealth(host, port) for host, port in servers]
+        self.select = select
+        self.samples = samples
+        self.interval = interval
+        self.timeout = timeout
+        self.tolerance_ns = tolerance_ns
+        self.clock = clock
+        self.last = {}
+        self.falsetickers = []
+        self._mono = mono
+        rng = random.Random(seed)
+        self._preference = {h: rng.random() for h in self.servers}
+        self._last_t1 = 0
+        self._lock = threading.Lock()
+
+    def ranked(self, now=None):
+        """Servers best first; those close to the best in this pool's own shuffled order."""
+        now = self._mono() if now is None else now
+        scores = {h: h.score(now) for h in self.servers}
+        cutoff = 2 * min(scores.values()) + self.tolerance_ns
+        return sorted(self.servers, key=lambda h: (scores[h] > cutoff,
+                                                   scores[h] if scores[h] > cutoff else self._preference[h]))
+
+    def sample(self):
+        """Poll the best servers once; returns the combined ``SyncResult``.
+
+        Raises ``KissOfDeath`` if every server is benched or rate-limited
+        this poll, ``TimeoutError`` if none answered and ``NoMajority`` if
+        the answers disagree.
+        """
+        with self._lock:
+            return self._sample()
+
+    def _sample(self):
+        now = self._mono()
+        ranked = [h for h in self.ranked(now) if h.benched_until <= now]
+        if not ranked:
+            raise KissOfDeath(min(h.benched_until for h in self.servers) - now)
+        active, standby = ranked[:self.select], ranked[self.select:]
+        probe = min(standby, key=lambda h: h.last_poll) if standby else None
+        if probe is not None:
+            standby.remove(probe)
+        rounds = max(1, math.ceil(self.samples / min(self.select, len(self.servers))))
+        collected = {}
+        lost = {}
+        pending = {}        # echoed t1 -> server
+        given_up = set()
+        kissed = False
+        with selectors.DefaultSelector() as sel:
+            sockets = {}
+            try:
+                r = 0
+                while r < rounds and active:
+                    if r:
+                        time.sleep(self.interval)
+                    targets = active + [probe] if r == 0 and probe is not None else active
+                    for h in targets:
+                        collected.setdefault(h, [])
+                        lost.setdefault(h, 0)
+                        self._send(h, sel, sockets, pending)
+                    kissed |= self._receive(sel, pending, collected, set(active))
+                    for t1, h in list(pending.items()):
+                        if h is not probe:
+                            del pending[t1]
+                            lost[h] += 1
+                    # a server that has answered nothing yet is given up for this poll, if there
+                    # is one to replace it: a standby, or else a probe that answered
+                    promoted = False
+                    for h in list(active):
+                        benched = h.benched_until > now
+                        spare = standby or (probe is not None and collected[probe])
+                        if benched or (not collected[h] and spare):
+                            active.remove(h)
+                            if not benched:
+                                h.missed(self._mono(), h.error or "no reply")
+                                given_up.add(h)
+                            if standby:
+                                active.append(standby.pop(0))
+                                promoted = True
+                            elif spare:
+                                active.append(probe)
+                                probe = None
+                                promoted = True
+                    r += 1
+                    if promoted and r == rounds:
+                        rounds += 1
+            finally:
+                for s in sockets.values():
+                    s.close()
+
+        done = self._mono()
+        results = {}
+        for h, samples in collected.items():
+            benched = h.benched_until > now
+            if samples:
+                results[h] = clock_filter(samples, lost=lost[h])
+                if not benched:
+                    h.record(results[h], done)
+            elif not benched and h not in given_up:
+                h.missed(done, h.error or "no reply")
+        if probe in results and len(results) > 1:
+            del results[probe]      # one sample is enough to score a server, not to set the clock by
+        if not results:
+            if kissed:
+                raise KissOfDeath(min(h.benched_until for h in self.servers if h.benched_until > done) - done)
+            raise TimeoutError(f"no replies from {', '.join(h.name for h in ranked)}")
+
+        servers = list(results)
+        chosen = select_truechimers([results[h] for h in servers])
+        self.last = {servers[i]: results[servers[i]] for i in chosen}
+        self.falsetickers = [h for h in servers if h not in self.last]
+        combined = combine(list(self.last.values()))
+        extra = [s for h in self.falsetickers for s in results[h].samples]
+        if extra:
+            combined = combined._replace(rejected=combined.rejected + extra)
+        return combined
+
+    def _next_t1(self):
+        # the echoed t1 identifies the request, so it must never repeat
+        t1 = max(self.clock(), self._last_t1 + 1)
+        self._last_t1 = t1
+        return t1
+
+    def _send(self, h, sel, sockets, pending):
+        try:
+            if h.addr is None:
+                h.family, h.addr = resolve_udp(h.host, h.port)
+            s = sockets.get(h.family)
+            if s is None:
+                s = sockets[h.family] = socket.socket(h.family, socket.SOCK_DGRAM)
+                s.setblocking(False)
+                sel.register(s, selectors.EVENT_READ, rxstamp.enable(s))
+            t1 = self._next_t1()
+            s.sendto(protocol.pack_request(t1), h.addr)
+        except OSError as e:
+            h.error = str(e)
+            return
+        pending[t1] = h
+
+    def _receive(self, sel, pending, collected, waiting):
+        """Read replies until no server in ``waiting`` has a request pending, or ``timeout``.
+
+        Returns whether a kiss-o'-death arrived.
+        """
+        kissed = False
+        deadline = self._mono() + self.timeout
+        while any(h in waiting for h in pending.values()):
+            left = deadline - self._mono()
+            if left <= 0:
+                break
+            for key, _ in sel.select(left):
+                while True:
+                    try:
+                        if key.data:
+                            data, addr, kernel_ns = rxstamp.recv_stamped(key.fileobj, protocol.PACKET_SIZE + 1)
+                            t4 = self.clock() - rxstamp.age_ns(kernel_ns)
+                        else:
+                            data, addr = key.fileobj.recvfrom(protocol.PACKET_SIZE + 1)
+                            t4 = self.clock()
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    except OSError:
+                        break       # an ICMP error for one server; it shows as loss
+                    try:
+                        mode, stratum, flags, t1, t2, t3 = protocol.unpack(data)
+                    except ValueError:
+                        continue
+                    h = pending.get(t1)
+                    if h is None or mode != protocol.MODE_RESPONSE or addr[:2] != h.addr[:2]:
+                        continue
+                    del pending[t1]
+                    if flags & protocol.FLAG_RATE:
+                        h.kissed(t3 / 1e9, self._mono())
+                        waiting.discard(h)
+                        kissed = True
+                    else:
+                        collected[h].append(protocol.Sample(t1, t2, t3, t4, stratum))
+        return kissed
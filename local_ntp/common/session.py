@@ -0,0 +1,140 @@
+"""Persistent TCP time sessions and a client-side pool of them.
+
+After the text greeting a ``TimeServer`` with sessions enabled
+(``session_greeting`` > 0) keeps the connection open for binary request
+frames in the UDP packet format, so repeated sampling costs
+one round trip per sample instead of a connect, handshake and teardown.
+``SessionPool`` keeps sessions open between syncs and reconnects
+transparently when the server has closed an idle one.
+"""
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from local_ntp.common.protocol import (
+    FLAG_RATE, MODE_RESPONSE, PACKET_SIZE, SLOWDOWN, KissOfDeath, Sample, pack_request, unpack,
+)
+
+
+class TimeSession:
+    """One open connection to a time server answering request frames."""
+
+    def __init__(self, ip, port, timeout=2.0):
+        self.address = (ip, port)
+        self.sock = socket.create_connection((ip, port), timeout)
+        try:
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.greeting = self.sock.recv(64)
+            if self.greeting == SLOWDOWN:
+                raise KissOfDeath()
+            if not self.greeting:
+                raise ConnectionError("server closed the connection")
+        except BaseException:
+            self.sock.close()
+            raise
+        self.last_used = time.monotonic()
+
+    def exchange(self, clock=time.time_ns):
+        """Send one request frame and return the resulting ``Sample``."""
+        t1 = clock()
+        self.sock.sendall(pack_request(t1))
+        data = self._recv_frame()
+        t4 = clock()
+        self.last_used = time.monotonic()
+        mode, stratum, flags, echoed, t2, t3 = unpack(data)
+        if mode != MODE_RESPONSE or echoed != t1:
+            raise ConnectionError("unexpected reply on time session")
+        if flags & FLAG_RATE:
+            raise KissOfDeath(t3 / 1e9)
+        return Sample(t1, t2, t3, t4, stratum)
+
+    def _recv_frame(self):
+        data = self.sock.recv(PACKET_SIZE)
+        while len(data) < PACKET_SIZE:
+            chunk = self.sock.recv(PACKET_SIZE - len(data))
+            if not chunk:
+                raise ConnectionError("server closed the session")
+            data += chunk
+        return data
+
+    def close(self):
+        self.sock.close()
+
+
+class SessionPool:
+    """Idle ``TimeSession``s keyed by server address, safe to share between threads.
+
+    Sessions idle for longer than ``max_idle`` seconds are not reused: the
+    server will have closed them by then (see ``TimeServer.session_idle``).
+    """
+
+    def __init__(self, timeout=2.0, max_idle=60.0, max_per_server=4):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_per_server = max_per_server
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _take(self, address):
+        now = time.monotonic()
+        with self._lock:
+            sessions = self._idle.get(address, [])
+            while sessions:
+                session = sessions.pop()
+                if now - session.last_used < self.max_idle:
+                    return session
+                session.close()
+        return None
+
+    def _give(self, session):
+        with self._lock:
+            sessions = self._idle.setdefault(session.address, [])
+            if len(sessions) < self.max_per_server:
+                sessions.append(session)
+                return
+        session.close()
+
+    @contextmanager
+    def session(self, ip, port):
+        """Borrow a session to ``ip:port``; it is returned to the pool on success."""
+        session = self._take((ip, port)) or TimeSession(ip, port, self.timeout)
+        try:
+            yield session
+        except BaseException:
+            session.close()
+            raise
+        self._give(session)
+
+    def exchange(self, ip, port, clock=time.time_ns):
+        """Take one sample over a pooled session, reconnecting once if it went stale.
+
+        A kiss-o'-death is raised as is, without reconnecting.
+        """
+        session = self._take((ip, port))
+        if session is not None:
+            try:
+                sample = session.exchange(clock)
+            except KissOfDeath:
+                session.close()
+                raise               # a rate limit, not a stale session: reconnecting would not help
+            except (ConnectionError, socket.timeout, ValueError):
+                session.close()
+            else:
+                self._give(session)
+                return sample
+        with self.session(ip, port) as session:
+            return session.exchange(clock)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for sessions in idle.values():
+            for session in sessions:
+                session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
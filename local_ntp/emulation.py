@@ -0,0 +1,222 @@
+"""Accuracy benchmark under emulated network and clock conditions.
+
+Runs the real server and the real client sync path (``sample_burst`` and
+``Discipline``) on loopback, with two things emulated:
+
+* the client's clock is a ``SimulatedClock`` with an initial error and a
+  drift, measured against the server's own time source, so the true
+  offset is always known and the system clock is never touched;
+* requests and replies go through ``ImpairedLink``, a UDP proxy adding
+  one-way delay, asymmetry, jitter and loss.
+
+Each scenario reports the final offset error and how long the client took
+to get (and stay) within ``threshold``, as one JSON object per line::
+
+    python -m local_ntp.emulation
+    python -m local_ntp.emulation --scenario asymmetric --duration 10
+
+The defaults are sized to finish in seconds: polls come every
+``poll_interval`` seconds rather than minutes, so drifts worth seeing in a
+short run are larger than real oscillators'.
+"""
+import argparse
+import heapq
+import json
+import platform
+import random
+import selectors
+import socket
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from local_ntp.clock import Discipline, SimulatedClock
+from local_ntp.common.sampling import sample_burst
+from local_ntp.server import TimeServer
+
+
+class Scenario(namedtuple("Scenario", "name offset_ms drift_ppm delay_ms asymmetry_ms jitter_ms loss",
+                          defaults=(0.0, 0.0, 0.0, 0.0, 0.0, 0.0))):
+    """Clock and network conditions of one run.
+
+    ``offset_ms`` is the client clock's initial error, ``delay_ms`` the
+    one-way delay each way, ``asymmetry_ms`` extra delay on the way to the
+    server, ``jitter_ms`` a uniformly distributed extra delay per packet
+    and ``loss`` the probability of dropping a packet in either direction.
+    """
+
+    __slots__ = ()
+
+
+SCENARIOS = {s.name: s for s in (
+    Scenario("ideal", offset_ms=500.0),
+    Scenario("lan", offset_ms=500.0, delay_ms=0.3, jitter_ms=0.2),
+    Scenario("drift", offset_ms=500.0, drift_ppm=200.0, delay_ms=0.3, jitter_ms=0.2),
+    Scenario("asymmetric", offset_ms=500.0, delay_ms=1.0, asymmetry_ms=4.0),
+    Scenario("jittery", offset_ms=500.0, delay_ms=2.0, jitter_ms=10.0),
+    Scenario("lossy", offset_ms=500.0, delay_ms=1.0, jitter_ms=1.0, loss=0.3),
+)}
+
+
+class ImpairedLink:
+    """UDP proxy between one client and ``target``, impairing both directions.
+
+    Clients send to ``127.0.0.1:port``; datagrams are forwarded after
+    ``delay`` (+ ``asymmetry`` towards the server) plus up to ``jitter``
+    seconds, or dropped with probability ``loss``. Jitter can reorder
+    datagrams, as it would on a real network.
+    """
+
+    def __init__(self, target, delay=0.0, asymmetry=0.0, jitter=0.0, loss=0.0, seed=None):
+        self.target = target
+        self.delay = delay
+        self.asymmetry = asymmetry
+        self.jitter = jitter
+        self.loss = loss
+        self.forwarded = 0
+        self.dropped = 0
+        self._rng = random.Random(seed)
+        self._front = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._front.bind(("127.0.0.1", 0))
+        self._back = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._back.connect(target)
+        self.port = self._front.getsockname()[1]
+        self._client = None
+        self._queue = []        # (due, seq, upstream, data)
+        self._seq = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ImpairedLink", daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._front.close()
+        self._back.close()
+
+    def _enqueue(self, data, upstream):
+        if self._rng.random() < self.loss:
+            self.dropped += 1
+            return
+        delay = self.delay + (self.asymmetry if upstream else 0.0) + self._rng.uniform(0.0, self.jitter)
+        self._seq += 1
+        heapq.heappush(self._queue, (time.monotonic() + delay, self._seq, upstream, data))
+
+    def _run(self):
+        with selectors.DefaultSelector() as sel:
+            sel.register(self._front, selectors.EVENT_READ, True)
+            sel.register(self._back, selectors.EVENT_READ, False)
+            while not self._stop.is_set():
+                timeout = 0.05
+                if self._queue:
+                    timeout = max(0.0, min(timeout, self._queue[0][0] - time.monotonic()))
+                for key, _ in sel.select(timeout):
+                    try:
+                        if key.data:
+                            data, self._client = key.fileobj.recvfrom(2048)
+                        else:
+                            data = key.fileobj.recv(2048)
+                    except OSError:
+                        continue
+                    self._enqueue(data, key.data)
+                now = time.monotonic()
+                while self._queue and self._queue[0][0] <= now:
+                    _, _, upstream, data = heapq.heappop(self._queue)
+                    try:
+                        if upstream:
+                            self._back.send(data)
+                        elif self._client is not None:
+                            self._front.sendto(data, self._client)
+                        self.forwarded += 1
+                    except OSError:
+                        self.dropped += 1
+
+
+def convergence_time(errors, threshold_ns):
+    """First time after which every ``(t, error)`` stays within ``threshold_ns``, or None."""
+    converged = None
+    for t, error in errors:
+        if abs(error) > threshold_ns:
+            converged = None
+        elif converged is None:
+            converged = t
+    return converged
+
+
+def run_scenario(scenario, duration=5.0, poll_interval=0.25, samples=8, threshold_ms=1.0, seed=1):
+    """Run one scenario against a fresh loopback server; returns a report dict."""
+    server = TimeServer(host="127.0.0.1", rate_limit=None, ipv6_discovery=False)
+    server.start(0)
+    link = ImpairedLink(("127.0.0.1", server.port), scenario.delay_ms / 1e3,
+                        scenario.asymmetry_ms / 1e3, scenario.jitter_ms / 1e3, scenario.loss, seed)
+    link.start()
+    # the server's time is the truth: the simulated clock's error is the true offset error
+    clock = SimulatedClock(int(scenario.offset_ms * 1e6), scenario.drift_ppm,
+                           reference=server.source.now_ns)
+    discipline = Discipline(clock, min_freq_interval_ns=int(poll_interval * 1e9))
+    timeout = max(0.05, 4 * (2 * scenario.delay_ms + scenario.asymmetry_ms + scenario.jitter_ms) / 1e3)
+    errors = []
+    polls = failures = 0
+    start = time.monotonic()
+    try:
+        while time.monotonic() - start < duration:
+            polls += 1
+            try:
+                result = sample_burst("127.0.0.1", link.port, count=samples, interval=0.002,
+                                      timeout=timeout, clock=clock.now_ns)
+                discipline.update(result.offset)
+            except OSError:
+                failures += 1
+            time.sleep(poll_interval)
+            errors.append((time.monotonic() - start, clock.error_ns))
+    finally:
+        link.stop()
+        server.stop()
+
+    tail = [abs(e) for _, e in errors[-max(1, len(errors) // 4):]]
+    converged = convergence_time(errors, threshold_ms * 1e6)
+    return {
+        "scenario": scenario.name,
+        "conditions": scenario._asdict(),
+        "duration_s": round(time.monotonic() - start, 3),
+        "polls": polls,
+        "failed_polls": failures,
+        "packets_dropped": link.dropped,
+        "final_error_ms": round(errors[-1][1] / 1e6, 4) if errors else None,   # client ahead: positive
+        "tail_max_error_ms": round(max(tail) / 1e6, 4) if errors else None,
+        "freq_ppm": round(discipline.freq_ppm, 3),
+        "threshold_ms": threshold_ms,
+        "converged_s": None if converged is None else round(converged, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m local_ntp.emulation")
+    parser.add_argument("--scenario", choices=tuple(SCENARIOS) + ("all",), default="all")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario")
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--samples", type=int, default=8, help="requests per poll")
+    parser.add_argument("--threshold-ms", type=float, default=1.0,
+                        help="error bound for the convergence time")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    names = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    for name in names:
+        report = run_scenario(SCENARIOS[name], args.duration, args.poll_interval, args.samples,
+                              args.threshold_ms, args.seed)
+        report["python"] = platform.python_version()
+        report["platform"] = sys.platform
+        print(json.dumps(report), flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,252 @@
+"""Non-blocking log pipeline.
+
+Hot paths call ``EventLog.emit`` which only appends a tuple to a bounded
+deque (``append``/``popleft`` are atomic, so no lock is taken) and never
+formats anything. A consumer drains records in batches: a GUI on a timer
+(into a ``LogBuffer`` shown by ``local_ntp.ui``), ``LogPump`` feeding a
+file sink in a background thread, or nobody at all.
+When the queue is full new records are counted as dropped instead of
+blocking the caller.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+DEFAULT_CAPACITY = 10000
+
+
+def format_record(record, with_time=False):
+    """Render a ``(timestamp, msg, args)`` record as a line of text."""
+    t, msg, args = record
+    if args:
+        args = tuple(a.decode("ascii", "replace") if isinstance(a, bytes) else a for a in args)
+        try:
+            msg = msg % args
+        except (TypeError, ValueError):
+            msg = f"{msg} {args!r}"
+    if with_time:
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t))
+        return f"{stamp}.{int(t * 1000) % 1000:03d} {msg}"
+    return msg
+
+
+class EventLog:
+    """Bounded queue of log records with emitted/dropped counters."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.emitted = 0
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._queue = deque()
+
+    def emit(self, msg, *args):
+        """Queue a record; ``msg % args`` is applied later by the consumer."""
+        if len(self._queue) >= self.capacity:
+            self.dropped += 1
+            return
+        self._queue.append((time.time(), msg, args))
+        self.emitted += 1
+
+    def __len__(self):
+        return len(self._queue)
+
+    def drain(self, limit=1000):
+        """Remove and return up to ``limit`` queued records, oldest first."""
+        out = []
+        popleft = self._queue.popleft
+        try:
+            for _ in range(limit):
+                out.append(popleft())
+        except IndexError:
+            pass
+        return out
+
+    def drain_lines(self, limit=1000, with_time=False):
+        """Drain and format records, noting any drops since the last call."""
+        lines = [format_record(r, with_time) for r in self.drain(limit)]
+        dropped = self.dropped
+        if dropped != self._reported_dropped:
+            lines.append(f"[LOG] Пропущено записей: {dropped - self._reported_dropped}")
+            self._reported_dropped = dropped
+        return lines
+
+
+class RotatingFileSink:
+    """Appends batches of lines to a file, rotating it at ``max_bytes``."""
+
+    def __init__(self, path, max_bytes=1_000_000, backup_count=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __call__(self, lines):
+        if not lines:
+            return
+        text = "\n".join(lines) + "\n"
+        size = self._file.tell()
+        if size and size + len(text) > self.max_bytes:
+            self._rotate()
+        self._file.write(text)
+        self._file.flush()
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self._file.close()
+
+
+class LogBuffer:
+    """The last ``capacity`` log lines, optionally filtered, for a log view.
+
+    Lines live in a fixed ring, so memory does not grow with uptime. Views
+    address *rows*: the lines matching ``filter`` (all lines when it is
+    empty), oldest first. Adding lines evicts rows from the top and appends
+    rows at the bottom; ``evicted`` tells a view beforehand how many rows a
+    batch will push out so that it can announce the change first.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._ring = [None] * capacity
+        self._first = 0     # sequence number of the oldest line kept
+        self._next = 0      # sequence number of the next line
+        self._needle = ""
+        self._rows = []     # sequence numbers of matching lines, when filtering
+        self._skip = 0      # leading entries of _rows already evicted
+
+    @property
+    def filter(self):
+        return self._needle
+
+    def __len__(self):
+        if self._needle:
+            return len(self._rows) - self._skip
+        return self._next - self._first
+
+    def __getitem__(self, row):
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        seq = self._rows[self._skip + row] if self._needle else self._first + row
+        return self._ring[seq % self.capacity]
+
+    def matches(self, line):
+        return not self._needle or self._needle in line.lower()
+
+    def evicted(self, count):
+        """Rows that adding ``count`` lines will remove from the top."""
+        excess = self._next + min(count, self.capacity) - self._first - self.capacity
+        if excess <= 0:
+            return 0
+        if not self._needle:
+            return excess
+        return bisect_left(self._rows, self._first + excess, self._skip) - self._skip
+
+    def make_room(self, count):
+        """Evict the lines that adding ``count`` more would push out."""
+        excess = self._next + min(count, self.capacity) - self._first - self.capacity
+        if excess <= 0:
+            return
+        self._first += excess
+        if self._needle:
+            self._skip = bisect_left(self._rows, self._first, self._skip)
+            if self._skip > len(self._rows) // 2:
+                del self._rows[:self._skip]
+                self._skip = 0
+
+    def extend(self, lines):
+        """Append ``lines`` (only the last ``capacity`` are kept); returns rows added."""
+        lines = lines[-self.capacity:]
+        self.make_room(len(lines))
+        ring, capacity, needle = self._ring, self.capacity, self._needle
+        seq = self._next
+        added = 0
+        for line in lines:
+            ring[seq % capacity] = line
+            if not needle:
+                added += 1
+            elif needle in line.lower():
+                self._rows.append(seq)
+                added += 1
+            seq += 1
+        self._next = seq
+        return added
+
+    def set_filter(self, text):
+        """Show only lines containing ``text`` (case-insensitive); rows change completely."""
+        self._needle = text.lower()
+        self._skip = 0
+        if self._needle:
+            ring, capacity, needle = self._ring, self.capacity, self._needle
+            self._rows = [seq for seq in range(self._first, self._next)
+                          if needle in ring[seq % capacity].lower()]
+        else:
+            self._rows = []
+
+    def find(self, text, start=0, backwards=False):
+        """Row of the next line containing ``text`` from ``start`` (wrapping), or -1."""
+        text = text.lower()
+        n = len(self)
+        if not text or not n:
+            return -1
+        step = -1 if backwards else 1
+        for i in range(n):
+            row = (start + i * step) % n
+            if text in self[row].lower():
+                return row
+        return -1
+
+    def clear(self):
+        self._first = self._next
+        self._rows = []
+        self._skip = 0
+
+
+class LogPump:
+    """Background thread draining an ``EventLog`` into a sink every ``interval``."""
+
+    def __init__(self, events, sink, interval=0.25, with_time=True):
+        self.events = events
+        self.sink = sink
+        self.interval = interval
+        self.with_time = with_time
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="LogPump", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the thread after delivering everything still queued."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def flush(self):
+        while True:
+            lines = self.events.drain_lines(with_time=self.with_time)
+            if not lines:
+                return
+            self.sink(lines)
+            if not len(self.events):
+                return
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+        self.flush()
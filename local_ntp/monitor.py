@@ -0,0 +1,254 @@
+"""Concurrent probe of many time servers.
+
+Every sweep sends a few binary UDP requests to each server from one
+socket per address family and collects the replies as they come, so a
+sweep of the whole fleet takes about one round trip plus the time to send
+at ``rate`` packets per second, not a round trip per server. Each server
+is reported with the filtered offset, delay and jitter of its samples and
+an NTP-style reachability register of the last eight sweeps::
+
+    python -m local_ntp.monitor 10.0.0.5 10.0.0.6:4000 --interval 10
+    python -m local_ntp.monitor --file servers.txt --format table
+
+JSON lines (one object per server per sweep) are the default when the
+output is not a terminal.
+"""
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import time
+
+from local_ntp.common import protocol
+from local_ntp.common.sampling import clock_filter
+
+
+class Target:
+    """One monitored server and the state carried between sweeps."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.addr = None
+        self.family = None
+        self.reach = 0          # bit 0 is the last sweep, as NTP's reach register
+        self.samples = []
+        self.kod = False
+        self.error = None
+
+    @property
+    def name(self):
+        return f"[{self.host}]:{self.port}" if ":" in self.host else f"{self.host}:{self.port}"
+
+
+class _Probe(asyncio.DatagramProtocol):
+    def __init__(self, monitor):
+        self.monitor = monitor
+
+    def datagram_received(self, data, addr):
+        self.monitor._received(data, addr, self.monitor.clock())
+
+    def error_received(self, exc):
+        pass    # an ICMP error for one server must not end the sweep; it shows as loss
+
+
+class Monitor:
+    """Probes ``targets`` (``(host, port)`` pairs) concurrently, sweep by sweep."""
+
+    def __init__(self, targets, samples=4, timeout=1.0, rate=1000.0, clock=time.time_ns):
+        self.targets = [Target(host, port) for host, port in targets]
+        self.samples = samples
+        self.timeout = timeout
+        self.rate = rate
+        self.clock = clock
+        self._transports = {}
+        self._pending = {}      # echoed t1 -> target
+        self._done = None
+        self._last_t1 = 0
+
+    async def _resolve(self, loop, target):
+        try:
+            infos = await loop.getaddrinfo(target.host, target.port, type=socket.SOCK_DGRAM)
+        except OSError as e:
+            target.error = str(e)
+            return
+        target.family, _, _, _, target.addr = infos[0]
+
+    async def _transport(self, loop, family):
+        transport = self._transports.get(family)
+        if transport is None:
+            local = ("::", 0) if family == socket.AF_INET6 else ("0.0.0.0", 0)
+            transport, _ = await loop.create_datagram_endpoint(lambda: _Probe(self), local_addr=local)
+            self._transports[family] = transport
+        return transport
+
+    def _received(self, data, addr, t4):
+        try:
+            mode, stratum, flags, t1, t2, t3 = protocol.unpack(data)
+        except ValueError:
+            return
+        target = self._pending.get(t1)
+        if target is None or mode != protocol.MODE_RESPONSE or addr[:2] != target.addr[:2]:
+            return
+        del self._pending[t1]
+        if flags & protocol.FLAG_RATE:
+            target.kod = True
+        else:
+            target.samples.append(protocol.Sample(t1, t2, t3, t4, stratum))
+        if not self._pending and self._done is not None:
+            self._done.set()
+
+    def _next_t1(self):
+        # the echoed t1 identifies the request, so it must never repeat
+        t1 = max(self.clock(), self._last_t1 + 1)
+        self._last_t1 = t1
+        return t1
+
+    async def sweep(self):
+        """Probe every target once; returns a report dict per target."""
+        loop = asyncio.get_running_loop()
+        unresolved = [t for t in self.targets if t.addr is None]
+        if unresolved:
+            await asyncio.gather(*(self._resolve(loop, t) for t in unresolved))
+        live = [t for t in self.targets if t.addr is not None]
+        for target in live:
+            target.samples = []
+            target.kod = False
+            target.error = None
+        self._done = asyncio.Event()
+        started = time.monotonic()
+        sent = 0
+        for _ in range(self.samples):
+            for target in live:
+                transport = await self._transport(loop, target.family)
+                t1 = self._next_t1()
+                self._pending[t1] = target
+                try:
+                    transport.sendto(protocol.pack_request(t1), target.addr)
+                except OSError as e:
+                    del self._pending[t1]
+                    target.error = str(e)
+                sent += 1
+                ahead = sent / self.rate - (time.monotonic() - started)
+                if ahead > 0.001:
+                    await asyncio.sleep(ahead)
+        if self._pending:
+            try:
+                await asyncio.wait_for(self._done.wait(), self.timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._pending.clear()
+        self._done = None
+        return [self._report(t) for t in self.targets]
+
+    def _report(self, target):
+        ok = bool(target.samples)
+        target.reach = (target.reach << 1 | ok) & 0xFF
+        report = {
+            "server": target.name,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "reachable": ok,
+            "reach": f"{target.reach:03o}",
+            "offset_ms": None,
+            "delay_ms": None,
+            "jitter_ms": None,
+            "stratum": None,
+            "lost": self.samples - len(target.samples) if target.addr is not None else self.samples,
+        }
+        if ok:
+            result = clock_filter(target.samples)
+            report.update(offset_ms=round(result.offset / 1e6, 3), delay_ms=round(result.delay / 1e6, 3),
+                          jitter_ms=round(result.jitter / 1e6, 3),
+                          stratum=min(s.stratum for s in target.samples))
+        if target.kod:
+            report["kod"] = True
+        if target.error is not None:
+            report["error"] = target.error
+        return report
+
+    async def run(self, interval=10.0, count=0, on_sweep=None):
+        """Sweep every ``interval`` seconds, ``count`` times (0: until cancelled)."""
+        loop = asyncio.get_running_loop()
+        next_sweep = loop.time()
+        done = 0
+        try:
+            while True:
+                reports = await self.sweep()
+                if on_sweep is not None:
+                    on_sweep(reports)
+                done += 1
+                if count and done >= count:
+                    return
+                next_sweep += interval
+                await asyncio.sleep(max(0.0, next_sweep - loop.time()))
+        finally:
+            self.close()
+
+    def close(self):
+        for transport in self._transports.values():
+            transport.close()
+        self._transports.clear()
+
+
+def format_table(reports):
+    """Render one sweep as a fixed-width text table."""
+    def num(value, fmt="{:+.3f}"):
+        return "-" if value is None else fmt.format(value)
+
+    width = max([len("сервер")] + [len(r["server"]) for r in reports])
+    lines = [f"{'сервер':<{width}}  reach  страта  смещение, мс  задержка, мс  джиттер, мс  потеряно"]
+    for r in reports:
+        status = " KoD" if r.get("kod") else (f" {r['error']}" if "error" in r else "")
+        lines.append(f"{r['server']:<{width}}  {r['reach']:>5}  {num(r['stratum'], '{}'):>6}  "
+                     f"{num(r['offset_ms']):>12}  {num(r['delay_ms'], '{:.3f}'):>12}  "
+                     f"{num(r['jitter_ms'], '{:.3f}'):>11}  {r['lost']:>8}{status}")
+    reachable = sum(r["reachable"] for r in reports)
+    lines.append(f"доступно {reachable} из {len(reports)}, {time.strftime('%H:%M:%S')}")
+    return "\n".join(lines)
+
+
+def _read_servers(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.split("#", 1)[0].strip() for line in f if line.split("#", 1)[0].strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m local_ntp.monitor")
+    parser.add_argument("servers", nargs="*", metavar="HOST[:PORT]")
+    parser.add_argument("--file", help="read servers from a file, one per line")
+    parser.add_argument("--port", type=int, default=12345, help="port for servers given without one")
+    parser.add_argument("--interval", type=float, default=10.0, help="seconds between sweeps")
+    parser.add_argument("--count", type=int, default=0, help="number of sweeps (default: forever)")
+    parser.add_argument("--samples", type=int, default=4, help="requests per server per sweep")
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--rate", type=float, default=1000.0, help="request packets per second")
+    parser.add_argument("--format", choices=("json", "table"),
+                        default="table" if sys.stdout.isatty() else "json")
+    args = parser.parse_args(argv)
+
+    servers = list(args.servers)
+    if args.file:
+        servers += _read_servers(args.file)
+    if not servers:
+        parser.error("no servers given")
+    monitor = Monitor([protocol.parse_address(s, args.port) for s in servers],
+                      args.samples, args.timeout, args.rate)
+
+    def show(reports):
+        if args.format == "json":
+            for report in reports:
+                print(json.dumps(report, ensure_ascii=False))
+        else:
+            print("\x1b[H\x1b[J" + format_table(reports))
+        sys.stdout.flush()
+
+    try:
+        asyncio.run(monitor.run(args.interval, args.count, show))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
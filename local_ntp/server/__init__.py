@@ -0,0 +1,4 @@
+from local_ntp.server.core import DISCOVER_REQUEST, DISCOVER_RESPONSE, TimeServer
+from local_ntp.server.timesource import TimeSource
+
+__all__ = ["DISCOVER_REQUEST", "DISCOVER_RESPONSE", "TimeServer", "TimeSource"]
@@ -0,0 +1,45 @@
+import argparse
+
+from local_ntp.server.daemon import Daemon
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m local_ntp.server")
+    parser.add_argument("--config", help="JSON settings file (see server_settings.sample.json)")
+    parser.add_argument("--host", help="address to bind (default: all)")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--log-file", help="write the log to a rotating file instead of stdout")
+    parser.add_argument("--quiet", action="store_true", default=None, help="discard the log")
+    parser.add_argument("--workers", type=int,
+                        help="number of worker processes sharing the port (SO_REUSEPORT)")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+    parser.add_argument("--upstream", metavar="HOST[:PORT]",
+                        help="relay mode: follow this Local-NTP server instead of the system clock")
+    parser.add_argument("--beacon-interval", type=float, metavar="SECONDS",
+                        help="multicast a time beacon every SECONDS")
+    parser.add_argument("--ntp-port", type=int,
+                        help="also answer standard NTPv4 clients on this UDP port (e.g. 123)")
+    parser.add_argument("--session-greeting", type=float, metavar="SECONDS",
+                        help="keep TCP connections open SECONDS after the greeting for session clients")
+    args = parser.parse_args(argv)
+
+    overrides = {
+        "host": args.host,
+        "port": args.port,
+        "log_file": args.log_file,
+        "quiet": args.quiet,
+        "workers": args.workers,
+        "metrics_port": args.metrics_port,
+        "upstream": args.upstream,
+        "beacon_interval": args.beacon_interval,
+        "ntp_port": args.ntp_port,
+        "session_greeting": args.session_greeting,
+    }
+    daemon = Daemon(args.config, overrides)
+    daemon.install_signal_handlers()
+    return daemon.run()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
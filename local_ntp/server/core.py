@@ -0,0 +1,595 @@
+import asyncio
+import os
+import socket
+import sys
+import threading
+from time import perf_counter_ns
+
+from local_ntp.common import ntp, protocol, rxstamp
+from local_ntp.common.beacon import BEACON_GROUP, beacon_port_for, pack_beacon
+from local_ntp.common.discovery import DISCOVER_GROUP_V6, DISCOVER_REQUEST, DISCOVER_RESPONSE
+from local_ntp.eventlog import EventLog
+from local_ntp.server.metrics import Metrics, start_http_endpoint
+from local_ntp.server.ntp import NtpEndpoint, ntp_socket
+from local_ntp.server.ratelimit import ALLOW, KOD, RateLimiter
+from local_ntp.server.relay import STRATUM_UNSYNCED, Relay
+from local_ntp.server.telemetry import FleetTelemetry
+from local_ntp.server.timesource import TimeSource
+
+
+def _udp_socket(host, port, reuse_port=False):
+    """Create the broadcast-capable UDP socket used for discovery."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((host, port))
+    except Exception:
+        sock.close()
+        raise
+    sock.setblocking(False)
+    return sock
+
+
+def _udp6_multicast_socket(port, reuse_port=False):
+    """Create an IPv6 UDP socket joined to the discovery group on every interface."""
+    sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(("::", port))
+        group = socket.inet_pton(socket.AF_INET6, DISCOVER_GROUP_V6)
+        joined = 0
+        for index, _ in socket.if_nameindex():
+            try:
+                sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_JOIN_GROUP,
+                                group + index.to_bytes(4, sys.byteorder))
+                joined += 1
+            except OSError:
+                pass
+        if not joined:
+            raise OSError("could not join the IPv6 discovery group on any interface")
+    except Exception:
+        sock.close()
+        raise
+    sock.setblocking(False)
+    return sock
+
+
+class _TimeProtocol(asyncio.Protocol):
+    """Answers a TCP connection with the current UTC time.
+
+    The connection is closed right after the greeting, which is all plain
+    clients read. With sessions enabled (``session_greeting`` > 0) it is
+    kept open that many seconds for a request frame instead. A client that
+    sends binary request frames (the UDP packet format) in that window turns
+    the connection into a session: each frame is answered with a response
+    frame, and the session is closed after ``session_idle`` quiet seconds.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.host = None
+        self._buf = b""
+        self._out = bytearray(protocol.PACKET_SIZE)
+        self._loop = None
+        self._last = 0.0
+        self._timeout = server.session_greeting
+        self._timer = None
+
+    def connection_made(self, transport):
+        t0 = perf_counter_ns()
+        m = self.server.metrics
+        peer = transport.get_extra_info("peername")
+        limiter = self.server.limiter
+        if limiter is not None and peer:
+            verdict = limiter.check(peer[0], t0)
+            if verdict != ALLOW:
+                m.rate_limited += 1
+                if verdict == KOD:
+                    transport.write(protocol.SLOWDOWN)
+                    transport.close()
+                else:
+                    transport.abort()
+                return
+        now = self.server.source.text()
+        transport.write(now)
+        if self._timeout > 0:
+            self.transport = transport
+            self.host = peer[0] if peer else None
+            self._loop = loop = asyncio.get_running_loop()
+            self._last = loop.time()
+            self._timer = loop.call_later(self._timeout, self._check_idle)
+        else:
+            transport.close()
+        m.tcp_residence.observe(perf_counter_ns() - t0)
+        m.connections += 1
+        m.bytes_sent += len(now)
+        if peer:
+            m.last_seen[peer[0]] = m.tick
+        self.server.events.emit("[SERVER] Подключение от %s, отправлено UTC-время: %s",
+                                peer, now)
+
+    def data_received(self, data):
+        t0 = perf_counter_ns()
+        t2 = self.server.source.now_ns()
+        buf = self._buf + data if self._buf else data
+        size = protocol.PACKET_SIZE
+        end = len(buf) - len(buf) % size
+        m = self.server.metrics
+        limiter = self.server.limiter
+        for pos in range(0, end, size):
+            try:
+                mode, _, _, t1, _, _ = protocol.unpack(buf[pos:pos + size])
+            except ValueError:
+                mode = None
+            if mode != protocol.MODE_REQUEST:
+                m.errors += 1
+                self.transport.close()
+                return
+            if limiter is not None and self.host is not None:
+                verdict = limiter.check(self.host, t0)
+                if verdict != ALLOW:
+                    m.rate_limited += 1
+                    if verdict == KOD:
+                        self.transport.write(protocol.pack_kod(t1, int(limiter.retry_after * 1e9)))
+                        continue
+                    self.transport.abort()
+                    return
+            # stream transports may keep the buffer they are given: hand over a copy
+            self.server.source.write_response(self._out, t1, t2, self.server.stratum)
+            self.transport.write(bytes(self._out))
+            m.tcp_residence.observe(perf_counter_ns() - t0)
+            m.session_requests += 1
+            m.bytes_sent += size
+        self._buf = buf[end:]
+        self._timeout = self.server.session_idle
+        self._last = self._loop.time()
+
+    def connection_lost(self, exc):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _check_idle(self):
+        # one timer per connection, re-armed lazily instead of on every frame
+        loop = self._loop
+        remaining = self._last + self._timeout - loop.time()
+        if remaining > 0:
+            self._timer = loop.call_later(remaining, self._check_idle)
+        else:
+            self._timer = None
+            self.transport.close()
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    """Answers binary time requests and broadcast discovery packets."""
+
+    def __init__(self, server):
+        self.server = server
+        self.source = server.source
+        self.metrics = server.metrics
+        self.limiter = server.limiter
+        self.telemetry = server.telemetry
+        self.transport = None
+        self._out = bytearray(protocol.PACKET_SIZE)
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr, rx_age=0):
+        # ``rx_age``: ns since the kernel received the datagram, when known
+        t0 = perf_counter_ns() - rx_age
+        t2 = self.source.now_ns() - rx_age
+        m = self.metrics
+        limiter = self.limiter
+        if limiter is not None:
+            verdict = limiter.check(addr[0], t0)
+            if verdict != ALLOW:
+                m.rate_limited += 1
+                if verdict == KOD and protocol.is_time_packet(data):
+                    # discovery is never answered over the limit: replies would amplify a storm
+                    try:
+                        t1 = protocol.unpack(data)[3]
+                    except ValueError:
+                        return
+                    self.transport.sendto(protocol.pack_kod(t1, int(limiter.retry_after * 1e9)), addr)
+                return
+        if protocol.is_time_packet(data):
+            try:
+                mode, _, _, t1, offset, delay = protocol.unpack(data)
+            except ValueError:
+                m.errors += 1
+                return
+            if mode == protocol.MODE_REPORT:
+                if self.telemetry is not None:
+                    self.telemetry.record(addr[0], offset, delay, t2 / 1e9)
+            elif mode == protocol.MODE_REQUEST:
+                # datagram transports copy the payload if they have to queue it
+                n = self.source.write_response(self._out, t1, t2, self.server.stratum)
+                self.transport.sendto(self._out, addr)
+                m.udp_residence.observe(perf_counter_ns() - t0)
+                m.udp_requests += 1
+                m.bytes_sent += n
+                m.last_seen[addr[0]] = m.tick
+        elif data == DISCOVER_REQUEST:
+            if limiter is not None and limiter.shedding:
+                return
+            self.transport.sendto(DISCOVER_RESPONSE, addr)
+            m.discovery_packets += 1
+            m.bytes_sent += len(DISCOVER_RESPONSE)
+            self.server.events.emit("[SERVER] Получен broadcast-запрос от %s, отправлен ответ", addr)
+        else:
+            m.errors += 1
+
+    def error_received(self, exc):
+        self.metrics.errors += 1
+        self.server.events.emit("[SERVER][UDP] Ошибка: %s", exc)
+
+
+class _StampedEndpoint:
+    """Datagram transport that reads with ``recvmsg`` to get kernel receive times.
+
+    Stands in for the asyncio transport on sockets where ``rxstamp.enable``
+    succeeded. Replies are sent straight from the socket; if its send
+    buffer is full they are dropped and counted as errors instead of queued.
+    """
+
+    BATCH = 64  # datagrams per wake-up, so other callbacks still get a turn
+
+    def __init__(self, loop, sock, protocol):
+        self._loop = loop
+        self._sock = sock
+        self._protocol = protocol
+        self._metrics = protocol.metrics
+        protocol.connection_made(self)
+        loop.add_reader(sock.fileno(), self._read_ready)
+
+    def _read_ready(self):
+        recv = rxstamp.recv_stamped
+        sock = self._sock
+        received = self._protocol.datagram_received
+        observe = self._metrics.udp_rx_age.observe
+        for _ in range(self.BATCH):
+            try:
+                data, addr, kernel_ns = recv(sock, 2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                self._protocol.error_received(e)
+                return
+            age = rxstamp.age_ns(kernel_ns)
+            observe(age)
+            received(data, addr, age)
+
+    def sendto(self, data, addr):
+        try:
+            self._sock.sendto(data, addr)
+        except (BlockingIOError, InterruptedError):
+            self._metrics.errors += 1
+        except OSError as e:
+            self._protocol.error_received(e)
+
+    def get_extra_info(self, name, default=None):
+        return self._sock.getsockname() if name == "sockname" else default
+
+    def close(self):
+        if self._sock.fileno() >= 0:
+            self._loop.remove_reader(self._sock.fileno())
+            self._sock.close()
+
+
+class TimeServer:
+    """Time server running TCP, UDP time requests and discovery on one event loop.
+
+    ``start``/``stop`` drive the server from a background thread for the GUIs,
+    ``serve_forever`` runs it in the calling thread for headless use. Log
+    records go to ``events`` (an ``EventLog``) and are never formatted on
+    the request path; without one they are discarded.
+
+    With ``reuse_port`` the sockets are bound with ``SO_REUSEPORT`` so that
+    several processes can share the port (see ``workers.WorkerPool``).
+    Request metrics are kept in ``metrics`` and, when ``metrics_port`` is
+    set, served in Prometheus format on ``metrics_host:metrics_port``.
+    When bound to all interfaces the server also answers discovery sent to
+    the IPv6 multicast group ``DISCOVER_GROUP_V6``.
+
+    Each client address may send ``rate_limit`` requests per second with
+    bursts of ``rate_burst`` (``rate_limit=None`` disables the limit); see
+    ``ratelimit.RateLimiter``. When the event loop falls more than
+    ``shed_lag`` seconds behind, the server sheds load: discovery is
+    ignored and heavy senders are limited harder until it catches up.
+
+    TCP connections are closed right after the greeting unless sessions are
+    enabled with ``session_greeting`` > 0: the connection then stays open
+    that many seconds so that clients can continue with binary request
+    frames, and an active session lasts until ``session_idle`` seconds
+    without a frame. Sessions are off by default so that plain clients
+    reading until EOF are not held up and idle connections cost no file
+    descriptors.
+
+    Offsets reported by clients are kept in ``telemetry`` (a
+    ``FleetTelemetry`` for up to ``telemetry_clients`` addresses, None when
+    0) and served as JSON on ``/fleet`` next to ``/metrics``.
+
+    With ``kernel_timestamps`` (Linux) UDP requests are stamped with the
+    time the kernel received them rather than when Python got to them.
+
+    With ``upstream=(host, port)`` the server is a relay: instead of
+    following the system clock it disciplines its time against that server
+    every ``upstream_interval`` seconds and serves it one stratum further
+    down (see ``relay.Relay``).
+
+    With ``beacon_interval`` the server also sends a time beacon to
+    ``beacon_group`` (a multicast group or a broadcast address) every
+    ``beacon_interval`` seconds, HMAC-tagged with ``beacon_key`` if set;
+    see ``local_ntp.common.beacon``.
+
+    With ``ntp_port`` the server also answers standard NTPv4 clients on
+    that UDP port (``0`` picks a free one); see ``server.ntp``.
+    """
+
+    def __init__(self, events=None, host="", backlog=1024, source=None,
+                 resync_interval=60.0, reuse_port=False, metrics_port=None,
+                 metrics_host="127.0.0.1", ipv6_discovery=True, rate_limit=20.0,
+                 rate_burst=40, shed_lag=0.05, session_greeting=0.0, session_idle=120.0,
+                 telemetry_clients=4096, kernel_timestamps=True, upstream=None,
+                 upstream_interval=16.0, beacon_interval=None, beacon_group=BEACON_GROUP,
+                 beacon_port=None, beacon_key=None, beacon_ttl=1, ntp_port=None):
+        self.events = events if events is not None else EventLog(capacity=0)
+        self.host = host
+        self.backlog = backlog
+        self.source = source if source is not None else TimeSource()
+        self.resync_interval = resync_interval
+        self.reuse_port = reuse_port
+        self.metrics = Metrics()
+        self.telemetry = FleetTelemetry(telemetry_clients) if telemetry_clients else None
+        self.metrics.telemetry = self.telemetry
+        self.kernel_timestamps = kernel_timestamps
+        self.upstream = upstream
+        self.upstream_interval = upstream_interval
+        self.relay = None
+        self.stratum = STRATUM_UNSYNCED if upstream else 1
+        self.beacon_interval = beacon_interval
+        self.beacon_group = beacon_group
+        self.beacon_port = beacon_port
+        self.beacon_key = beacon_key
+        self.beacon_ttl = beacon_ttl
+        self.beacons_sent = 0
+        self.ntp_port = ntp_port
+        self.ntp_reference = 0
+        self.ntp_dispersion = 0
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
+        self.ipv6_discovery = ipv6_discovery
+        self.limiter = RateLimiter(rate_limit, rate_burst) if rate_limit else None
+        self.shed_lag = shed_lag
+        self.session_greeting = session_greeting
+        self.session_idle = session_idle
+        self.port = 12345
+        self.running = False
+        self.thread = None
+        self._loop = None
+        self._stop_event = None
+
+    def log(self, msg, *args):
+        self.events.emit(msg, *args)
+
+    def mark_synced(self, error_ns=0):
+        """Record when the time source was last set, and how well, for NTP replies."""
+        self.ntp_reference = ntp.ns_to_ntp(self.source.now_ns())
+        self.ntp_dispersion = ntp.seconds_to_short(error_ns / 1e9)
+
+    def stats(self):
+        """Return the request counters as a dict."""
+        return self.metrics.counters()
+
+    def start(self, port):
+        """Start serving on ``port`` in a background thread.
+
+        Returns once the sockets are bound; bind errors are re-raised here.
+        """
+        if self.running:
+            raise RuntimeError("server is already running")
+        self.port = port
+        ready = threading.Event()
+        errors = []
+
+        def run():
+            try:
+                self._run_loop(ready)
+            except BaseException as e:
+                errors.append(e)
+                ready.set()
+
+        self.thread = threading.Thread(target=run, name="TimeServer", daemon=True)
+        self.thread.start()
+        ready.wait()
+        if errors:
+            self.thread.join()
+            self.thread = None
+            raise errors[0]
+        self.log("[SERVER] Сервер запущен на порту %s", self.port)
+
+    def stop(self, timeout=5.0):
+        """Stop the server; returns as soon as the sockets are closed."""
+        loop = self._loop
+        if loop is not None and self._stop_event is not None:
+            try:
+                loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                pass
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        self.thread = None
+        self.running = False
+        self.log("[SERVER] Сервер остановлен")
+
+    def serve_forever(self, port):
+        """Run the server in the calling thread until ``stop`` is called."""
+        self.port = port
+        self._run_loop(None)
+
+    def _run_loop(self, ready):
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        try:
+            loop.run_until_complete(self.serve(ready))
+        finally:
+            self._loop = None
+            loop.close()
+
+    async def _housekeeping(self):
+        """Expire limiter entries, roll telemetry and advance the metrics tick
+        (pruning idle clients and refreshing the GUI summary) every second,
+        and periodically re-anchor the time source so deliberate clock
+        changes are followed (not in relay mode, where the upstream server
+        is followed instead)."""
+        loop = asyncio.get_running_loop()
+        next_resync = loop.time() + self.resync_interval
+        while True:
+            await asyncio.sleep(1.0)
+            if self.limiter is not None:
+                self.limiter.expire(perf_counter_ns())
+            if self.telemetry is not None:
+                self.telemetry.roll()
+            self.metrics.advance()
+            if self.relay is None and loop.time() >= next_resync:
+                next_resync += self.resync_interval
+                step = self.source.resync()
+                self.mark_synced()
+                if abs(step) >= 1_000_000:
+                    self.log("[SERVER] Системное время изменилось на %+.3f с", step / 1e9)
+
+    async def _watch_lag(self, period=0.02):
+        """Switch load shedding on while the loop lags behind its timers.
+
+        Lag is the clearest sign that the receive queues are backing up:
+        every queued datagram and connection is handled before the timer.
+        """
+        loop = asyncio.get_running_loop()
+        limiter = self.limiter
+        calm = 0
+        while True:
+            expected = loop.time() + period
+            await asyncio.sleep(period)
+            lag = loop.time() - expected
+            if lag > self.shed_lag:
+                calm = 0
+                if not limiter.shedding:
+                    limiter.shedding = True
+                    self.metrics.shedding = 1
+                    self.log("[SERVER] Перегрузка (задержка %.0f мс): включено ограничение нагрузки",
+                             lag * 1e3)
+            elif limiter.shedding:
+                calm += 1
+                if calm * period >= 1.0:
+                    limiter.shedding = False
+                    self.metrics.shedding = 0
+                    self.log("[SERVER] Нагрузка снизилась: ограничение выключено")
+
+    async def _send_beacons(self):
+        """Send a beacon every ``beacon_interval`` seconds on a fixed schedule."""
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, self.beacon_ttl)
+        if self.host:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(self.host))
+        sock.setblocking(False)
+        target = (self.beacon_group, self.beacon_port or beacon_port_for(self.port))
+        server_id = int.from_bytes(os.urandom(8), "big") >> 1
+        seq = 0
+        next_send = loop.time()
+        try:
+            while True:
+                seq += 1
+                data = pack_beacon(seq, server_id, self.source.now_ns(), self.stratum, self.beacon_key)
+                try:
+                    sock.sendto(data, target)
+                    self.beacons_sent += 1
+                except OSError as e:
+                    self.metrics.errors += 1
+                    self.log("[SERVER] Не удалось отправить маячок на %s: %s", target, e)
+                next_send += self.beacon_interval
+                await asyncio.sleep(max(0.0, next_send - loop.time()))
+        finally:
+            sock.close()
+
+    async def _open_udp(self, loop, sock):
+        if self.kernel_timestamps and rxstamp.enable(sock):
+            return _StampedEndpoint(loop, sock, _UdpProtocol(self))
+        transport, _ = await loop.create_datagram_endpoint(lambda: _UdpProtocol(self), sock=sock)
+        return transport
+
+    async def serve(self, ready=None):
+        """Serve until the stop event is set; ``ready`` is set once bound."""
+        loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        servers = []
+        transports = []
+        try:
+            tcp = await loop.create_server(
+                lambda: _TimeProtocol(self),
+                self.host or None,
+                self.port,
+                family=socket.AF_INET,
+                reuse_address=True,
+                reuse_port=self.reuse_port or None,
+                backlog=self.backlog,
+            )
+            servers.append(tcp)
+            if self.port == 0:
+                self.port = tcp.sockets[0].getsockname()[1]
+            transports.append(await self._open_udp(
+                loop, _udp_socket(self.host, self.port, self.reuse_port)))
+            if self.ntp_port is not None:
+                sock = ntp_socket(self.host, self.ntp_port, self.reuse_port)
+                stamped = self.kernel_timestamps and rxstamp.enable(sock)
+                transports.append(NtpEndpoint(self, loop, sock, stamped))
+                self.ntp_port = sock.getsockname()[1]
+            if self.ipv6_discovery and not self.host:
+                try:
+                    transports.append(await self._open_udp(
+                        loop, _udp6_multicast_socket(self.port, self.reuse_port)))
+                except OSError as e:
+                    self.log("[SERVER] Поиск по IPv6 недоступен: %s", e)
+            if self.metrics_port is not None:
+                http = await start_http_endpoint(self.metrics, self.metrics_host, self.metrics_port)
+                servers.append(http)
+                if self.metrics_port == 0:
+                    self.metrics_port = http.sockets[0].getsockname()[1]
+            if self.relay is None and self.upstream is None:
+                self.mark_synced()
+            self.running = True
+            if ready is not None:
+                ready.set()
+            tasks = [asyncio.ensure_future(self._housekeeping())]
+            if self.limiter is not None:
+                tasks.append(asyncio.ensure_future(self._watch_lag()))
+            if self.beacon_interval:
+                tasks.append(asyncio.ensure_future(self._send_beacons()))
+            if self.upstream is not None:
+                host, port = self.upstream
+                self.relay = Relay(self, host, port, self.upstream_interval)
+                tasks.append(asyncio.ensure_future(self.relay.run()))
+                self.log("[RELAY] Ретрансляция времени с %s:%s", host, port)
+            try:
+                await self._stop_event.wait()
+            finally:
+                for task in tasks:
+                    task.cancel()
+        finally:
+            self.running = False
+            for transport in transports:
+                transport.close()
+            for srv in servers:
+                srv.close()
+            for srv in servers:
+                await srv.wait_closed()
+            self.metrics.advance()      # leave the GUI the final counts
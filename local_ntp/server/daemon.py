@@ -0,0 +1,192 @@
+"""Headless server daemon: config file plus signal-driven reload and stop.
+
+Only the server core is imported here; GUI toolkits, ``ctypes`` and the
+multiprocessing worker pool (loaded only when ``workers`` > 1) stay out of
+the daemon's start-up path.
+"""
+import os
+import signal
+import sys
+import threading
+
+from local_ntp.common import load_settings
+from local_ntp.eventlog import DEFAULT_CAPACITY, EventLog, LogPump, RotatingFileSink
+from local_ntp.server.core import TimeServer
+from local_ntp.server.relay import parse_upstream
+
+DEFAULT_CONFIG = {
+    "host": "",
+    "port": 12345,
+    "workers": 1,
+    "metrics_port": None,
+    "log_file": None,
+    "quiet": False,
+    "upstream": None,
+    "upstream_interval": 16.0,
+    "beacon_interval": None,
+    "beacon_group": "239.255.12.3",
+    "beacon_key": None,
+    "ntp_port": None,
+    "session_greeting": 0.0,
+}
+
+
+def load_config(path=None, overrides=None):
+    """Merge defaults, the JSON config file at ``path`` and non-None ``overrides``."""
+    config = dict(DEFAULT_CONFIG)
+    if path:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"config file not found: {path}")
+        config.update({k: v for k, v in load_settings(path).items() if k in DEFAULT_CONFIG})
+    if overrides:
+        config.update({k: v for k, v in overrides.items() if v is not None})
+    for key in ("port", "workers"):
+        config[key] = int(config[key])
+    for key in ("metrics_port", "ntp_port"):
+        if config[key] is not None:
+            config[key] = int(config[key])
+    if config["upstream"]:
+        config["upstream"] = parse_upstream(config["upstream"], config["port"])
+    config["upstream_interval"] = float(config["upstream_interval"])
+    config["session_greeting"] = float(config["session_greeting"])
+    if config["beacon_interval"] is not None:
+        config["beacon_interval"] = float(config["beacon_interval"])
+    return config
+
+
+def _server_options(config):
+    """``TimeServer`` keyword arguments for every worker, and for the beacon sender."""
+    options = {"upstream": config["upstream"], "upstream_interval": config["upstream_interval"],
+               "ntp_port": config["ntp_port"], "session_greeting": config["session_greeting"]}
+    beacon = {}
+    if config["beacon_interval"]:
+        key = config["beacon_key"]
+        beacon = {"beacon_interval": config["beacon_interval"],
+                  "beacon_group": config["beacon_group"],
+                  "beacon_key": key.encode("utf-8") if key else None}
+    return options, beacon
+
+
+def _print_lines(lines):
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+
+class Daemon:
+    """Runs the server from a config file until stopped.
+
+    SIGHUP re-reads the config and applies it (a changed port or worker
+    count restarts the listeners, a changed log target swaps the sink);
+    SIGINT/SIGTERM stop the daemon.
+    """
+
+    def __init__(self, config_path=None, overrides=None):
+        self.config_path = config_path
+        self.overrides = overrides or {}
+        self.config = None
+        self.events = EventLog()
+        self.pump = LogPump(self.events, _print_lines)
+        self.server = None
+        self.pool = None
+        self._sink = None
+        self._wake = threading.Event()
+        self._reload = False
+        self._stop = False
+
+    def request_reload(self):
+        self._reload = True
+        self._wake.set()
+
+    def request_stop(self):
+        self._stop = True
+        self._wake.set()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGINT, lambda *_: self.request_stop())
+        signal.signal(signal.SIGTERM, lambda *_: self.request_stop())
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda *_: self.request_reload())
+
+    def run(self):
+        """Start serving and block until a stop is requested; returns an exit code."""
+        self.config = load_config(self.config_path, self.overrides)
+        self._apply_logging(self.config)
+        self.pump.start()
+        try:
+            self._start_listeners(self.config)
+            while not self._stop:
+                # short timeout: lock waits are not interrupted by signals on Windows
+                self._wake.wait(0.5)
+                self._wake.clear()
+                if self._reload and not self._stop:
+                    self._reload = False
+                    self.reload()
+        except Exception as e:
+            self.events.emit("[SERVER] Ошибка: %s", e)
+            return 1
+        finally:
+            self._stop_listeners()
+            self.pump.stop()
+            if self._sink is not None:
+                self._sink.close()
+        return 0
+
+    def reload(self):
+        """Re-read the config file and apply what changed."""
+        try:
+            new = load_config(self.config_path, self.overrides)
+        except Exception as e:
+            self.events.emit("[SERVER] Не удалось перечитать настройки: %s", e)
+            return
+        old, self.config = self.config, new
+        if (new["log_file"], new["quiet"]) != (old["log_file"], old["quiet"]):
+            self._apply_logging(new)
+        listen_keys = ("host", "port", "workers", "metrics_port", "upstream", "upstream_interval",
+                       "beacon_interval", "beacon_group", "beacon_key", "ntp_port", "session_greeting")
+        if any(new[k] != old[k] for k in listen_keys):
+            if (self.pool is not None and new["workers"] == old["workers"]
+                    and new["host"] == old["host"]):
+                self.pool.server_options, self.pool.beacon_options = _server_options(new)
+                self.pool.rollover(new["port"])
+            else:
+                self._stop_listeners()
+                self._start_listeners(new)
+        self.events.emit("[SERVER] Настройки перечитаны")
+
+    def _apply_logging(self, config):
+        old_sink = self._sink
+        if config["quiet"]:
+            self.events.capacity = 0
+            self._sink = None
+            self.pump.sink = lambda lines: None
+        else:
+            self.events.capacity = DEFAULT_CAPACITY
+            self._sink = RotatingFileSink(config["log_file"]) if config["log_file"] else None
+            self.pump.sink = self._sink or _print_lines
+        if old_sink is not None:
+            old_sink.close()
+
+    def _start_listeners(self, config):
+        options, beacon = _server_options(config)
+        if config["workers"] > 1:
+            from local_ntp.server.workers import WorkerPool
+
+            if config["metrics_port"] is not None:
+                self.events.emit("[SERVER] metrics_port %s не используется при workers > 1: "
+                                 "метрики процессов не публикуются", config["metrics_port"])
+            self.pool = WorkerPool(config["port"], config["workers"], host=config["host"],
+                                   events=self.events, server_options=options,
+                                   beacon_options=beacon)
+            self.pool.start()
+        else:
+            self.server = TimeServer(self.events, host=config["host"],
+                                     metrics_port=config["metrics_port"], **options, **beacon)
+            self.server.start(config["port"])
+
+    def _stop_listeners(self):
+        if self.server is not None:
+            self.server.stop()
+            self.server = None
+        if self.pool is not None:
+            self.pool.stop()
+            self.pool = None
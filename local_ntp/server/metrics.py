@@ -0,0 +1,208 @@
+"""Server metrics: plain integer counters and fixed-bucket histograms.
+
+Updates are attribute increments, one ``bisect`` per histogram
+observation and one dict store keyed by client address against a coarse
+``tick`` (advanced once a second by the server, so the request path does
+not read a clock for it): a few hundred nanoseconds per request in CPython. Metrics are
+rendered in the Prometheus text format on demand, by the optional HTTP
+endpoint of ``TimeServer``.
+
+Everything here belongs to the server's event loop thread. ``advance``
+runs there once a second: it prunes idle clients and renders the GUI
+summary, which other threads read through ``summary()`` without touching
+the live counters or dicts.
+"""
+import asyncio
+import json
+import time
+from bisect import bisect_left
+
+# Residence time bucket bounds, ns (10 us .. 100 ms)
+RESIDENCE_BUCKETS_NS = (10_000, 25_000, 50_000, 100_000, 250_000, 500_000,
+                        1_000_000, 2_500_000, 10_000_000, 100_000_000)
+
+
+class Histogram:
+    """Fixed-bucket histogram of nanosecond values."""
+
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds=RESIDENCE_BUCKETS_NS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bucket bound containing quantile ``q`` (0..1), ns; None if empty."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Request counters, residence-time histograms and active client tracking."""
+
+    COUNTERS = ("connections", "session_requests", "udp_requests", "ntp_requests",
+                "discovery_packets", "errors", "bytes_sent", "rate_limited")
+    _HELP = {
+        "connections": "TCP time connections served.",
+        "session_requests": "Request frames answered on persistent TCP sessions.",
+        "udp_requests": "Binary UDP time requests answered.",
+        "ntp_requests": "NTPv4 client requests answered.",
+        "discovery_packets": "CUSTONTP_DISCOVER packets answered.",
+        "errors": "Malformed packets and socket errors.",
+        "bytes_sent": "Payload bytes sent in replies.",
+        "rate_limited": "Requests refused by the per-client rate limit.",
+    }
+
+    def __init__(self, active_window=60.0):
+        self.connections = 0
+        self.session_requests = 0
+        self.udp_requests = 0
+        self.ntp_requests = 0
+        self.discovery_packets = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.rate_limited = 0
+        self.shedding = 0
+        self.tcp_residence = Histogram()
+        self.udp_residence = Histogram()
+        self.ntp_residence = Histogram()
+        self.udp_rx_age = Histogram()
+        self.active_window = active_window
+        self.tick = int(time.monotonic())
+        self.last_seen = {}
+        self.telemetry = None
+        self._summary = self._render_summary()
+
+    def advance(self):
+        """Update the coarse clock, prune idle clients and refresh the summary (loop thread)."""
+        self.tick = int(time.monotonic())
+        self.active_clients()
+        self._summary = self._render_summary()
+
+    def seen(self, host):
+        """Record activity from a client address (hot paths inline this)."""
+        self.last_seen[host] = self.tick
+
+    def active_clients(self):
+        """Distinct client addresses seen within ``active_window``; prunes older ones."""
+        cutoff = self.tick - self.active_window
+        stale = [h for h, t in self.last_seen.items() if t < cutoff]
+        for h in stale:
+            self.last_seen.pop(h, None)
+        return len(self.last_seen)
+
+    def counters(self):
+        return {name: getattr(self, name) for name in self.COUNTERS}
+
+    def summary(self):
+        """One-line human readable summary for the GUI, as of the last ``advance``; any thread."""
+        return self._summary
+
+    def _render_summary(self):
+        p99 = self.tcp_residence.quantile(0.99)
+        p99_udp = self.udp_residence.quantile(0.99)
+        return (f"TCP: {self.connections} (+{self.session_requests} в сессиях)  UDP: {self.udp_requests}  "
+                f"{f'NTP: {self.ntp_requests}  ' if self.ntp_requests else ''}"
+                f"discovery: {self.discovery_packets}  ошибок: {self.errors}  "
+                f"ограничено: {self.rate_limited}{' (перегрузка)' if self.shedding else ''}  "
+                f"клиентов: {len(self.last_seen)}  "
+                f"p99 TCP/UDP: {_fmt_ms(p99)}/{_fmt_ms(p99_udp)} мс{self._fleet_summary()}")
+
+    def _fleet_summary(self):
+        fleet = self.telemetry.latest if self.telemetry is not None else None
+        if not fleet or not fleet.clients:
+            return ""
+        return f"  парк: {fleet.clients}, |смещение| p95 {_fmt_ms(fleet.p95)} мс"
+
+    def render_prometheus(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        for name in self.COUNTERS:
+            metric = f"localntp_{name}_total"
+            lines.append(f"# HELP {metric} {self._HELP[name]}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {getattr(self, name)}")
+        lines.append("# HELP localntp_active_clients Distinct clients seen recently.")
+        lines.append("# TYPE localntp_active_clients gauge")
+        lines.append(f"localntp_active_clients {self.active_clients()}")
+        lines.append("# HELP localntp_shedding Whether the server is shedding load.")
+        lines.append("# TYPE localntp_shedding gauge")
+        lines.append(f"localntp_shedding {self.shedding}")
+        metric = "localntp_residence_seconds"
+        lines.append(f"# HELP {metric} Time from request arrival to reply send.")
+        lines.append(f"# TYPE {metric} histogram")
+        for path, hist in (("tcp", self.tcp_residence), ("udp", self.udp_residence),
+                           ("ntp", self.ntp_residence)):
+            _render_histogram(lines, metric, f'path="{path}"', hist)
+        if self.udp_rx_age.count:
+            metric = "localntp_udp_rx_queue_seconds"
+            lines.append(f"# HELP {metric} Time from kernel receive to Python handling a UDP request.")
+            lines.append(f"# TYPE {metric} histogram")
+            _render_histogram(lines, metric, "", hist=self.udp_rx_age)
+        if self.telemetry is not None:
+            lines.append(self.telemetry.render_prometheus())
+        return "\n".join(lines) + "\n"
+
+
+def _render_histogram(lines, metric, labels, hist):
+    sep = "," if labels else ""
+    cumulative = 0
+    for bound, n in zip(hist.bounds, hist.counts):
+        cumulative += n
+        lines.append(f'{metric}_bucket{{{labels}{sep}le="{bound / 1e9:g}"}} {cumulative}')
+    lines.append(f'{metric}_bucket{{{labels}{sep}le="+Inf"}} {hist.count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{metric}_sum{suffix} {hist.sum / 1e9:.9f}")
+    lines.append(f"{metric}_count{suffix} {hist.count}")
+
+
+def _fmt_ms(ns):
+    if ns is None:
+        return "-"
+    if ns == float("inf"):
+        return ">100"
+    return f"{ns / 1e6:g}"
+
+
+async def start_http_endpoint(metrics, host, port):
+    """Serve ``GET /metrics`` (and ``GET /fleet`` as JSON when fleet telemetry
+    is kept) on ``host:port``; returns the asyncio server."""
+
+    async def handle(reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+            parts = request.split(b" ", 2)
+            path = parts[1].split(b"?")[0] if len(parts) >= 2 and parts[0] == b"GET" else None
+            if path == b"/metrics":
+                body = metrics.render_prometheus().encode("utf-8")
+                head = (b"HTTP/1.1 200 OK\r\n"
+                        b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n")
+            elif path == b"/fleet" and metrics.telemetry is not None:
+                body = json.dumps(metrics.telemetry.to_dict()).encode("utf-8")
+                head = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            else:
+                body = b"not found\n"
+                head = b"HTTP/1.1 404 Not Found\r\nContent-Type: text/plain\r\n"
+            writer.write(head + b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
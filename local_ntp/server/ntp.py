@@ -0,0 +1,117 @@
+"""NTPv4 endpoint of ``TimeServer`` for stock NTP clients.
+
+The socket is read by a reader callback on the server's event loop rather
+than an asyncio transport, so that one receive buffer and one send buffer
+are reused for every packet (``recv_into``/``recvmsg_into`` and ``sendto``
+of the same ``bytearray``). Requests are stamped with kernel receive
+times where ``rxstamp`` supports them.
+"""
+import socket
+from time import perf_counter_ns
+
+from local_ntp.common import ntp, rxstamp
+from local_ntp.server.ratelimit import ALLOW, KOD
+
+PRECISION = -20  # ~1 us: what the monotonic-anchored TimeSource resolves on all platforms
+REF_ID = b"LOCL"
+
+
+def ntp_socket(host, port, reuse_port=False):
+    """Bind the NTP UDP socket (IPv4)."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((host, port))
+    except Exception:
+        sock.close()
+        raise
+    sock.setblocking(False)
+    return sock
+
+
+class NtpEndpoint:
+    """Answers NTP client (mode 3) requests on ``sock`` with server (mode 4) replies."""
+
+    BATCH = 64
+
+    def __init__(self, server, loop, sock, stamped=False):
+        self.server = server
+        self.source = server.source
+        self.metrics = server.metrics
+        self.limiter = server.limiter
+        self._loop = loop
+        self._sock = sock
+        self._stamped = stamped
+        self._in = bytearray(ntp.PACKET_SIZE + 64)   # room for extension fields, which are ignored
+        self._in_view = [self._in]
+        self._out = bytearray(ntp.PACKET_SIZE)
+        loop.add_reader(sock.fileno(), self._read_ready)
+
+    @property
+    def port(self):
+        return self._sock.getsockname()[1]
+
+    def _read_ready(self):
+        sock = self._sock
+        for _ in range(self.BATCH):
+            try:
+                if self._stamped:
+                    n, ancdata, _, addr = sock.recvmsg_into(self._in_view, rxstamp.ANCILLARY_SIZE)
+                    age = rxstamp.age_ns(rxstamp.kernel_time(ancdata))
+                else:
+                    n, addr = sock.recvfrom_into(self._in)
+                    age = 0
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                self.metrics.errors += 1
+                return
+            self._handle(n, addr, age)
+
+    def _handle(self, n, addr, age):
+        t0 = perf_counter_ns() - age
+        t2 = self.source.now_ns() - age
+        m = self.metrics
+        buf = self._in
+        first = buf[0]
+        if n < ntp.PACKET_SIZE or first & 7 != ntp.MODE_CLIENT or not 1 <= first >> 3 & 7 <= 4:
+            m.errors += 1
+            return
+        version = first >> 3 & 7
+        poll = (buf[2] ^ 0x80) - 0x80   # echoed, signed
+        origin = ntp.transmit_time(buf)
+        out = self._out
+        limiter = self.limiter
+        if limiter is not None:
+            verdict = limiter.check(addr[0], t0)
+            if verdict != ALLOW:
+                m.rate_limited += 1
+                if verdict == KOD:
+                    ntp.pack_into(out, ntp.LEAP_UNSYNCHRONIZED, version, ntp.MODE_SERVER,
+                                  ntp.STRATUM_KOD, poll, PRECISION, 0, 0, b"RATE", 0, origin, 0, 0)
+                    self._send(out, addr)
+                return
+        stratum = self.server.stratum
+        synced = stratum < 16
+        ntp.pack_into(out, ntp.LEAP_NONE if synced else ntp.LEAP_UNSYNCHRONIZED, version,
+                      ntp.MODE_SERVER, stratum, poll, PRECISION, 0, self.server.ntp_dispersion,
+                      REF_ID, self.server.ntp_reference, origin, ntp.ns_to_ntp(t2),
+                      ntp.ns_to_ntp(self.source.now_ns()))
+        self._send(out, addr)
+        m.ntp_residence.observe(perf_counter_ns() - t0)
+        m.ntp_requests += 1
+        m.bytes_sent += ntp.PACKET_SIZE
+        m.last_seen[addr[0]] = m.tick
+
+    def _send(self, data, addr):
+        try:
+            self._sock.sendto(data, addr)
+        except OSError:
+            self.metrics.errors += 1
+
+    def close(self):
+        if self._sock.fileno() >= 0:
+            self._loop.remove_reader(self._sock.fileno())
+            self._sock.close()
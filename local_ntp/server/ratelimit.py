@@ -0,0 +1,109 @@
+"""Per-source rate limiting for the server's request paths.
+
+Each client address gets a token bucket in a fixed-size table: a dict maps
+the address to a slot, and the bucket state lives in flat ``array``s, so a
+check is one dict lookup and a little float arithmetic. Idle entries are
+expired by ``expire``, which the server calls once a second. When the
+table is full between those calls, a clock hand looks at a few slots per
+unseen source for one to reuse, so a flood of spoofed sources never costs
+a scan of the whole table per packet.
+
+Over-limit clients get one kiss-o'-death reply ("slow down") and are then
+dropped silently until their bucket refills, so the limiter itself cannot
+be used to amplify a flood. While the server is shedding load every
+request costs ``shed_cost`` tokens, which starves heavy senders first and
+leaves clients with full buckets unaffected.
+"""
+from array import array
+
+ALLOW = 0
+KOD = 1
+DROP = 2
+
+
+class RateLimiter:
+    """Token buckets keyed by client address."""
+
+    def __init__(self, rate=20.0, burst=40, max_clients=65536, idle_timeout=120.0, shed_cost=4.0,
+                 sweep=8):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_clients = max_clients
+        self.idle_timeout_ns = int(idle_timeout * 1e9)
+        self.shed_cost = shed_cost
+        self.cost = 1.0
+        self._slots = {}
+        self._tokens = array("d", bytes(8 * max_clients))
+        self._last = array("q", bytes(8 * max_clients))
+        self._kod = bytearray(max_clients)
+        self._free = list(range(max_clients - 1, -1, -1))
+        self._owner = [None] * max_clients
+        self._hand = 0
+        self.sweep = sweep
+
+    def __len__(self):
+        return len(self._slots)
+
+    @property
+    def shedding(self):
+        return self.cost != 1.0
+
+    @shedding.setter
+    def shedding(self, value):
+        self.cost = self.shed_cost if value else 1.0
+
+    @property
+    def retry_after(self):
+        """Seconds a limited client should wait: the time to refill its bucket."""
+        return self.burst / self.rate
+
+    def check(self, host, now_ns):
+        """Return ALLOW, KOD or DROP for a request from ``host`` at ``now_ns``."""
+        slot = self._slots.get(host)
+        if slot is None:
+            if not self._free and not self._reclaim(now_ns):
+                # table full of active sources: only let newcomers in when not overloaded
+                return DROP if self.shedding else ALLOW
+            slot = self._free.pop()
+            self._slots[host] = slot
+            self._owner[slot] = host
+            tokens = self.burst
+            self._kod[slot] = 0
+        else:
+            tokens = self._tokens[slot] + (now_ns - self._last[slot]) * 1e-9 * self.rate
+            if tokens > self.burst:
+                tokens = self.burst
+        self._last[slot] = now_ns
+        if tokens >= self.cost:
+            self._tokens[slot] = tokens - self.cost
+            self._kod[slot] = 0
+            return ALLOW
+        self._tokens[slot] = tokens
+        if self._kod[slot]:
+            return DROP
+        self._kod[slot] = 1
+        return KOD
+
+    def expire(self, now_ns):
+        """Free the slots of clients idle for longer than ``idle_timeout``."""
+        cutoff = now_ns - self.idle_timeout_ns
+        last = self._last
+        stale = [h for h, slot in self._slots.items() if last[slot] < cutoff]
+        for host in stale:
+            slot = self._slots.pop(host)
+            self._owner[slot] = None
+            self._free.append(slot)
+        return len(stale)
+
+    def _reclaim(self, now_ns):
+        """Free the first idle slot among the next ``sweep`` the hand passes; returns whether one was."""
+        cutoff = now_ns - self.idle_timeout_ns
+        for _ in range(self.sweep):
+            slot = self._hand
+            self._hand = (slot + 1) % self.max_clients
+            if self._last[slot] < cutoff:
+                del self._slots[self._owner[slot]]
+                self._owner[slot] = None
+                self._free.append(slot)
+                return True
+        return False
@@ -0,0 +1,145 @@
+"""Relay mode: serve time disciplined against an upstream Local-NTP server.
+
+The relay runs the client's sync logic (``sample_burst`` plus a
+``Discipline``) against the upstream server, but corrects the server's
+``TimeSource`` instead of the system clock, so a relay needs no
+privileges and leaves the host clock alone. Replies carry the relay's
+stratum: one more than the upstream's, or ``STRATUM_UNSYNCED`` before the
+first successful sync and after the upstream has been lost.
+"""
+import asyncio
+import threading
+import time
+
+from local_ntp.clock.base import ClockBackend
+from local_ntp.clock.discipline import Discipline, DisciplineLoop
+from local_ntp.common.protocol import parse_address
+from local_ntp.common.sampling import sample_burst
+
+STRATUM_UNSYNCED = 16
+
+
+parse_upstream = parse_address
+
+
+class SourceClock(ClockBackend):
+    """A ``TimeSource`` presented as a clock the ``Discipline`` can correct.
+
+    Steps move the source at once. Slews and the frequency correction are
+    folded into it by ``tick`` in small increments, so the served time
+    changes by at most ``slew_rate_ppm`` of the tick interval at a time.
+    """
+
+    name = "relay"
+
+    def __init__(self, source, mono=time.monotonic_ns, slew_rate_ppm=500.0):
+        self.source = source
+        self.slew_rate_ppm = slew_rate_ppm
+        self.freq_ppm = 0.0
+        self._mono = mono
+        self._lock = threading.Lock()
+        self._pending = 0.0
+        self._carry = 0.0
+        self._last = mono()
+
+    def _advance(self):
+        t = self._mono()
+        elapsed = t - self._last
+        self._last = t
+        if elapsed <= 0:
+            return
+        delta = self._carry + elapsed * self.freq_ppm * 1e-6
+        if self._pending:
+            budget = elapsed * self.slew_rate_ppm * 1e-6
+            applied = max(-budget, min(budget, self._pending))
+            self._pending -= applied
+            delta += applied
+        whole = int(delta)
+        self._carry = delta - whole
+        if whole:
+            self.source.adjust(whole)
+
+    def tick(self):
+        """Apply the slew and frequency correction accumulated since the last call."""
+        with self._lock:
+            self._advance()
+
+    def now_ns(self):
+        with self._lock:
+            self._advance()
+            return self.source.now_ns()
+
+    def step(self, offset_ns):
+        with self._lock:
+            self._advance()
+            self.source.adjust(offset_ns)
+            self._pending = 0.0
+
+    def slew(self, offset_ns):
+        with self._lock:
+            self._advance()
+            self._pending = float(offset_ns)
+
+    def set_frequency(self, ppm):
+        with self._lock:
+            self._advance()
+            self.freq_ppm = ppm
+
+
+class Relay:
+    """Keeps ``server``'s time source disciplined against ``host:port``.
+
+    After ``max_failures`` consecutive failed polls the server reports
+    itself unsynchronized again until the upstream answers.
+    """
+
+    def __init__(self, server, host, port, interval=16.0, max_failures=4, tick_interval=0.1,
+                 timeout=0.5):
+        self.server = server
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_failures = max_failures
+        self.tick_interval = tick_interval
+        self.clock = SourceClock(server.source)
+        self.discipline = Discipline(self.clock)
+        self.upstream_stratum = None
+        self.failures = 0
+        self.loop = DisciplineLoop(self.discipline, self._sample, interval,
+                                   on_update=self._updated, on_error=self._failed)
+
+    def _sample(self):
+        result = sample_burst(self.host, self.port, timeout=self.timeout, clock=self.clock.now_ns)
+        stratum = min(s.stratum for s in result.samples)
+        if stratum + 1 >= STRATUM_UNSYNCED:
+            # also ends relay loops: the strata climb until every relay gives up
+            raise ConnectionError(f"upstream is not synchronized (stratum {stratum})")
+        self.upstream_stratum = stratum
+        return result
+
+    def _updated(self, result, action):
+        stratum = min(self.upstream_stratum + 1, STRATUM_UNSYNCED)
+        if self.failures or stratum != self.server.stratum:
+            self.server.log("[RELAY] Синхронизировано с %s:%s, страта %s", self.host, self.port, stratum)
+        self.failures = 0
+        self.server.stratum = stratum
+        self.server.mark_synced(result.error)
+        self.server.log("[RELAY] Смещение %+.3f мс ± %.3f мс (%s)",
+                        result.offset / 1e6, result.error / 1e6, action)
+
+    def _failed(self, exc):
+        self.failures += 1
+        self.server.log("[RELAY] Ошибка опроса %s:%s: %s", self.host, self.port, exc)
+        if self.failures == self.max_failures and self.server.stratum != STRATUM_UNSYNCED:
+            self.server.stratum = STRATUM_UNSYNCED
+            self.server.log("[RELAY] Связь с вышестоящим сервером потеряна")
+
+    async def run(self):
+        """Poll upstream in a thread and apply slews from the event loop until cancelled."""
+        self.loop.start()
+        try:
+            while True:
+                await asyncio.sleep(self.tick_interval)
+                self.clock.tick()
+        finally:
+            self.loop.stop(wait=False)
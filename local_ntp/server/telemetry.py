@@ -0,0 +1,299 @@
+"""Fleet offset telemetry reported by clients.
+
+Clients may send a report packet (``protocol.MODE_REPORT``) after each
+sync with the offset and delay they measured. Reports are kept in
+fixed-size per-client ring buffers stored in flat ``array``s: one slot of
+``history`` entries per client address, so memory is bounded by
+``max_clients * history`` whatever the report rate. Once an hour the fleet
+percentiles are appended to an hourly ring of ``hours`` entries (90 days
+by default), which is what keeps months of history.
+
+Statistics are computed with NumPy over zero-copy views of the same
+arrays when it is installed, and with plain Python loops otherwise. NumPy
+is imported on the first statistics call, not with the server. The
+per-client drift trend (``drift``) is summarised as percentiles on
+``/fleet`` and ``/metrics``.
+
+The tables belong to the server's event loop thread: ``record`` and
+``roll`` run there, and ``roll`` leaves a ``FleetStats`` in ``latest`` for
+readers on other threads.
+"""
+import math
+import time
+from array import array
+from collections import namedtuple
+
+_np = None  # numpy module, or False when it is not installed; see _numpy
+
+ClientStats = namedtuple("ClientStats", "address offset delay drift_ppm reports last_report")
+
+FleetStats = namedtuple("FleetStats", "clients p50 p95 p99 max worst")
+
+_HOUR_FIELDS = 5  # hour, clients, p50, p95, max
+
+
+def _numpy():
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:  # optional: the pure Python path gives the same results
+            numpy = False
+        _np = numpy
+    return _np
+
+
+def _nearest_rank(sorted_values, q):
+    k = math.ceil(round(q * len(sorted_values) / 100, 9)) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, k))]
+
+
+class FleetTelemetry:
+    """Per-client ring buffers of reported offsets with fleet-wide statistics.
+
+    All times are nanoseconds except report timestamps, which are server
+    wall-clock seconds. Clients that have not reported for ``max_age``
+    seconds are left out of the statistics. When the table is full, a
+    clock hand looks at the next ``sweep`` slots and evicts the first one
+    older than ``max_age``, or else the oldest of them, so a flood of new
+    (possibly spoofed) reporters costs bounded work per report.
+    """
+
+    def __init__(self, max_clients=4096, history=64, hours=24 * 90, max_age=3 * 3600.0, sweep=8):
+        self.max_clients = max_clients
+        self.history = history
+        self.hours = hours
+        self.max_age = max_age
+        self.sweep = sweep
+        self._hand = 0
+        self._slots = {}
+        self._hosts = [None] * max_clients
+        self._free = list(range(max_clients - 1, -1, -1))
+        size = max_clients * history
+        self._when = array("d", bytes(8 * size))
+        self._offset = array("q", bytes(8 * size))
+        self._delay = array("q", bytes(8 * size))
+        self._pos = array("q", bytes(8 * max_clients))
+        self._count = array("q", bytes(8 * max_clients))
+        self._last = array("d", bytes(8 * max_clients))
+        self._hourly = array("d", bytes(8 * _HOUR_FIELDS * hours))
+        self._hour_pos = 0
+        self._hour_count = 0
+        self._current_hour = None
+        self.reports = 0
+        self.latest = FleetStats(0, None, None, None, None, [])
+
+    def __len__(self):
+        return len(self._slots)
+
+    def record(self, host, offset, delay, when=None):
+        """Store one report from ``host``; ``when`` defaults to now."""
+        if when is None:
+            when = time.time()
+        slot = self._slots.get(host)
+        if slot is None:
+            slot = self._allocate(host)
+        i = self._pos[slot]
+        base = slot * self.history
+        self._when[base + i] = when
+        self._offset[base + i] = offset
+        self._delay[base + i] = delay
+        self._pos[slot] = (i + 1) % self.history
+        if self._count[slot] < self.history:
+            self._count[slot] += 1
+        self._last[slot] = when
+        self.reports += 1
+
+    def _allocate(self, host):
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = self._reclaim()
+            del self._slots[self._hosts[slot]]
+        self._slots[host] = slot
+        self._hosts[slot] = host
+        self._pos[slot] = 0
+        self._count[slot] = 0
+        return slot
+
+    def _reclaim(self):
+        """The slot to evict: the first stale one the hand passes within ``sweep``, else the oldest."""
+        cutoff = time.time() - self.max_age
+        last = self._last
+        best = self._hand
+        for k in range(min(self.sweep, self.max_clients)):
+            slot = (self._hand + k) % self.max_clients
+            if last[slot] < cutoff:
+                best = slot
+                break
+            if last[slot] < last[best]:
+                best = slot
+        self._hand = (best + 1) % self.max_clients
+        return best
+
+    def client(self, host):
+        """Return ``ClientStats`` for one address, or None if it never reported."""
+        slot = self._slots.get(host)
+        if slot is None:
+            return None
+        return self._client_stats(slot)
+
+    def _latest(self, slot):
+        i = (self._pos[slot] - 1) % self.history + slot * self.history
+        return self._offset[i], self._delay[i]
+
+    def _client_stats(self, slot):
+        n = self._count[slot]
+        base = slot * self.history
+        when = self._when[base:base + n]
+        offset = self._offset[base:base + n]
+        latest, delay = self._latest(slot)
+        return ClientStats(self._hosts[slot], latest, delay, _slope_ppm(when, offset),
+                           n, self._last[slot])
+
+    def snapshot(self, worst=10, now=None):
+        """Fleet percentiles of the latest absolute offset and the ``worst`` clients."""
+        if now is None:
+            now = time.time()
+        cutoff = now - self.max_age
+        slots = [s for s in self._slots.values() if self._last[s] >= cutoff]
+        if not slots:
+            return FleetStats(0, None, None, None, None, [])
+        np = _numpy()
+        if np:
+            return self._snapshot_numpy(np, slots, worst)
+        latest = sorted((abs(self._latest(s)[0]), s) for s in slots)
+        values = [v for v, _ in latest]
+        offenders = [self._client_stats(s) for _, s in reversed(latest[-worst:])] if worst else []
+        return FleetStats(len(slots), _nearest_rank(values, 50), _nearest_rank(values, 95),
+                          _nearest_rank(values, 99), values[-1], offenders)
+
+    def _snapshot_numpy(self, np, slots, worst):
+        h = self.history
+        idx = np.fromiter(slots, dtype=np.int64, count=len(slots))
+        pos = np.frombuffer(self._pos, dtype=np.int64)[idx]
+        offsets = np.frombuffer(self._offset, dtype=np.int64).reshape(-1, h)
+        latest = np.abs(offsets[idx, (pos - 1) % h])
+        order = np.argsort(latest, kind="stable")
+        values = latest[order]
+        n = len(values)
+        ranks = [max(0, math.ceil(round(q * n / 100, 9)) - 1) for q in (50, 95, 99)]
+        top = order[::-1][:worst] if worst else []
+        offenders = [self._client_stats(int(idx[i])) for i in top]
+        return FleetStats(n, int(values[ranks[0]]), int(values[ranks[1]]), int(values[ranks[2]]),
+                          int(values[-1]), offenders)
+
+    def drift(self):
+        """Offset trend in ppm for every client with two or more reports."""
+        slots = [s for s in self._slots.values() if self._count[s] >= 2]
+        np = _numpy() if slots else False
+        if not np:
+            return {self._hosts[s]: self._client_stats(s).drift_ppm for s in slots}
+        h = self.history
+        idx = np.fromiter(slots, dtype=np.int64, count=len(slots))
+        count = np.frombuffer(self._count, dtype=np.int64)[idx]
+        when = np.frombuffer(self._when, dtype=np.float64).reshape(-1, h)[idx]
+        offset = np.frombuffer(self._offset, dtype=np.int64).reshape(-1, h)[idx].astype(np.float64)
+        # rows that have not wrapped yet hold zeros past ``count``: mask them out
+        mask = np.arange(h) < count[:, None]
+        t0 = np.where(mask, when, np.inf).min(axis=1, keepdims=True)
+        t = np.where(mask, when - t0, 0.0)
+        o = np.where(mask, offset, 0.0)
+        tm = t.sum(axis=1) / count
+        om = o.sum(axis=1) / count
+        dt = np.where(mask, t - tm[:, None], 0.0)
+        num = (dt * (o - om[:, None])).sum(axis=1)
+        den = (dt * dt).sum(axis=1)
+        slope = np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+        return {self._hosts[s]: float(v) / 1e3 for s, v in zip(slots, slope)}
+
+    def drift_percentiles(self):
+        """``(p50, p95, max)`` of the clients' absolute drift in ppm, or None without any."""
+        values = sorted(abs(v) for v in self.drift().values())
+        if not values:
+            return None
+        return _nearest_rank(values, 50), _nearest_rank(values, 95), values[-1]
+
+    def roll(self, now=None):
+        """Refresh ``latest`` and append the fleet percentiles to the hourly
+        history when the hour changes; called once a second by the server."""
+        if now is None:
+            now = time.time()
+        self.latest = self.snapshot(worst=0, now=now)
+        hour = int(now // 3600)
+        if self._current_hour is None:
+            self._current_hour = hour
+            return False
+        if hour == self._current_hour:
+            return False
+        self._current_hour = hour
+        stats = self.latest
+        if not stats.clients:
+            return False
+        base = self._hour_pos * _HOUR_FIELDS
+        self._hourly[base:base + _HOUR_FIELDS] = array(
+            "d", (hour - 1, stats.clients, stats.p50, stats.p95, stats.max))
+        self._hour_pos = (self._hour_pos + 1) % self.hours
+        self._hour_count = min(self._hour_count + 1, self.hours)
+        return True
+
+    def hourly(self):
+        """Hourly ``(unix_hour, clients, p50, p95, max)`` tuples, oldest first."""
+        start = (self._hour_pos - self._hour_count) % self.hours
+        rows = []
+        for k in range(self._hour_count):
+            base = ((start + k) % self.hours) * _HOUR_FIELDS
+            hour, clients, p50, p95, worst = self._hourly[base:base + _HOUR_FIELDS]
+            rows.append((int(hour), int(clients), int(p50), int(p95), int(worst)))
+        return rows
+
+    def render_prometheus(self):
+        """Fleet gauges in the Prometheus text format (no trailing newline)."""
+        stats = self.snapshot(worst=0)
+        lines = ["# HELP localntp_fleet_clients Clients that reported an offset recently.",
+                 "# TYPE localntp_fleet_clients gauge",
+                 f"localntp_fleet_clients {stats.clients}"]
+        if stats.clients:
+            metric = "localntp_fleet_abs_offset_seconds"
+            lines.append(f"# HELP {metric} Latest absolute clock offset reported by clients.")
+            lines.append(f"# TYPE {metric} gauge")
+            for q, value in (("0.5", stats.p50), ("0.95", stats.p95), ("0.99", stats.p99),
+                             ("1", stats.max)):
+                lines.append(f'{metric}{{quantile="{q}"}} {value / 1e9:.9f}')
+        drift = self.drift_percentiles()
+        if drift is not None:
+            metric = "localntp_fleet_abs_drift_ppm"
+            lines.append(f"# HELP {metric} Trend of the offsets reported by each client, in ppm.")
+            lines.append(f"# TYPE {metric} gauge")
+            for q, value in zip(("0.5", "0.95", "1"), drift):
+                lines.append(f'{metric}{{quantile="{q}"}} {value:.6f}')
+        return "\n".join(lines)
+
+    def to_dict(self, worst=10):
+        """JSON-friendly summary for the ``/fleet`` HTTP endpoint."""
+        stats = self.snapshot(worst)
+        drift = self.drift_percentiles() or (None, None, None)
+        return {
+            "clients": stats.clients,
+            "abs_offset_ns": {"p50": stats.p50, "p95": stats.p95, "p99": stats.p99, "max": stats.max},
+            "abs_drift_ppm": dict(zip(("p50", "p95", "max"), drift)),
+            "worst": [c._asdict() for c in stats.worst],
+            "hourly": [dict(zip(("hour", "clients", "p50", "p95", "max"), row))
+                       for row in self.hourly()],
+        }
+
+
+def _slope_ppm(when, offset):
+    """Least-squares slope of offset (ns) over time (s), in ppm."""
+    n = len(when)
+    if n < 2:
+        return 0.0
+    t0 = min(when)
+    tm = sum(when) / n - t0
+    om = sum(offset) / n
+    num = den = 0.0
+    for t, o in zip(when, offset):
+        dt = t - t0 - tm
+        num += dt * (o - om)
+        den += dt * dt
+    return num / den / 1e3 if den else 0.0
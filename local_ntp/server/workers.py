@@ -0,0 +1,256 @@
+"""Multi-process server: worker processes sharing the ports via SO_REUSEPORT.
+
+Each worker runs its own ``TimeServer`` (and so its own interpreter and
+GIL); the kernel spreads TCP connections and UDP datagrams across them.
+The supervisor restarts workers that die and sums their request counters,
+which workers publish into a shared array. A worker that keeps dying
+before it has served for ``healthy_after`` seconds is restarted with
+exponential backoff, and given up on after ``max_failures`` attempts.
+"""
+import multiprocessing
+import socket
+import threading
+import time
+
+from local_ntp.eventlog import EventLog
+from local_ntp.server.core import TimeServer
+from local_ntp.server.metrics import Metrics
+
+_FIELDS = Metrics.COUNTERS
+
+
+def _worker_main(host, port, stats, slot, ready, stop, publish_interval, options):
+    server = TimeServer(host=host, reuse_port=True, **options)
+    server.start(port)
+    ready.set()
+    base = slot * len(_FIELDS)
+    try:
+        while not stop.wait(publish_interval):
+            for i, name in enumerate(_FIELDS):
+                stats[base + i] = getattr(server.metrics, name)
+    finally:
+        server.stop()
+        for i, name in enumerate(_FIELDS):
+            stats[base + i] = getattr(server.metrics, name)
+
+
+class _Worker:
+    def __init__(self, slot, port, generation, beacon):
+        self.slot = slot
+        self.port = port
+        self.generation = generation
+        self.beacon = beacon
+        self.process = None
+        self.ready = None
+        self.stop = None
+        self.started = 0.0
+        self.failures = 0       # consecutive deaths before serving for healthy_after seconds
+        self.restart_at = None  # set once the supervisor has noticed the worker died
+        self.collected = False
+
+
+class WorkerPool:
+    """Supervisor of ``workers`` server processes on one port.
+
+    ``rollover`` moves the pool to a new generation of workers (on a new
+    port, or the same one) and retires the old generation only after the
+    new one is accepting, so requests are not dropped during the switch.
+    ``server_options`` are passed to every worker's ``TimeServer``,
+    ``beacon_options`` only to one worker per generation.
+
+    A dead worker is restarted at once the first time, then after
+    ``restart_backoff`` seconds doubling up to ``max_backoff``. After
+    ``max_failures`` consecutive failures its place is left empty and
+    ``failed`` is set. A restarted worker that is not accepting within
+    ``start_timeout`` counts as a failure too.
+    """
+
+    def __init__(self, port, workers=None, host="", events=None,
+                 check_interval=0.5, publish_interval=0.5, start_timeout=10.0,
+                 server_options=None, beacon_options=None, restart_backoff=0.5, max_backoff=30.0,
+                 max_failures=5, healthy_after=10.0):
+        if not hasattr(socket, "SO_REUSEPORT"):
+            raise RuntimeError("SO_REUSEPORT is not supported on this platform")
+        self.port = port
+        self.size = workers or multiprocessing.cpu_count()
+        self.host = host
+        self.server_options = server_options or {}
+        self.beacon_options = beacon_options or {}
+        self.events = events if events is not None else EventLog(capacity=0)
+        self.check_interval = check_interval
+        self.publish_interval = publish_interval
+        self.start_timeout = start_timeout
+        self.restart_backoff = restart_backoff
+        self.max_backoff = max_backoff
+        self.max_failures = max_failures
+        self.healthy_after = healthy_after
+        self.restarts = 0
+        self.failed = threading.Event()
+        self._ctx = multiprocessing.get_context("spawn")
+        # room for two generations during a rollover
+        self._stats = self._ctx.Array("q", 2 * self.size * len(_FIELDS), lock=False)
+        self._retired = dict.fromkeys(_FIELDS, 0)
+        self._free_slots = list(range(2 * self.size))
+        self._workers = []
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._monitor = None
+
+    def start(self):
+        """Start the workers and the supervisor thread; waits until they accept."""
+        workers = self._spawn_generation(self.port)
+        with self._lock:
+            self._workers = workers
+        self._stopping.clear()
+        self._monitor = threading.Thread(target=self._supervise, name="WorkerPool", daemon=True)
+        self._monitor.start()
+        self.events.emit("[SERVER] Запущено процессов: %d на порту %d", self.size, self.port)
+
+    def stop(self):
+        """Stop all workers and the supervisor thread."""
+        self._stopping.set()
+        if self._monitor is not None:
+            self._monitor.join()
+            self._monitor = None
+        with self._lock:
+            workers, self._workers = self._workers, []
+        self._retire(workers)
+        self.events.emit("[SERVER] Сервер остановлен")
+
+    def rollover(self, port=None, grace=0.5):
+        """Replace every worker with a fresh one, optionally on a new ``port``.
+
+        Old workers keep serving for ``grace`` seconds after the new
+        generation is ready, so clients still talking to them are answered.
+        """
+        port = self.port if port is None else port
+        new = self._spawn_generation(port)
+        with self._lock:
+            old, self._workers = self._workers, new
+            self.port = port
+        time.sleep(grace)
+        self._retire(old)
+        self.events.emit("[SERVER] Процессы переведены на порт %d", port)
+
+    def pids(self):
+        with self._lock:
+            return [w.process.pid for w in self._workers]
+
+    def stats(self):
+        """Sum of the request counters of all current and past workers."""
+        total = dict(self._retired)
+        with self._lock:
+            slots = [w.slot for w in self._workers]
+        for slot in slots:
+            base = slot * len(_FIELDS)
+            for i, name in enumerate(_FIELDS):
+                total[name] += self._stats[base + i]
+        return total
+
+    def _spawn_generation(self, port):
+        self._generation += 1
+        with self._lock:
+            slots = [self._free_slots.pop() for _ in range(self.size)]
+        # one beacon sender per generation
+        workers = [self._spawn(slot, port, self._generation, i == 0) for i, slot in enumerate(slots)]
+        deadline = time.monotonic() + self.start_timeout
+        for w in workers:
+            if not w.ready.wait(max(0.0, deadline - time.monotonic())):
+                self._retire(workers)
+                raise RuntimeError(f"worker on port {port} failed to start")
+        return workers
+
+    def _spawn(self, slot, port, generation, beacon=False):
+        base = slot * len(_FIELDS)
+        for i in range(len(_FIELDS)):
+            self._stats[base + i] = 0
+        w = _Worker(slot, port, generation, beacon)
+        w.ready = self._ctx.Event()
+        w.stop = self._ctx.Event()
+        options = dict(self.server_options)
+        if beacon:
+            options.update(self.beacon_options)
+        w.process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.host, port, self._stats, slot, w.ready, w.stop, self.publish_interval,
+                  options),
+            name=f"local-ntp-worker-{slot}",
+            daemon=True,
+        )
+        w.process.start()
+        w.started = time.monotonic()
+        return w
+
+    def _retire(self, workers):
+        for w in workers:
+            w.stop.set()
+        for w in workers:
+            w.process.join(5)
+            if w.process.is_alive():
+                w.process.kill()
+                w.process.join()
+        with self._lock:
+            for w in workers:
+                self._collect(w)
+
+    def _collect(self, w):
+        """Fold a finished worker's counters into the totals; caller holds the lock."""
+        if w.collected:
+            return
+        w.collected = True
+        base = w.slot * len(_FIELDS)
+        for i, name in enumerate(_FIELDS):
+            self._retired[name] += self._stats[base + i]
+            self._stats[base + i] = 0
+        self._free_slots.append(w.slot)
+
+    def _supervise(self):
+        while not self._stopping.wait(self.check_interval):
+            with self._lock:
+                workers = list(self._workers)
+            for w in workers:
+                if not self._stopping.is_set():
+                    self._check(w, time.monotonic())
+
+    def _check(self, w, now):
+        """Restart ``w`` if it died and its backoff has passed; processes are spawned outside the lock."""
+        if w.process.is_alive():
+            if not w.ready.is_set() and now - w.started > self.start_timeout:
+                self.events.emit("[SERVER] Процесс %d не запустился за %.0f с", w.process.pid,
+                                 self.start_timeout)
+                w.process.kill()    # counted as a failure once it is gone
+            return
+        if w.restart_at is None:
+            healthy = w.ready.is_set() and now - w.started >= self.healthy_after
+            w.failures = 0 if healthy else w.failures + 1
+            with self._lock:
+                self._collect(w)
+            if w.failures >= self.max_failures:
+                self.events.emit("[SERVER] Процесс %d не удаётся перезапустить (%d попыток подряд), "
+                                 "перезапуски прекращены", w.process.pid, w.failures)
+                with self._lock:
+                    if w in self._workers:
+                        self._workers.remove(w)
+                self.failed.set()
+                return
+            delay = 0.0 if w.failures <= 1 else min(self.max_backoff,
+                                                    self.restart_backoff * 2 ** (w.failures - 2))
+            w.restart_at = now + delay
+            self.events.emit("[SERVER] Процесс %d завершился с кодом %s, перезапуск через %.1f с",
+                             w.process.pid, w.process.exitcode, delay)
+        if now < w.restart_at:
+            return
+        with self._lock:
+            if w not in self._workers:
+                return      # a rollover or stop has replaced it meanwhile
+            slot = self._free_slots.pop()
+        new = self._spawn(slot, w.port, w.generation, w.beacon)
+        new.failures = w.failures
+        with self._lock:
+            placed = w in self._workers
+            if placed:
+                self._workers[self._workers.index(w)] = new
+                self.restarts += 1
+        if not placed:
+            self._retire([new])
@@ -0,0 +1,5 @@
+"""GUI widgets shared by the client and server windows.
+
+Each module imports its toolkit (``qtlog``: PyQt5, ``tklog``: Tkinter), so
+import the one the window is built with; nothing here is needed headless.
+"""
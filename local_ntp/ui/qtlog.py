@@ -0,0 +1,96 @@
+"""Log panel for the PyQt5 windows: a ``QListView`` over a ``LogBuffer``.
+
+The view only asks for the rows on screen, and every batch of lines is
+announced as one removal at the top and one insertion at the bottom, so
+both memory and redraw cost stay flat however long the window is open.
+"""
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from local_ntp.eventlog import DEFAULT_CAPACITY, LogBuffer
+
+
+class LogListModel(QtCore.QAbstractListModel):
+    """Qt list model over a ``LogBuffer``."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.buffer = LogBuffer(capacity)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.buffer)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and index.isValid():
+            return self.buffer[index.row()]
+        return None
+
+    def append(self, lines):
+        buf = self.buffer
+        lines = lines[-buf.capacity:]
+        removed = buf.evicted(len(lines))
+        if removed:
+            self.beginRemoveRows(QtCore.QModelIndex(), 0, removed - 1)
+            buf.make_room(len(lines))
+            self.endRemoveRows()
+        added = sum(1 for line in lines if buf.matches(line))
+        if added:
+            first = len(buf)
+            self.beginInsertRows(QtCore.QModelIndex(), first, first + added - 1)
+            buf.extend(lines)
+            self.endInsertRows()
+        else:
+            buf.extend(lines)
+
+    def set_filter(self, text):
+        self.beginResetModel()
+        self.buffer.set_filter(text)
+        self.endResetModel()
+
+
+class LogPanel(QtWidgets.QWidget):
+    """Filter and search fields above a virtualized list of log lines.
+
+    The list follows new lines while it is scrolled to the bottom.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.model = LogListModel(capacity, self)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        bar = QtWidgets.QHBoxLayout()
+        layout.addLayout(bar)
+        self.filter_edit = QtWidgets.QLineEdit()
+        self.filter_edit.setPlaceholderText('Фильтр')
+        self.filter_edit.textChanged.connect(self.model.set_filter)
+        bar.addWidget(self.filter_edit)
+        self.search_edit = QtWidgets.QLineEdit()
+        self.search_edit.setPlaceholderText('Поиск (Enter — далее)')
+        self.search_edit.returnPressed.connect(self.find_next)
+        bar.addWidget(self.search_edit)
+
+        self.view = QtWidgets.QListView()
+        self.view.setModel(self.model)
+        self.view.setUniformItemSizes(True)     # row heights are not measured one by one
+        self.view.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.view.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        layout.addWidget(self.view)
+
+    def append(self, lines):
+        """Add a batch of lines; call once per frame with everything drained."""
+        if not lines:
+            return
+        scroll = self.view.verticalScrollBar()
+        follow = scroll.value() >= scroll.maximum()
+        self.model.append(lines)
+        if follow:
+            self.view.scrollToBottom()
+
+    def find_next(self):
+        current = self.view.currentIndex()
+        start = current.row() + 1 if current.isValid() else 0
+        row = self.model.buffer.find(self.search_edit.text(), start)
+        if row >= 0:
+            index = self.model.index(row)
+            self.view.setCurrentIndex(index)
+            self.view.scrollTo(index)
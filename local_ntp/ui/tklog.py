@@ -0,0 +1,127 @@
+"""Log panel for the Tkinter windows: a windowed view over a ``LogBuffer``.
+
+A Tk ``Text`` keeps every line it was given, so the panel only ever holds
+the rows that fit on screen and redraws them from the buffer when lines
+arrive or the view scrolls. Redraws are coalesced into one per frame.
+"""
+import tkinter as tk
+
+from local_ntp.eventlog import DEFAULT_CAPACITY, LogBuffer
+
+
+class LogPanel(tk.Frame):
+    """Filter and search fields above the last ``capacity`` log lines.
+
+    The view follows new lines while it is scrolled to the bottom.
+    """
+
+    def __init__(self, master, capacity=DEFAULT_CAPACITY, width=90, height=15):
+        super().__init__(master)
+        self.buffer = LogBuffer(capacity)
+        self.height = height
+        self.top = 0
+        self.follow = True
+        self.found = -1
+        self._redraw_pending = False
+
+        bar = tk.Frame(self)
+        bar.pack(fill=tk.X)
+        tk.Label(bar, text="Фильтр:").pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", lambda *_: self.set_filter(self.filter_var.get()))
+        tk.Entry(bar, textvariable=self.filter_var).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        tk.Label(bar, text="Поиск:").pack(side=tk.LEFT, padx=(5, 0))
+        self.search_entry = tk.Entry(bar)
+        self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.search_entry.bind("<Return>", lambda _: self.find_next())
+
+        body = tk.Frame(self)
+        body.pack(fill=tk.BOTH, expand=True)
+        self.text = tk.Text(body, width=width, height=height, wrap=tk.NONE, state=tk.DISABLED)
+        self.text.tag_configure("found", background="yellow")
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar = tk.Scrollbar(body, command=self._on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        for widget in (self.text, self.scrollbar):
+            widget.bind("<MouseWheel>", self._on_wheel)
+            widget.bind("<Button-4>", lambda _: self.scroll_to(self.top - 3))
+            widget.bind("<Button-5>", lambda _: self.scroll_to(self.top + 3))
+        self.text.bind("<Configure>", self._on_resize)
+
+    def append(self, lines):
+        """Add a batch of lines; the view is redrawn once on the next idle pass."""
+        if not lines:
+            return
+        removed = self.buffer.evicted(len(lines))
+        self.buffer.extend(lines)
+        if removed:
+            self.top = max(0, self.top - removed)
+            self.found = max(-1, self.found - removed)
+        if self.follow:
+            self.top = self._bottom()
+        self._schedule()
+
+    def set_filter(self, text):
+        self.buffer.set_filter(text)
+        self.found = -1
+        self.follow = True
+        self.top = self._bottom()
+        self._schedule()
+
+    def find_next(self):
+        row = self.buffer.find(self.search_entry.get(), self.found + 1)
+        if row >= 0:
+            self.found = row
+            if not self.top <= row < self.top + self.height:
+                self.scroll_to(row - self.height // 2)
+            self._schedule()
+
+    def scroll_to(self, top):
+        self.top = max(0, min(top, self._bottom()))
+        self.follow = self.top == self._bottom()
+        self._schedule()
+
+    def _bottom(self):
+        return max(0, len(self.buffer) - self.height)
+
+    def _on_scroll(self, action, amount, unit=None):
+        if action == tk.MOVETO:
+            self.scroll_to(int(float(amount) * len(self.buffer)))
+        else:
+            step = self.height if unit == tk.PAGES else 1
+            self.scroll_to(self.top + int(amount) * step)
+
+    def _on_wheel(self, event):
+        self.scroll_to(self.top - (3 if event.delta > 0 else -3))
+
+    def _on_resize(self, _):
+        height = max(1, self.text.winfo_height() // max(1, self._line_height()))
+        if height != self.height:
+            self.height = height
+            self.scroll_to(self._bottom() if self.follow else self.top)
+
+    def _line_height(self):
+        return self.text.tk.call("font", "metrics", self.text.cget("font"), "-linespace")
+
+    def _schedule(self):
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self._redraw)
+
+    def _redraw(self):
+        self._redraw_pending = False
+        buf = self.buffer
+        end = min(len(buf), self.top + self.height)
+        text = self.text
+        text.config(state=tk.NORMAL)
+        text.delete("1.0", tk.END)
+        text.insert("1.0", "\n".join(buf[row] for row in range(self.top, end)))
+        if self.top <= self.found < end:
+            line = self.found - self.top + 1
+            text.tag_add("found", f"{line}.0", f"{line}.end")
+        text.config(state=tk.DISABLED)
+        total = len(buf)
+        if total:
+            self.scrollbar.set(self.top / total, end / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
@@ -0,0 +1,114 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.clock import Discipline, SimulatedClock
+from local_ntp.common import SyncResult
+from local_ntp.common.beacon import BeaconClient, BeaconReceiver, beacon_socket, pack_beacon, unpack_beacon
+from local_ntp.server import TimeServer, TimeSource
+
+def test_pack_and_authenticate():
+    data = pack_beacon(7, 42, 123456789, stratum=2, key=b'secret')
+    assert unpack_beacon(data, b'secret') == (2, 7, 42, 123456789)
+    assert unpack_beacon(data) == (2, 7, 42, 123456789)
+    with pytest.raises(ValueError):
+        unpack_beacon(data, b'other')
+    with pytest.raises(ValueError):
+        unpack_beacon(pack_beacon(7, 42, 1), b'secret')   # untagged beacon with a key set
+
+def test_receiver_drops_replays_and_counts_loss():
+    rx = beacon_socket(0, group='')
+    port = rx.getsockname()[1]
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as tx:
+        for seq, server_id in ((1, 5), (3, 5), (3, 5), (2, 5), (4, 5), (1, 6)):
+            tx.sendto(pack_beacon(seq, server_id, seq * 1000), ('127.0.0.1', port))
+        receiver = BeaconReceiver(rx)
+        got = []
+        while True:
+            beacon = receiver.receive(0.2)
+            if beacon is None:
+                break
+            got.append(beacon[1])
+    rx.close()
+    assert got == [1, 3, 4, 1]
+    assert receiver.rejected == 2
+    assert receiver.lost == 1
+
+def test_receiver_rejects_alternating_ids_and_other_sources():
+    rx = beacon_socket(0, group='')
+    port = rx.getsockname()[1]
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as tx, \
+            socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as other:
+        other.bind(('127.0.0.2', 0))
+        # a restart to id 6, then replays of id 5 interleaved with it, plus a second server
+        for seq, server_id in ((1, 5), (2, 5), (1, 6), (3, 5), (2, 6), (4, 5), (3, 6)):
+            tx.sendto(pack_beacon(seq, server_id, seq * 1000, key=b'k'), ('127.0.0.1', port))
+            other.sendto(pack_beacon(seq + 100, 9, 0, key=b'k'), ('127.0.0.1', port))
+        receiver = BeaconReceiver(rx, key=b'k', source='127.0.0.1')
+        got = []
+        while True:
+            beacon = receiver.receive(0.2)
+            if beacon is None:
+                break
+            got.append((receiver.server_id, beacon[1]))
+    rx.close()
+    assert got == [(5, 1), (5, 2), (6, 1), (6, 2), (6, 3)]
+    assert receiver.generation == 1
+    assert receiver.rejected == 2 + 7
+
+def test_client_disciplines_from_beacons():
+    ahead = 3_000_000_000
+    server = TimeServer(host='127.0.0.1', source=TimeSource(wall=lambda: time.time_ns() + ahead),
+                        beacon_interval=0.02, beacon_group='127.0.0.1', beacon_key=b'k')
+    clock = SimulatedClock()
+    updates = []
+    done = threading.Event()
+
+    def on_update(result, action):
+        updates.append(result)
+        done.set()
+
+    server.start(0)
+    client = BeaconClient(Discipline(clock), '127.0.0.1', server.port, group='', key=b'k', window=4,
+                          on_update=on_update, on_error=lambda e: updates.append(e))
+    try:
+        client.start()
+        assert done.wait(5)
+    finally:
+        client.stop()
+        server.stop()
+    result = updates[0]
+    assert abs(result.offset - ahead) < 20_000_000
+    assert 0 <= client.delay < 20_000_000
+    assert abs(clock.error_ns - ahead) < 20_000_000
+    assert server.beacons_sent >= 4
+    assert client._generation == 0
+
+def test_client_recalibrates_when_the_server_id_changes():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('', 0))
+        beacon_port = s.getsockname()[1]
+    calibrations = []
+
+    def sampler():
+        calibrations.append(time.monotonic())
+        return SyncResult(0, 0, 0, 0, [], [], 0)
+
+    client = BeaconClient(Discipline(SimulatedClock()), '127.0.0.1', 12345, group='', beacon_port=beacon_port,
+                          window=100, sampler=sampler)
+    client.start()
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as tx:
+            for server_id in (1, 2, 1):
+                for seq in range(1, 4):
+                    tx.sendto(pack_beacon(seq, server_id, time.time_ns()), ('127.0.0.1', beacon_port))
+                time.sleep(0.1)
+    finally:
+        client.stop()
+    assert len(calibrations) == 2
@@ -0,0 +1,27 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.bench import percentile, run_benchmark
+from local_ntp.server import TimeServer
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 1001))
+    assert percentile(values, 50) == 500
+    assert percentile(values, 99) == 990
+    assert percentile(values, 99.9) == 999
+    assert percentile([], 50) is None
+
+def test_benchmark_report():
+    server = TimeServer(host='127.0.0.1', rate_limit=None, session_greeting=1.0)
+    server.start(0)
+    try:
+        for mode in ('tcp', 'session', 'udp', 'discover'):
+            report = asyncio.run(run_benchmark('127.0.0.1', server.port, mode, clients=5, duration=0.1))
+            assert report['requests'] > 0
+            assert report['errors'] == {'timeout': 0, 'error': 0, 'bad_reply': 0}
+            assert report['latency_ms']['p50'] <= report['latency_ms']['p999']
+    finally:
+        server.stop()
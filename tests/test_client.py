@@ -0,0 +1,130 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from local_ntp.client import (EXIT_OK, EXIT_UNREACHABLE, server_from_settings, servers_from_settings,
+                              sync_once)
+from local_ntp.client.__main__ import main
+from local_ntp.clock import SimulatedClock
+from local_ntp.server import TimeServer
+
+def test_server_from_settings():
+    assert server_from_settings({'ip': '10.0.0.5', 'port': '4000'}) == ('10.0.0.5', 4000)
+    assert server_from_settings({'ip': '10.0.0.5'}) == ('10.0.0.5', 12345)
+    assert server_from_settings({}) is None
+
+def test_servers_from_settings():
+    settings = {'ip': '10.0.0.5', 'port': '4000', 'servers': ['10.0.0.6', '10.0.0.7:5000', '[::1]:6000']}
+    assert servers_from_settings(settings) == [('10.0.0.6', 4000), ('10.0.0.7', 5000), ('::1', 6000)]
+    assert servers_from_settings({'ip': '10.0.0.5'}) == [('10.0.0.5', 12345)]
+    assert servers_from_settings({}) == []
+
+def test_sync_once_steps_simulated_clock():
+    server = TimeServer(host='127.0.0.1')
+    server.start(0)
+    try:
+        clock = SimulatedClock(offset_ns=-2_000_000_000)
+        status, result = sync_once('127.0.0.1', server.port, clock, log=lambda msg: None)
+    finally:
+        server.stop()
+    assert status == EXIT_OK
+    assert abs(result.offset - 2_000_000_000) < 50_000_000
+    assert clock.steps == 1 and abs(clock.error_ns) < 50_000_000
+
+def test_sync_once_fails_over_from_a_dead_server():
+    server = TimeServer(host='127.0.0.1')
+    server.start(0)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        dead = s.getsockname()[1]
+    try:
+        clock = SimulatedClock(offset_ns=-2_000_000_000)
+        status, result = sync_once([('127.0.0.1', dead), ('127.0.0.1', server.port)], clock=clock,
+                                   timeout=0.2, log=lambda msg: None)
+    finally:
+        server.stop()
+    assert status == EXIT_OK
+    assert clock.steps == 1 and abs(clock.error_ns) < 50_000_000
+
+def test_sync_once_keeps_drift_state(tmp_path):
+    server = TimeServer(host='127.0.0.1')
+    server.start(0)
+    path = tmp_path / 'client_state.json'
+    try:
+        for _ in range(2):
+            status, _ = sync_once('127.0.0.1', server.port, SimulatedClock(offset_ns=-2_000_000_000),
+                                  state_path=str(path), log=lambda msg: None)
+            assert status == EXIT_OK
+    finally:
+        server.stop()
+    state = json.loads(path.read_text())
+    assert len(state['history']) == 2 and state['last_action'] == 'step'
+
+def test_offset_is_stepped_when_the_slew_stops_with_the_process():
+    server = TimeServer(host='127.0.0.1')
+    server.start(0)
+    try:
+        clock = SimulatedClock(offset_ns=-300_000)
+        start = time.monotonic()
+        status, _ = sync_once('127.0.0.1', server.port, clock, log=lambda msg: None)
+    finally:
+        server.stop()
+    # even 0.3 ms, which would slew in 0.6 s, is stepped: the one-shot does not wait
+    assert status == EXIT_OK and clock.steps == 1
+    assert time.monotonic() - start < 0.5
+
+    server = TimeServer(host='127.0.0.1')
+    server.start(0)
+    try:
+        clock = SimulatedClock(offset_ns=-300_000)
+        start = time.monotonic()
+        status, _ = sync_once('127.0.0.1', server.port, clock, max_slew_wait=2.0, log=lambda msg: None)
+    finally:
+        server.stop()
+    assert status == EXIT_OK and clock.steps == 0
+    assert 0.5 < time.monotonic() - start < 2.0
+
+def test_short_slew_is_waited_for_when_it_stops_with_the_process():
+    server = TimeServer(host='127.0.0.1')
+    server.start(0)
+    try:
+        clock = SimulatedClock(offset_ns=-3_000_000)
+        start = time.monotonic()
+        status, _ = sync_once('127.0.0.1', server.port, clock, max_slew_wait=0.001,
+                              log=lambda msg: None)
+    finally:
+        server.stop()
+    # 3 ms at 500 ppm would take 6 s to slew: with a 1 ms budget it is stepped
+    assert status == EXIT_OK and clock.steps == 1
+    assert time.monotonic() - start < 2.0
+
+def test_cli_dry_run_and_unreachable(tmp_path, capsys):
+    server = TimeServer(host='127.0.0.1')
+    server.start(0)
+    cfg = tmp_path / 'client_settings.json'
+    cfg.write_text(json.dumps({'ip': '127.0.0.1', 'port': str(server.port)}))
+    try:
+        assert main(['sync', '--config', str(cfg), '--dry-run']) == EXIT_OK
+    finally:
+        server.stop()
+    assert 'Смещение' in capsys.readouterr().out
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        dead = s.getsockname()[1]
+    assert main(['sync', '--server', f'127.0.0.1:{dead}', '--dry-run', '--quiet',
+                 '--samples', '2', '--timeout', '0.05']) == EXIT_UNREACHABLE
+    assert capsys.readouterr().out == ''
+
+def test_client_import_is_minimal():
+    code = ('import sys, local_ntp.client.__main__; '
+            'print([m for m in ("PyQt5", "tkinter", "ctypes", "asyncio", "hashlib", '
+            '"local_ntp.server", "local_ntp.common.beacon", "local_ntp.common.session") '
+            'if m in sys.modules])')
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == '[]'
@@ -0,0 +1,118 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.clock import SLEW, STEP, Discipline, DisciplineLoop, DriftState, SimulatedClock
+from local_ntp.common import SyncResult
+
+class FakeTime:
+    def __init__(self):
+        self.ns = 1_000_000_000_000
+
+    def __call__(self):
+        return self.ns
+
+    def advance(self, seconds):
+        self.ns += int(seconds * 1e9)
+
+def test_simulated_clock_drift_step_and_slew():
+    ref = FakeTime()
+    clock = SimulatedClock(offset_ns=-5_000_000, drift_ppm=10.0, reference=ref)
+    ref.advance(100)
+    assert clock.error_ns == -5_000_000 + 1_000_000
+    clock.step(4_000_000)
+    assert clock.error_ns == 0
+    clock.slew(1_000_000)
+    ref.advance(1)  # 500 ppm slew + 10 ppm drift
+    assert clock.error_ns == 510_000
+    ref.advance(10)
+    assert clock.error_ns == 1_000_000 + 110_000
+
+def test_discipline_steps_large_and_slews_small_offsets():
+    ref = FakeTime()
+    clock = SimulatedClock(offset_ns=-2_000_000_000, reference=ref)
+    discipline = Discipline(clock, mono=ref)
+    assert discipline.update(-clock.error_ns) == STEP
+    assert clock.error_ns == 0
+    clock.step(-3_000_000)
+    assert discipline.update(-clock.error_ns) == SLEW
+    assert clock.steps == 2
+
+def test_discipline_learns_frequency():
+    ref = FakeTime()
+    clock = SimulatedClock(drift_ppm=-20.0, reference=ref)
+    discipline = Discipline(clock, mono=ref)
+    for _ in range(30):
+        discipline.update(-clock.error_ns)
+        ref.advance(64)
+    assert abs(discipline.freq_ppm - 20.0) < 0.5
+    assert abs(clock.error_ns) < 100_000
+
+def test_discipline_learns_frequency_from_steps():
+    ref = FakeTime()
+    clock = SimulatedClock(drift_ppm=50.0, reference=ref)
+    discipline = Discipline(clock, step_threshold_ns=0, mono=ref)
+    for _ in range(8):                      # hourly one-shot runs where slews stop with the process
+        ref.advance(3600)
+        assert discipline.update(-clock.error_ns) == STEP
+    assert abs(discipline.freq_ppm + 50.0) < 0.5
+    ref.advance(3600)
+    assert abs(clock.error_ns) < 2_000_000  # 50 ppm would be 180 ms an hour
+
+    jumped = SimulatedClock(reference=ref)
+    discipline = Discipline(jumped, mono=ref)
+    discipline.update(0)
+    ref.advance(3600)
+    jumped.step(2_000_000_000)              # someone set the clock: not a frequency error
+    assert discipline.update(-jumped.error_ns) == STEP
+    assert discipline.freq_ppm == 0.0
+
+def test_drift_state_survives_restart(tmp_path):
+    ref = FakeTime()
+    clock = SimulatedClock(drift_ppm=-20.0, reference=ref)
+    discipline = Discipline(clock, mono=ref)
+    state = DriftState(str(tmp_path / 'state.json'))
+    for _ in range(30):
+        discipline.update(-clock.error_ns)
+        ref.advance(64)
+    assert state.save(discipline)
+    assert not state.save(discipline)       # unchanged: not rewritten
+
+    # a new process: same oscillator, correction not applied yet
+    ref.advance(10)
+    restarted = SimulatedClock(offset_ns=clock.error_ns, drift_ppm=-20.0, reference=ref)
+    fresh = Discipline(restarted, mono=ref)
+    assert DriftState(str(tmp_path / 'state.json')).load(fresh)
+    assert abs(fresh.freq_ppm - discipline.freq_ppm) < 1e-9
+    assert restarted.freq_ppm == fresh.freq_ppm
+    assert len(fresh.history) == 8
+    errors = []
+    for _ in range(2):
+        ref.advance(64)
+        fresh.update(-restarted.error_ns)
+        errors.append(abs(restarted.error_ns))
+    assert max(errors) < 100_000              # no warm-up: 20 ppm would be 1.3 ms per poll
+
+def test_drift_state_ignores_bad_files(tmp_path):
+    path = tmp_path / 'state.json'
+    discipline = Discipline(SimulatedClock())
+    assert not DriftState(str(path)).load(discipline)
+    path.write_text('{"freq_ppm": ')
+    assert not DriftState(str(path)).load(discipline)
+    assert discipline.freq_ppm == 0.0
+
+def test_loop_poll_once_uses_sampler():
+    ref = FakeTime()
+    clock = SimulatedClock(offset_ns=1_000_000, reference=ref)
+
+    def sampler():
+        offset = -clock.error_ns
+        return SyncResult(offset, 100_000, 50_000, 0, [], [], 0)
+
+    loop = DisciplineLoop(Discipline(clock, mono=ref), sampler)
+    result, action = loop.poll_once()
+    assert action == SLEW
+    assert result.offset == -1_000_000
+    ref.advance(10)
+    assert clock.error_ns == 0
@@ -0,0 +1,83 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from local_ntp.common import get_time_udp
+from local_ntp.server.daemon import Daemon, load_config
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_for_server(port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return get_time_udp('127.0.0.1', port, timeout=0.1)
+        except OSError:
+            time.sleep(0.05)
+    raise AssertionError(f'server on port {port} did not answer')
+
+def test_load_config_precedence(tmp_path):
+    cfg = tmp_path / 'server.json'
+    cfg.write_text(json.dumps({'port': '2000', 'workers': 2, 'unknown': 1}))
+    config = load_config(str(cfg), {'port': 3000, 'host': None})
+    assert config['port'] == 3000
+    assert config['workers'] == 2
+    assert config['host'] == ''
+    assert 'unknown' not in config
+    with pytest.raises(FileNotFoundError):
+        load_config(str(tmp_path / 'missing.json'))
+
+def test_daemon_import_has_no_gui_dependencies():
+    code = ('import sys, local_ntp.server.__main__; '
+            'print([m for m in ("PyQt5", "tkinter", "ctypes", "multiprocessing") if m in sys.modules])')
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == '[]'
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGHUP'), reason='needs SIGHUP')
+def test_daemon_reload_and_stop(tmp_path):
+    cfg = tmp_path / 'server.json'
+    first, second = free_port(), free_port()
+    cfg.write_text(json.dumps({'host': '127.0.0.1', 'port': first}))
+    proc = subprocess.Popen([sys.executable, '-m', 'local_ntp.server', '--config', str(cfg)],
+                            cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        wait_for_server(first)
+        cfg.write_text(json.dumps({'host': '127.0.0.1', 'port': second}))
+        proc.send_signal(signal.SIGHUP)
+        wait_for_server(second)
+        start = time.monotonic()
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(5) == 0
+        assert time.monotonic() - start < 2
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+    out = proc.stdout.read()
+    assert 'Настройки перечитаны' in out
+    assert 'Сервер остановлен' in out
+
+def test_reload_applies_a_changed_session_greeting(tmp_path):
+    cfg = tmp_path / 'server.json'
+    cfg.write_text(json.dumps({'host': '127.0.0.1', 'port': 0, 'quiet': True}))
+    daemon = Daemon(str(cfg))
+    daemon.config = load_config(daemon.config_path)
+    daemon._start_listeners(daemon.config)
+    try:
+        assert daemon.server.session_greeting == 0
+        cfg.write_text(json.dumps({'host': '127.0.0.1', 'port': 0, 'quiet': True, 'session_greeting': 1.5}))
+        daemon.reload()
+        assert daemon.server.session_greeting == 1.5
+    finally:
+        daemon._stop_listeners()
@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.common import DiscoveredServer, DiscoveryCache, discover_servers
+from local_ntp.common.discovery import broadcast_addresses
+from local_ntp.server import TimeServer
+
+def test_broadcast_addresses_include_limited_broadcast():
+    addrs = broadcast_addresses()
+    assert addrs[-1] == '255.255.255.255'
+    assert len(addrs) == len(set(addrs))
+
+def test_collects_and_ranks_responders():
+    server = TimeServer(host='127.0.0.1')
+    server.start(0)
+    try:
+        start = time.monotonic()
+        servers = discover_servers(server.port, window=0.2, ipv6=False,
+                                   broadcasts=['127.0.0.1', '127.0.0.2'])
+        elapsed = time.monotonic() - start
+    finally:
+        server.stop()
+    assert [s.address for s in servers] == ['127.0.0.1']
+    assert 0 < servers[0].rtt < 0.2
+    assert elapsed < 0.5
+
+def test_cache_ttl(tmp_path):
+    cache = DiscoveryCache(str(tmp_path / 'servers.json'), ttl=60)
+    assert cache.load(123) is None
+    servers = [DiscoveredServer('10.0.0.2', 0.001), DiscoveredServer('10.0.0.3', 0.004)]
+    cache.store(123, servers)
+    assert cache.load(123) == servers
+    assert cache.load(124) is None
+    assert cache.discover(123) == servers  # served from cache, no broadcast
+    cache.ttl = -1
+    assert cache.load(123) is None
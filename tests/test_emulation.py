@@ -0,0 +1,45 @@
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.emulation import SCENARIOS, ImpairedLink, Scenario, convergence_time, run_scenario
+
+def test_convergence_time():
+    errors = [(0.0, 5_000_000), (1.0, 500), (2.0, 2_000_000), (3.0, 100), (4.0, -300)]
+    assert convergence_time(errors, 1_000_000) == 3.0
+    assert convergence_time(errors[:3], 1_000_000) is None
+
+def test_link_delays_and_drops():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as echo, \
+            socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as client:
+        echo.bind(('127.0.0.1', 0))
+        link = ImpairedLink(echo.getsockname(), delay=0.02, asymmetry=0.03)
+        link.start()
+        try:
+            client.settimeout(1.0)
+            start = time.monotonic()
+            client.sendto(b'ping', ('127.0.0.1', link.port))
+            data, addr = echo.recvfrom(64)
+            echo.sendto(data, addr)
+            assert client.recvfrom(64)[0] == b'ping'
+            assert time.monotonic() - start >= 0.07
+        finally:
+            link.stop()
+    lossy = ImpairedLink(('127.0.0.1', 9), loss=1.0)
+    lossy._enqueue(b'x', True)
+    assert lossy.dropped == 1 and not lossy._queue
+    lossy.stop()
+
+def test_ideal_scenario_converges():
+    report = run_scenario(SCENARIOS['ideal'], duration=1.5)
+    assert report['failed_polls'] == 0
+    assert report['converged_s'] is not None and report['converged_s'] < 1.0
+    assert abs(report['final_error_ms']) < 0.5
+
+def test_asymmetry_shows_as_half_its_size():
+    report = run_scenario(Scenario('asym', offset_ms=500.0, asymmetry_ms=4.0), duration=1.5)
+    assert 1.3 < abs(report['final_error_ms']) < 2.7
+    assert report['converged_s'] is None
@@ -0,0 +1,67 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.eventlog import EventLog, LogBuffer, LogPump, RotatingFileSink
+
+def test_bounded_queue_counts_drops():
+    events = EventLog(capacity=3)
+    for i in range(5):
+        events.emit('msg %d', i)
+    assert events.emitted == 3
+    assert events.dropped == 2
+    lines = events.drain_lines()
+    assert lines[:3] == ['msg 0', 'msg 1', 'msg 2']
+    assert '2' in lines[3]
+    assert events.drain_lines() == []
+
+def test_message_without_args_is_not_formatted():
+    events = EventLog()
+    events.emit('100% done')
+    events.emit('bytes %s', b'2024-01-01')
+    assert events.drain_lines() == ['100% done', 'bytes 2024-01-01']
+
+def test_pump_to_rotating_file(tmp_path):
+    path = str(tmp_path / 'server.log')
+    events = EventLog()
+    sink = RotatingFileSink(path, max_bytes=200, backup_count=2)
+    pump = LogPump(events, sink, interval=0.01)
+    for i in range(50):
+        events.emit('line %d', i)
+        if i % 10 == 9:
+            pump.flush()
+    pump.start()
+    events.emit('last')
+    pump.stop()
+    sink.close()
+    assert os.path.exists(path + '.1')
+    assert not os.path.exists(path + '.3')
+    with open(path, encoding='utf-8') as f:
+        assert f.read().rstrip().endswith('last')
+
+def test_log_buffer_keeps_last_lines():
+    buf = LogBuffer(capacity=4)
+    assert buf.extend(['a', 'b', 'c']) == 3
+    assert buf.evicted(3) == 2
+    assert buf.extend(['d', 'e', 'f']) == 3
+    assert [buf[i] for i in range(len(buf))] == ['c', 'd', 'e', 'f']
+    assert buf.extend([str(i) for i in range(10)]) == 4
+    assert [buf[i] for i in range(len(buf))] == ['6', '7', '8', '9']
+
+def test_log_buffer_filter_and_find():
+    buf = LogBuffer(capacity=5)
+    buf.extend(['[SERVER] up', '[CLIENT] sync', '[SERVER] Error', '[CLIENT] error'])
+    buf.set_filter('error')
+    assert len(buf) == 2 and buf[0] == '[SERVER] Error'
+    assert buf.evicted(3) == 0          # evicts two lines, neither matching
+    assert buf.extend(['a', 'b error', 'c']) == 1
+    assert buf.evicted(1) == 1
+    assert buf.extend(['d']) == 0
+    assert [buf[i] for i in range(len(buf))] == ['[CLIENT] error', 'b error']
+    buf.set_filter('')
+    assert len(buf) == 5
+    assert buf.find('client') == 0
+    assert buf.find('error', start=1) == 2
+    assert buf.find('error', start=1, backwards=True) == 0
+    assert buf.find('missing') == -1
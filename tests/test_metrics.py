@@ -0,0 +1,47 @@
+import os
+import sys
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.common import get_time_from_server, get_time_udp
+from local_ntp.server import TimeServer
+from local_ntp.server.metrics import Histogram, Metrics
+
+def test_histogram_buckets_and_quantile():
+    h = Histogram((10, 100, 1000))
+    for v in (5, 10, 50, 500, 5000):
+        h.observe(v)
+    assert h.counts == [2, 1, 1, 1]
+    assert h.count == 5
+    assert h.quantile(0.4) == 10
+    assert h.quantile(1.0) == float('inf')
+    assert Histogram().quantile(0.5) is None
+
+def test_server_metrics_and_http_endpoint():
+    server = TimeServer(host='127.0.0.1', metrics_port=0)
+    server.start(0)
+    try:
+        get_time_from_server('127.0.0.1', server.port)
+        get_time_udp('127.0.0.1', server.port)
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.metrics_port}/metrics', timeout=2) as r:
+            assert r.headers['Content-Type'].startswith('text/plain')
+            body = r.read().decode()
+    finally:
+        server.stop()
+    assert 'localntp_connections_total 1' in body
+    assert 'localntp_udp_requests_total 1' in body
+    assert 'localntp_active_clients 1' in body
+    assert 'localntp_residence_seconds_bucket{path="udp",le="+Inf"} 1' in body
+    assert server.metrics.bytes_sent == 23 + 32
+    assert 'TCP: 1' in server.metrics.summary()
+
+def test_idle_clients_are_pruned_and_summary_is_a_snapshot():
+    m = Metrics(active_window=60)
+    m.last_seen['10.0.0.1'] = m.tick - 120
+    m.last_seen['10.0.0.2'] = m.tick
+    m.udp_requests = 5
+    assert 'UDP: 0' in m.summary()          # not refreshed until the next tick
+    m.advance()
+    assert list(m.last_seen) == ['10.0.0.2']
+    assert 'UDP: 5' in m.summary() and 'клиентов: 1' in m.summary()
@@ -0,0 +1,61 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.monitor import Monitor, format_table, main
+from local_ntp.server import TimeServer
+
+def _free_udp_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def test_sweep_reports_every_server_in_one_round_trip():
+    servers = [TimeServer(host='127.0.0.1', ipv6_discovery=False) for _ in range(3)]
+    for server in servers:
+        server.start(0)
+    try:
+        targets = [('127.0.0.1', s.port) for s in servers] + [('127.0.0.1', _free_udp_port())]
+        monitor = Monitor(targets, samples=4, timeout=1.0)
+
+        async def two_sweeps():
+            try:
+                await monitor.sweep()
+                start = time.monotonic()
+                reports = await monitor.sweep()
+                return reports, time.monotonic() - start
+            finally:
+                monitor.close()
+
+        reports, elapsed = asyncio.run(two_sweeps())
+    finally:
+        for server in servers:
+            server.stop()
+    # the dead server costs one timeout for the whole sweep; the bound is loose for busy hosts
+    assert elapsed < 1.0 + 1.0
+    live, dead = reports[:3], reports[3]
+    for report in live:
+        # loopback UDP can still drop a datagram: each sweep needs one reply, not all four
+        assert report['reachable'] and report['reach'] == '003'
+        assert report['lost'] < 4 and report['stratum'] == 1
+        assert abs(report['offset_ms']) < 50 and report['delay_ms'] >= 0
+    assert not dead['reachable'] and dead['reach'] == '000' and dead['lost'] == 4
+    table = format_table(reports)
+    assert 'доступно 3 из 4' in table
+
+def test_json_lines_output(capsys):
+    server = TimeServer(host='127.0.0.1', ipv6_discovery=False)
+    server.start(0)
+    try:
+        assert main([f'127.0.0.1:{server.port}', '--count', '2', '--interval', '0.05',
+                     '--format', 'json']) == 0
+    finally:
+        server.stop()
+    reports = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(reports) == 2
+    assert reports[1]['reach'] == '003' and reports[1]['server'] == f'127.0.0.1:{server.port}'
@@ -0,0 +1,62 @@
+import os
+import socket
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.common import KissOfDeath, ntp
+from local_ntp.server import TimeServer, TimeSource
+
+def test_ntp_timestamp_roundtrip():
+    ns = 1_700_000_000_123_456_789
+    ts = ntp.ns_to_ntp(ns)
+    assert ts >> 32 == 1_700_000_000 + ntp.NTP_EPOCH_OFFSET
+    assert abs(ntp.ntp_to_ns(ts) - ns) <= 1
+    assert ntp.seconds_to_short(1.5) == 0x18000
+
+def test_pack_and_unpack_in_place():
+    buf = bytearray(ntp.PACKET_SIZE)
+    ntp.pack_into(buf, ntp.LEAP_NONE, 4, ntp.MODE_SERVER, 2, -6, -20, 0, 65536, b"LOCL", 1, 2, 3, 4)
+    p = ntp.unpack_from(buf)
+    assert (p.leap, p.version, p.mode, p.stratum, p.poll, p.precision) == (0, 4, 4, 2, -6, -20)
+    assert (p.root_dispersion, p.ref_id, p.reference, p.origin, p.receive, p.transmit) == \
+        (65536, b"LOCL", 1, 2, 3, 4)
+    assert ntp.transmit_time(buf) == 4
+    with pytest.raises(ValueError):
+        ntp.unpack_from(buf[:47])
+
+def test_server_answers_ntp_clients():
+    wall = [1_700_000_000_000_000_000]
+    server = TimeServer(source=TimeSource(wall=lambda: wall[0]), ntp_port=0, resync_interval=3600)
+    server.start(0)
+    try:
+        sample = ntp.get_time_ntp("127.0.0.1", server.ntp_port, timeout=1.0)
+        assert sample.stratum == 1
+        offset = sample.offset - (wall[0] - time.time_ns())
+        assert abs(offset) < 50_000_000
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.settimeout(0.2)
+            buf = bytearray(ntp.PACKET_SIZE)
+            ntp.pack_request(buf, time.time_ns())
+            buf[0] = 4 << 3 | ntp.MODE_SERVER        # not a client request: ignored
+            s.sendto(buf, ("127.0.0.1", server.ntp_port))
+            s.sendto(b"short", ("127.0.0.1", server.ntp_port))
+            with pytest.raises(socket.timeout):
+                s.recvfrom(64)
+    finally:
+        server.stop()
+    assert server.metrics.ntp_requests == 1
+    assert server.metrics.errors == 2
+
+def test_ntp_kiss_of_death():
+    server = TimeServer(ntp_port=0, rate_limit=1.0, rate_burst=1)
+    server.start(0)
+    try:
+        ntp.get_time_ntp("127.0.0.1", server.ntp_port, timeout=1.0)
+        with pytest.raises(KissOfDeath):
+            ntp.get_time_ntp("127.0.0.1", server.ntp_port, timeout=1.0)
+    finally:
+        server.stop()
@@ -0,0 +1,64 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.clock import STEP, Discipline, PollScheduler, SimulatedClock
+from local_ntp.common import KissOfDeath, SyncResult
+
+class FakeTime:
+    def __init__(self):
+        self.ns = 1_000_000_000_000
+
+    def __call__(self):
+        return self.ns
+
+    def seconds(self):
+        return self.ns / 1e9
+
+    def advance(self, seconds):
+        self.ns += int(seconds * 1e9)
+
+def run(clock, ref, scheduler, polls, noise_ns=0, rng=None):
+    """Poll ``polls`` times on the scheduler's intervals; returns the intervals used."""
+    discipline = Discipline(clock, mono=ref)
+    intervals = []
+    for _ in range(polls):
+        offset = -clock.error_ns + (rng.randint(-noise_ns, noise_ns) if noise_ns else 0)
+        action = discipline.update(offset)
+        result = SyncResult(offset, 200_000, 100_000 + noise_ns, noise_ns // 2, [None] * 4, [None] * 4, 0)
+        interval = scheduler.update(result, action)
+        intervals.append(interval)
+        ref.advance(interval)
+    return intervals
+
+def test_stable_clock_backs_off_to_max():
+    ref = FakeTime()
+    clock = SimulatedClock(offset_ns=300_000_000, drift_ppm=5.0, reference=ref)
+    scheduler = PollScheduler(min_interval=16, max_interval=1024, mono=ref.seconds)
+    intervals = run(clock, ref, scheduler, 20, noise_ns=50_000, rng=random.Random(1))
+    assert intervals[0] == 16                    # first poll steps the clock
+    assert intervals[-1] == 1024
+    assert all(b <= 2 * a for a, b in zip(intervals, intervals[1:]))
+    assert abs(clock.error_ns) < 1_000_000
+
+def test_noisy_clock_polls_often():
+    ref = FakeTime()
+    clock = SimulatedClock(drift_ppm=5.0, reference=ref)
+    scheduler = PollScheduler(min_interval=16, max_interval=1024, mono=ref.seconds)
+    intervals = run(clock, ref, scheduler, 20, noise_ns=3_000_000, rng=random.Random(2))
+    assert max(intervals[5:]) <= 64
+
+def test_step_loss_and_kiss_of_death():
+    ref = FakeTime()
+    scheduler = PollScheduler(min_interval=16, max_interval=1024, mono=ref.seconds)
+    scheduler.interval = 512
+    assert scheduler.failed(TimeoutError()) == 256
+    assert scheduler.failed(KissOfDeath(2000.0)) == 1024
+    lossy = SyncResult(0, 200_000, 100_000, 0, [None], [], 7)
+    assert scheduler.update(lossy, 'slew') == 512
+    good = SyncResult(0, 200_000, 100_000, 0, [None] * 4, [], 0)
+    assert scheduler.update(good, STEP) == 16
+    slewing = SyncResult(20_000_000, 200_000, 100_000, 0, [None] * 4, [], 0)
+    assert scheduler.update(slewing, 'slew') == 40   # 20 ms at 500 ppm
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.common import protocol
+from local_ntp.common.protocol import Sample
+
+def test_offset_and_delay_exclude_server_time():
+    # client 100 ns behind server, 10 ns each way, 1000 ns server processing
+    s = Sample(t1=0, t2=110, t3=1110, t4=1020, stratum=1)
+    assert s.delay == 20
+    assert s.offset == 100
+
+def test_pack_roundtrip():
+    data = protocol.pack_response(1, 2, 3, stratum=4)
+    assert len(data) == protocol.PACKET_SIZE
+    assert protocol.is_time_packet(data)
+    assert protocol.unpack(data) == (protocol.MODE_RESPONSE, 4, 0, 1, 2, 3)
+
+def test_unpack_rejects_garbage():
+    with pytest.raises(ValueError):
+        protocol.unpack(b'CUSTONTP_DISCOVER')
+    with pytest.raises(ValueError):
+        protocol.unpack(b'XXXX' + protocol.pack_request(1)[4:])
@@ -0,0 +1,82 @@
+import os
+import socket
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.common import KissOfDeath, get_time_from_server, sample_burst
+from local_ntp.server import TimeServer
+from local_ntp.server.ratelimit import ALLOW, DROP, KOD, RateLimiter
+
+def test_bucket_refills_and_kod_is_sent_once():
+    limiter = RateLimiter(rate=10, burst=3, max_clients=4)
+    assert [limiter.check('a', 0) for _ in range(5)] == [ALLOW, ALLOW, ALLOW, KOD, DROP]
+    assert limiter.check('b', 0) == ALLOW
+    assert limiter.check('a', 100_000_000) == ALLOW   # one token after 100 ms
+    assert limiter.check('a', 100_000_000) == KOD
+
+def test_shedding_starves_heavy_senders_first():
+    limiter = RateLimiter(rate=10, burst=8, max_clients=4, shed_cost=4)
+    for _ in range(6):
+        limiter.check('heavy', 0)
+    limiter.shedding = True
+    assert limiter.check('heavy', 0) == KOD
+    assert limiter.check('light', 0) == ALLOW
+    limiter.shedding = False
+    assert limiter.cost == 1.0
+
+def test_idle_entries_expire():
+    limiter = RateLimiter(max_clients=2, idle_timeout=1.0)
+    limiter.check('a', 0)
+    limiter.check('b', 0)
+    assert limiter.check('c', 0) == ALLOW     # table full, not shedding: let it through untracked
+    assert len(limiter) == 2
+    assert limiter.check('c', 2_000_000_000) == ALLOW   # takes over the idle slot of 'a'
+    assert sorted(limiter._slots) == ['b', 'c']
+    assert limiter.expire(2_000_000_000) == 1
+    assert len(limiter) == 1
+
+def test_full_table_costs_a_bounded_sweep_per_new_source():
+    limiter = RateLimiter(max_clients=1000, idle_timeout=1.0, sweep=8)
+    for i in range(1000):
+        limiter.check(f'active{i}', 5_000_000_000)
+
+    def full_scan(now_ns):
+        raise AssertionError('expire called from check')
+
+    limiter.expire = full_scan
+    assert all(limiter.check(f'spoofed{i}', 5_000_000_000) == ALLOW for i in range(20_000))
+    assert len(limiter) == 1000 and limiter._hand == (20_000 * 8) % 1000
+    limiter.shedding = True
+    assert limiter.check('spoofed', 5_000_000_000) == DROP
+    # once entries have gone idle, the hand hands their slots to newcomers
+    assert limiter.check('late', 7_000_000_000) == ALLOW
+    assert 'late' in limiter._slots and len(limiter) == 1000
+
+def test_server_sends_kiss_of_death():
+    server = TimeServer(host='127.0.0.1', rate_limit=1, rate_burst=2)
+    server.start(0)
+    try:
+        result = sample_burst('127.0.0.1', server.port, count=4, interval=0)
+        assert len(result.samples) + len(result.rejected) == 2
+        assert result.retry_after == pytest.approx(2.0)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.settimeout(0.2)
+            s.sendto(b'CUSTONTP_DISCOVER', ('127.0.0.1', server.port))
+            with pytest.raises(socket.timeout):
+                s.recvfrom(1024)
+        assert server.metrics.rate_limited == 2
+    finally:
+        server.stop()
+
+def test_tcp_kiss_of_death():
+    server = TimeServer(host='127.0.0.1', rate_limit=1, rate_burst=1)
+    server.start(0)
+    try:
+        get_time_from_server('127.0.0.1', server.port)
+        with pytest.raises(KissOfDeath):
+            get_time_from_server('127.0.0.1', server.port)
+    finally:
+        server.stop()
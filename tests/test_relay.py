@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.common import get_time_udp
+from local_ntp.server import TimeServer, TimeSource
+from local_ntp.server.relay import STRATUM_UNSYNCED, SourceClock, parse_upstream
+
+def test_parse_upstream():
+    assert parse_upstream('10.0.0.5') == ('10.0.0.5', 12345)
+    assert parse_upstream('10.0.0.5:4000') == ('10.0.0.5', 4000)
+    assert parse_upstream('[fe80::1%2]:4000') == ('fe80::1%2', 4000)
+    assert parse_upstream('time.lan', 123) == ('time.lan', 123)
+
+def test_source_clock_steps_and_slews():
+    mono = [0]
+    source = TimeSource(wall=lambda: 1_000_000_000, mono=lambda: mono[0])
+    clock = SourceClock(source, mono=lambda: mono[0], slew_rate_ppm=500)
+    clock.step(2_000_000)
+    assert source.now_ns() == 1_002_000_000
+    clock.slew(-1_000_000)
+    mono[0] = 1_000_000_000             # 1 s at 500 ppm: half of the slew
+    clock.tick()
+    assert source.now_ns() == 2_001_500_000
+    mono[0] = 3_000_000_000
+    clock.set_frequency(10)
+    assert source.now_ns() == 4_001_000_000
+    mono[0] = 4_000_000_000
+    clock.tick()
+    assert source.now_ns() == 5_001_010_000
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return predicate()
+
+def test_relay_chain_serves_upstream_time_with_stratum():
+    ahead = 5_000_000_000
+    upstream = TimeServer(host='127.0.0.1', source=TimeSource(wall=lambda: time.time_ns() + ahead))
+    upstream.start(0)
+    relay = TimeServer(host='127.0.0.1', upstream=('127.0.0.1', upstream.port), upstream_interval=0.2)
+    second = None
+    try:
+        relay.start(0)
+        assert wait_for(lambda: relay.stratum == 2)
+        sample = get_time_udp('127.0.0.1', relay.port)
+        assert sample.stratum == 2
+        assert abs(sample.offset - ahead) < 20_000_000
+        second = TimeServer(host='127.0.0.1', upstream=('127.0.0.1', relay.port), upstream_interval=0.2)
+        second.start(0)
+        assert wait_for(lambda: second.stratum == 3)
+        relay.relay.max_failures = 1
+        relay.relay.timeout = 0.05
+        upstream.stop()
+        assert wait_for(lambda: relay.stratum == STRATUM_UNSYNCED)
+    finally:
+        for server in (second, relay, upstream):
+            if server is not None:
+                server.stop()
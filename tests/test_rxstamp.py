@@ -0,0 +1,57 @@
+import os
+import socket
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.common import Sample, get_time_udp, rxstamp, timestamp_jitter
+from local_ntp.server import TimeServer
+
+linux_only = pytest.mark.skipif(rxstamp.SO_TIMESTAMPNS is None, reason='needs SO_TIMESTAMPNS')
+
+@linux_only
+def test_recv_stamped_returns_kernel_time():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as rx, \
+            socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as tx:
+        rx.bind(('127.0.0.1', 0))
+        rx.settimeout(2)
+        assert rxstamp.enable(rx)
+        tx.sendto(b'x', rx.getsockname())
+        data, addr, kernel_ns = rxstamp.recv_stamped(rx, 16)
+        assert data == b'x'
+        assert addr[1] == tx.getsockname()[1]
+        assert 0 <= rxstamp.age_ns(kernel_ns) < 1_000_000_000
+
+def test_age_of_unknown_or_future_stamp_is_zero():
+    assert rxstamp.age_ns(None) == 0
+    assert rxstamp.age_ns(2 ** 62) == 0
+
+@linux_only
+def test_server_and_client_use_kernel_stamps():
+    server = TimeServer(host='127.0.0.1')
+    server.start(0)
+    try:
+        sample = get_time_udp('127.0.0.1', server.port)
+    finally:
+        server.stop()
+    assert sample.rx_age >= 0
+    assert sample.delay >= 0
+    assert server.metrics.udp_rx_age.count == 1
+    assert 'localntp_udp_rx_queue_seconds_count 1' in server.metrics.render_prometheus()
+
+def test_user_space_fallback():
+    server = TimeServer(host='127.0.0.1', kernel_timestamps=False)
+    server.start(0)
+    try:
+        assert get_time_udp('127.0.0.1', server.port).delay >= 0
+    finally:
+        server.stop()
+    assert server.metrics.udp_rx_age.count == 0
+
+def test_jitter_comparison():
+    samples = [Sample(0, 1000, 1000, 2000, 1, age) for age in (0, 4000, 0, 4000)]
+    kernel, user = timestamp_jitter(samples)
+    assert kernel == 0
+    assert user == 1000
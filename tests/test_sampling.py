@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.common import Sample, clock_filter, sample_burst
+from local_ntp.server import TimeServer
+
+def make_sample(offset, out_delay, back_delay):
+    t1 = 1_000_000
+    t2 = t1 + offset + out_delay
+    t3 = t2 + 50
+    t4 = t3 - offset + back_delay
+    return Sample(t1, t2, t3, t4, 1)
+
+def test_filter_prefers_lowest_delay():
+    samples = [
+        make_sample(1000, 100, 100),
+        make_sample(1000, 5000, 100),   # delayed request
+        make_sample(1000, 100, 9000),   # delayed reply
+        make_sample(1000, 120, 110),
+    ]
+    result = clock_filter(samples)
+    assert result.offset == 1000
+    assert result.delay == 200
+    assert len(result.samples) == 2
+    assert len(result.rejected) == 2
+    assert all(s.delay > 1000 for s in result.rejected)
+    assert result.offset - result.error <= 1000 <= result.offset + result.error
+
+def test_filter_requires_samples():
+    with pytest.raises(ValueError):
+        clock_filter([])
+
+def test_burst_against_server():
+    server = TimeServer(host='127.0.0.1')
+    server.start(0)
+    try:
+        result = sample_burst('127.0.0.1', server.port, count=4, interval=0.001)
+    finally:
+        server.stop()
+    assert len(result.samples) + len(result.rejected) + result.lost == 4
+    assert abs(result.offset) <= result.error + 1_000_000
@@ -0,0 +1,105 @@
+import os
+import random
+import socket
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.common import KissOfDeath, NoMajority, ServerHealth, ServerPool, SyncResult
+from local_ntp.common.selection import combine, marzullo, select_truechimers
+from local_ntp.emulation import ImpairedLink
+from local_ntp.server import TimeServer
+
+def result(offset, error, delay=100_000, jitter=0):
+    return SyncResult(offset, delay, error, jitter, [], [], 0)
+
+def dead_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def test_marzullo_finds_the_most_covered_range():
+    assert marzullo([(8, 12), (11, 13), (10, 12)]) == (3, 11, 12)
+    assert marzullo([(0, 1), (1, 2)]) == (2, 1, 1)
+
+def test_falseticker_is_dropped_and_rest_averaged():
+    results = [result(1000, 500), result(1200, 500), result(50_000, 500), result(900, 1000)]
+    assert select_truechimers(results) == [0, 1, 3]
+    combined = combine([results[i] for i in (0, 1, 3)])
+    assert 900 < combined.offset < 1200
+    assert combined.error >= 500
+    with pytest.raises(NoMajority):
+        select_truechimers([result(0, 100), result(10_000, 100)])
+
+def test_score_follows_reach_delay_and_kod():
+    fast, slow, flaky = ServerHealth('a', 1), ServerHealth('b', 1), ServerHealth('c', 1)
+    for i in range(4):
+        fast.record(result(0, 0, delay=200_000), i)
+        slow.record(result(0, 0, delay=5_000_000), i)
+        (flaky.record(result(0, 0, delay=200_000), i) if i % 2 else flaky.missed(i))
+    assert fast.score(10) < flaky.score(10) < slow.score(10)
+    fast.kissed(5.0, 10)
+    assert fast.score(12) == float('inf') and fast.score(16) < slow.score(16)
+    assert ServerHealth('new', 1).score(0) == 0.0
+
+def test_equally_good_servers_are_spread_over_clients():
+    firsts = set()
+    for seed in range(20):
+        pool = ServerPool([('10.0.0.%d' % i, 123) for i in range(6)], seed=seed)
+        firsts.add(pool.ranked(0.0)[0].host)
+    assert len(firsts) > 3
+
+def test_dead_server_costs_one_timeout_once():
+    servers = [TimeServer(host='127.0.0.1', rate_limit=None) for _ in range(2)]
+    for server in servers:
+        server.start(0)
+    dead = ('127.0.0.1', dead_port())
+    pool = ServerPool([dead] + [('127.0.0.1', s.port) for s in servers], select=2, timeout=0.2, seed=1)
+    pool._preference[pool.servers[0]] = -1.0    # make sure the dead one is tried first
+    try:
+        start = time.monotonic()
+        first = pool.sample()
+        first_time = time.monotonic() - start
+        start = time.monotonic()
+        second = pool.sample()
+        second_time = time.monotonic() - start
+    finally:
+        for server in servers:
+            server.stop()
+    assert abs(first.offset) < 5_000_000 and abs(second.offset) < 5_000_000
+    assert first_time < 0.2 + 0.3 and second_time < 0.2
+    assert pool.servers[0].reach == 0 and pool.servers[0] not in pool.last
+    assert len(pool.last) == 2
+
+def test_kiss_of_death_benches_the_server():
+    server = TimeServer(host='127.0.0.1', rate_limit=1, rate_burst=1)
+    server.start(0)
+    pool = ServerPool([('127.0.0.1', server.port)], timeout=0.2)
+    try:
+        first = pool.sample()
+        with pytest.raises(KissOfDeath):
+            pool.sample()
+    finally:
+        server.stop()
+    assert len(first.samples) + len(first.rejected) == 1
+    assert pool.servers[0].kods == 1
+
+def test_single_server_survives_a_lost_first_packet():
+    server = TimeServer(host='127.0.0.1', rate_limit=None)
+    server.start(0)
+    # a seed whose first draw drops the first request
+    seed = next(s for s in range(100) if random.Random(s).random() < 0.5)
+    link = ImpairedLink(('127.0.0.1', server.port), loss=0.5, seed=seed)
+    link.start()
+    pool = ServerPool([('127.0.0.1', link.port)], timeout=0.2)
+    try:
+        result = pool.sample()
+    finally:
+        link.stop()
+        server.stop()
+    assert link.dropped >= 1 and result.lost >= 1
+    assert len(result.samples) + len(result.rejected) + result.lost == 8
+    assert pool.servers[0].reach == 1
@@ -0,0 +1,70 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.common import get_time_from_server, get_time_udp
+from local_ntp.eventlog import EventLog
+from local_ntp.server import TimeServer
+
+def test_tcp_and_discovery():
+    events = EventLog()
+    server = TimeServer(events, host='127.0.0.1')
+    server.start(0)
+    try:
+        ts, rtt = get_time_from_server('127.0.0.1', server.port)
+        assert len(ts.split(' ')) == 2
+        assert rtt >= 0
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.settimeout(2)
+            s.sendto(b'CUSTONTP_DISCOVER', ('127.0.0.1', server.port))
+            data, _ = s.recvfrom(1024)
+        assert data == b'CUSTONTP_RESPONSE'
+    finally:
+        server.stop()
+    logs = events.drain_lines()
+    assert any('отправлено UTC-время: ' + ts in line for line in logs)
+    assert any('остановлен' in line for line in logs)
+
+def test_stalled_client_does_not_block_others():
+    server = TimeServer(host='127.0.0.1')
+    server.start(0)
+    try:
+        stalled = [socket.create_connection(('127.0.0.1', server.port)) for _ in range(50)]
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_time_from_server('127.0.0.1', server.port)))
+            for _ in range(50)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5)
+        assert len(results) == 50
+        for s in stalled:
+            s.close()
+    finally:
+        server.stop()
+
+def test_stop_is_immediate():
+    server = TimeServer(host='127.0.0.1')
+    server.start(0)
+    start = time.monotonic()
+    server.stop()
+    assert time.monotonic() - start < 0.5
+    assert not server.running
+
+def test_udp_time_request():
+    server = TimeServer(host='127.0.0.1')
+    server.start(0)
+    try:
+        sample = get_time_udp('127.0.0.1', server.port)
+    finally:
+        server.stop()
+    assert sample.t1 <= sample.t4
+    assert sample.t2 <= sample.t3
+    assert 0 <= sample.delay < 1_000_000_000
+    assert abs(sample.offset) < 1_000_000_000
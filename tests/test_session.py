@@ -0,0 +1,90 @@
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.common import Sample, SessionPool, TimeSession, get_time_from_server, sample_burst
+from local_ntp.common.sampling import _collect
+from local_ntp.server import TimeServer
+
+def test_session_answers_many_frames():
+    server = TimeServer(host='127.0.0.1', rate_limit=None, session_greeting=1.0)
+    server.start(0)
+    try:
+        session = TimeSession('127.0.0.1', server.port)
+        assert len(session.greeting.split(b' ')) == 2
+        samples = [session.exchange() for _ in range(20)]
+        session.close()
+        assert all(abs(s.offset) < 50_000_000 for s in samples)
+    finally:
+        server.stop()
+    assert server.metrics.connections == 1
+    assert server.metrics.session_requests == 20
+
+def test_plain_clients_still_get_the_greeting_and_a_close():
+    server = TimeServer(host='127.0.0.1', session_greeting=0.1)
+    server.start(0)
+    try:
+        ts, _ = get_time_from_server('127.0.0.1', server.port)
+        assert len(ts) == 23
+        with socket.create_connection(('127.0.0.1', server.port), timeout=2) as s:
+            s.recv(64)
+            assert s.recv(64) == b''    # closed after the greeting window
+    finally:
+        server.stop()
+
+def test_connections_close_after_the_greeting_by_default():
+    server = TimeServer(host='127.0.0.1')
+    server.start(0)
+    try:
+        with socket.create_connection(('127.0.0.1', server.port), timeout=2) as s:
+            start = time.monotonic()
+            data = b''
+            while True:
+                chunk = s.recv(64)
+                if not chunk:
+                    break
+                data += chunk
+        assert len(data) == 23 and time.monotonic() - start < 0.5
+    finally:
+        server.stop()
+
+def test_burst_counts_a_reset_session_as_loss():
+    calls = []
+
+    def take():
+        calls.append(1)
+        if len(calls) == 2:
+            raise ConnectionResetError('reset by server')
+        return Sample(0, 10, 10, 20, 1)
+
+    samples, lost, _ = _collect(take, 4, 0)
+    assert len(samples) == 3 and lost == 1
+
+def test_pool_reuses_and_replaces_sessions():
+    server = TimeServer(host='127.0.0.1', rate_limit=None, session_greeting=0.1, session_idle=0.2)
+    server.start(0)
+    try:
+        with SessionPool() as pool:
+            result = sample_burst('127.0.0.1', server.port, count=5, interval=0, pool=pool)
+            assert len(result.samples) + len(result.rejected) == 5
+            time.sleep(0.5)                    # server drops the idle session
+            pool.exchange('127.0.0.1', server.port)
+    finally:
+        server.stop()
+    assert server.metrics.connections == 2
+    assert server.metrics.session_requests == 6
+
+def test_rate_limited_pool_backs_off_instead_of_reconnecting():
+    server = TimeServer(host='127.0.0.1', session_greeting=1.0, rate_limit=1.0, rate_burst=3)
+    server.start(0)
+    try:
+        with SessionPool() as pool:
+            result = sample_burst('127.0.0.1', server.port, count=5, interval=0, pool=pool)
+    finally:
+        server.stop()
+    assert result.retry_after > 0 and result.lost == 0
+    assert len(result.samples) + len(result.rejected) == 2
+    assert server.metrics.connections == 1 and server.metrics.rate_limited == 1
@@ -0,0 +1,124 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.common import send_report
+from local_ntp.server import TimeServer
+from local_ntp.server.telemetry import FleetTelemetry
+
+def test_ring_buffers_percentiles_and_worst():
+    t = FleetTelemetry(max_clients=200, history=4)
+    for i in range(100):
+        for k in range(10):                 # more reports than the ring holds
+            t.record(f'10.0.0.{i}', (-1) ** i * i * 1000, 500, when=1000.0 + k)
+    stats = t.snapshot(worst=3, now=1010.0)
+    assert stats.clients == 100
+    assert stats.p50 == 49_000
+    assert stats.p99 == 98_000
+    assert stats.max == 99_000
+    assert [c.address for c in stats.worst] == ['10.0.0.99', '10.0.0.98', '10.0.0.97']
+    assert stats.worst[0].offset == -99_000
+    assert t.client('10.0.0.5').reports == 4
+    assert t.snapshot(now=1010.0 + t.max_age + 1).clients == 0
+
+def test_drift_trend_in_ppm():
+    t = FleetTelemetry(max_clients=4, history=8)
+    for k in range(12):
+        t.record('a', 5_000 * k, 100, when=100.0 + 10 * k)   # 500 ns/s
+        t.record('b', 7, 100, when=100.0 + 10 * k)
+    drift = t.drift()
+    assert drift['a'] == pytest.approx(0.5)
+    assert drift['b'] == pytest.approx(0.0)
+    assert t.to_dict()['abs_drift_ppm']['max'] == pytest.approx(0.5)
+    assert 'localntp_fleet_abs_drift_ppm{quantile="1"} 0.500000' in t.render_prometheus()
+
+def test_numpy_and_python_paths_agree(monkeypatch):
+    pytest.importorskip('numpy')
+    from local_ntp.server import telemetry
+
+    t = FleetTelemetry(max_clients=64, history=8)
+    rng = random.Random(3)
+    for k in range(20):                     # more reports than the ring holds for most clients
+        for i in range(rng.randrange(30, 50)):
+            t.record(f'10.0.0.{i}', rng.randrange(-10**7, 10**7), 100, when=1000.0 + 7 * k + rng.random())
+    fast = t.snapshot(worst=5, now=1200.0), t.drift()
+    monkeypatch.setattr(telemetry, '_np', False)
+    slow = t.snapshot(worst=5, now=1200.0), t.drift()
+    assert fast[0] == slow[0]
+    assert fast[1].keys() == slow[1].keys()
+    assert all(fast[1][h] == pytest.approx(slow[1][h], rel=1e-9, abs=1e-9) for h in slow[1])
+
+def test_full_table_evicts_oldest_reporter():
+    t = FleetTelemetry(max_clients=2, history=2)
+    t.record('a', 1, 1, when=1.0)
+    t.record('b', 2, 1, when=2.0)
+    t.record('c', 3, 1, when=3.0)
+    assert t.client('a') is None
+    assert len(t) == 2
+
+def test_hourly_history():
+    t = FleetTelemetry(max_clients=4, history=2, hours=2)
+    t.roll(now=3600.0)
+    for hour in range(1, 5):
+        t.record('a', hour * 1000, 1, when=hour * 3600.0 + 10)
+        assert t.roll(now=(hour + 1) * 3600.0)
+    assert [row[0] for row in t.hourly()] == [3, 4]
+    assert t.hourly()[-1][2] == 4000
+
+def test_server_collects_reports():
+    server = TimeServer(host='127.0.0.1', metrics_port=0)
+    server.start(0)
+    try:
+        send_report('127.0.0.1', server.port, -2_500_000, 300_000)
+        deadline = time.monotonic() + 2
+        while server.telemetry.reports == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.metrics_port}/fleet', timeout=2) as r:
+            fleet = json.loads(r.read())
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.metrics_port}/metrics', timeout=2) as r:
+            body = r.read().decode()
+    finally:
+        server.stop()
+    assert fleet['clients'] == 1
+    assert fleet['worst'][0]['offset'] == -2_500_000
+    assert 'localntp_fleet_abs_offset_seconds{quantile="0.5"} 0.002500000' in body
+    assert fleet['abs_drift_ppm'] == {'p50': None, 'p95': None, 'max': None}    # one report, no trend yet
+
+def test_roll_leaves_a_snapshot_for_other_threads():
+    t = FleetTelemetry(max_clients=4, history=2)
+    t.record('a', 3000, 1, when=100.0)
+    assert t.latest.clients == 0
+    t.roll(now=101.0)
+    assert t.latest.clients == 1 and t.latest.p95 == 3000
+
+def test_server_import_does_not_load_numpy():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = 'import sys, local_ntp.server; print("numpy" in sys.modules)'
+    out = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == 'False'
+
+def test_full_table_costs_a_bounded_sweep_per_new_reporter():
+    t = FleetTelemetry(max_clients=1000, history=2, sweep=8)
+    now = time.time()
+    for i in range(1000):
+        t.record(f'10.0.{i // 256}.{i % 256}', i, 1, when=now)
+    reads = []
+
+    class CountingArray(list):
+        def __getitem__(self, i):
+            reads.append(i)
+            return list.__getitem__(self, i)
+
+    t._last = CountingArray(t._last)
+    for i in range(5000):
+        t.record(f'172.16.{i // 256}.{i % 256}', i, 1, when=now + 1)
+    assert len(t) == 1000
+    assert len(reads) <= 5000 * 3 * t.sweep     # a scan would be 1000 reads per report
@@ -0,0 +1,44 @@
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.common import protocol
+from local_ntp.server import TimeSource
+
+class FakeClock:
+    def __init__(self, wall, mono):
+        self.wall = wall
+        self.mono = mono
+
+    def wall_ns(self):
+        return self.wall
+
+    def mono_ns(self):
+        return self.mono
+
+def test_text_matches_isoformat():
+    now = 1_700_000_000_123_456_789
+    source = TimeSource()
+    expected = datetime.utcfromtimestamp(now // 1000 / 1e6).isoformat(sep=' ', timespec='milliseconds')
+    assert source.text(now).decode() == expected
+    buf = bytearray(30)
+    assert source.write_text(buf, 2, now) == 25
+    assert buf[2:25].decode() == expected
+
+def test_wall_clock_step_is_ignored_until_resync():
+    clock = FakeClock(wall=1_000_000_000_000, mono=5_000)
+    source = TimeSource(clock.wall_ns, clock.mono_ns)
+    clock.mono += 1_000
+    clock.wall += 3_600 * 10**9  # someone steps the system clock
+    assert source.now_ns() == 1_000_000_001_000
+    assert source.resync() == 3_600 * 10**9 - 1_000
+
+def test_write_response():
+    source = TimeSource()
+    buf = bytearray(protocol.PACKET_SIZE)
+    source.write_response(buf, 11, 22, stratum=3)
+    mode, stratum, _, t1, t2, t3 = protocol.unpack(bytes(buf))
+    assert (mode, stratum, t1, t2) == (protocol.MODE_RESPONSE, 3, 11, 22)
+    assert t3 > 0
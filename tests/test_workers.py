@@ -0,0 +1,72 @@
+import os
+import socket
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from local_ntp.common import get_time_from_server, get_time_udp
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'SO_REUSEPORT'), reason='needs SO_REUSEPORT')
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+def test_pool_serves_restarts_and_rolls_over():
+    from local_ntp.server.workers import WorkerPool
+
+    port = free_port()
+    pool = WorkerPool(port, workers=2, host='127.0.0.1', check_interval=0.05, publish_interval=0.05)
+    pool.start()
+    try:
+        for _ in range(10):
+            get_time_from_server('127.0.0.1', port)
+            get_time_udp('127.0.0.1', port)
+        assert wait_for(lambda: pool.stats()['connections'] == 10)
+
+        victim = pool.pids()[0]
+        os.kill(victim, 9)
+        assert wait_for(lambda: pool.restarts == 1 and victim not in pool.pids())
+        get_time_from_server('127.0.0.1', port)
+
+        new_port = free_port()
+        pool.rollover(new_port, grace=0.05)
+        assert pool.port == new_port
+        get_time_udp('127.0.0.1', new_port)
+        assert wait_for(lambda: pool.stats()['udp_requests'] >= 11)
+    finally:
+        pool.stop()
+
+def test_failing_restarts_back_off_and_give_up():
+    from local_ntp.server.workers import WorkerPool
+
+    port = free_port()
+    pool = WorkerPool(port, workers=2, host='127.0.0.1', check_interval=0.02, restart_backoff=0.2,
+                      max_failures=3)
+    pool.start()
+    try:
+        pool.server_options = {'no_such_option': 1}     # every replacement now dies at startup
+        victim = pool.pids()[0]
+        start = time.monotonic()
+        os.kill(victim, 9)
+        assert pool.failed.wait(15)
+        took = time.monotonic() - start
+        assert pool.restarts == 2 and len(pool.pids()) == 1
+        assert took >= 0.2      # the second restart waited out its backoff
+        get_time_udp('127.0.0.1', port)
+        time.sleep(0.2)
+        assert pool.restarts == 2
+    finally:
+        pool.stop()